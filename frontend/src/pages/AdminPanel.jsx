@@ -305,7 +305,9 @@ function AdminPanel() {
                                                 </p>
                                                 <p>
                                                     <strong>Top User:</strong>{" "}
-                                                    {`${topicReport.top_user.first_name} ${topicReport.top_user.last_name} (${topicReport.top_user.username})`}
+                                                    {topicReport.top_user
+                                                        ? `${topicReport.top_user.first_name} ${topicReport.top_user.last_name} (${topicReport.top_user.username})`
+                                                        : "N/A"}
                                                 </p>
                                             </div>
                                         </>
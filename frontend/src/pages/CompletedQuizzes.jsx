@@ -9,15 +9,26 @@ function CompletedQuizzes() {
     const [error, setError] = useState("");
     const navigate = useNavigate();
 
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+
+    const fetchCompletedQuizzes = async (cursor = null) => {
+        const response = await api.get("/api/completed-quizzes/", {
+            headers: {
+                Authorization: `Bearer ${localStorage.getItem("accessToken")}`,
+            },
+            params: cursor ? { cursor } : {},
+        });
+        setQuizzes((prevQuizzes) =>
+            cursor ? [...prevQuizzes, ...response.data.results] : response.data.results
+        );
+        setNextCursor(response.data.next_cursor);
+    };
+
     useEffect(() => {
-        const fetchCompletedQuizzes = async () => {
+        const loadFirstPage = async () => {
             try {
-                const response = await api.get("/api/completed-quizzes/", {
-                    headers: {
-                        Authorization: `Bearer ${localStorage.getItem("accessToken")}`,
-                    },
-                });
-                setQuizzes(response.data);
+                await fetchCompletedQuizzes();
             } catch (err) {
                 console.error("Failed to fetch quizzes:", err);
                 setError("Failed to load quizzes. Please try again later.");
@@ -26,19 +37,37 @@ function CompletedQuizzes() {
             }
         };
 
-        fetchCompletedQuizzes();
+        loadFirstPage();
     }, []);
 
-    const handleQuizClick = (quiz) => {
-        navigate("/results", {
-            state: {
-                percentage: quiz.percentage,
-                grade: quiz.grade,
-                topic: quiz.topic,
-                difficulty: quiz.difficulty,
-                submitted_questions: quiz.questions,
-            },
-        });
+    const handleLoadMore = async () => {
+        setLoadingMore(true);
+        try {
+            await fetchCompletedQuizzes(nextCursor);
+        } catch (err) {
+            console.error("Failed to fetch quizzes:", err);
+            setError("Failed to load quizzes. Please try again later.");
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
+    const handleQuizClick = async (quiz) => {
+        try {
+            const response = await api.get(`/api/completed-quizzes/${quiz.id}/`);
+            navigate("/results", {
+                state: {
+                    percentage: response.data.percentage,
+                    grade: response.data.grade,
+                    topic: response.data.topic,
+                    difficulty: response.data.difficulty,
+                    submitted_questions: response.data.questions,
+                },
+            });
+        } catch (err) {
+            console.error("Failed to fetch quiz:", err);
+            setError("Failed to load quiz. Please try again later.");
+        }
     };
 
     return (
@@ -57,9 +86,9 @@ function CompletedQuizzes() {
                 <div className="no-quizzes">You haven't completed any quizzes yet!</div>
             ) : (
                 <div className="quiz-grid">
-                    {quizzes.map((quiz, index) => (
+                    {quizzes.map((quiz) => (
                         <div
-                            key={index}
+                            key={quiz.id}
                             className="quiz-card"
                             onClick={() => handleQuizClick(quiz)}
                         >
@@ -72,6 +101,15 @@ function CompletedQuizzes() {
                     ))}
                 </div>
             )}
+            {!loading && !error && nextCursor && (
+                <button
+                    className="load-more"
+                    onClick={handleLoadMore}
+                    disabled={loadingMore}
+                >
+                    {loadingMore ? "Loading..." : "Load more"}
+                </button>
+            )}
         </div>
     );
 }
@@ -1,16 +1,17 @@
-import os
-import dotenv
-import openai
+from .graders import get_grader
+from .grading_client import acall_grader, call_grader
 
-dotenv.load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+def model_name():
+    return get_grader().model
 
 def mark_answer(answer, answer_key, marks):
-    response = openai.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": f"You are a grader, all you will return is a numerical answer between 0 and {marks} for the question depending on how correct the answer is. Answers not explicitly mentioned in the mark scheme may be correct. Therefore where BOD is present in the mark scheme, give benefit of the doubt."},
-            {"role": "user", "content": f"Student answer: {answer}\nMark scheme: {answer_key}"},
-        ]
-    )
-    return int(response.choices[0].message.content)
+    return call_grader(get_grader(), "mark_answer", (answer, answer_key, marks))
+
+def mark_answers(items):
+    return call_grader(get_grader(), "mark_answers", (items,), items=len(items))
+
+async def amark_answer(answer, answer_key, marks):
+    return await acall_grader(get_grader(), "amark_answer", (answer, answer_key, marks))
+
+async def amark_answers(items):
+    return await acall_grader(get_grader(), "amark_answers", (items,), items=len(items))
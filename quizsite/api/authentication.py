@@ -0,0 +1,106 @@
+import copy
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .models import Account
+from .signals import accounts_updated
+
+
+def version_key(user_id):
+    return f"auth_user_version:{user_id}"
+
+
+class UserCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = {}
+
+    @property
+    def timeout(self):
+        return getattr(settings, "JWT_USER_CACHE_TTL", 60)
+
+    @property
+    def max_entries(self):
+        return getattr(settings, "JWT_USER_CACHE_MAX_ENTRIES", 10000)
+
+    def version(self, user_id):
+        version = cache.get(version_key(user_id))
+        if version is None:
+            version = time.time_ns()
+            if not cache.add(version_key(user_id), version, None):
+                version = cache.get(version_key(user_id), version)
+        return version
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._users.get(str(user_id))
+        if entry is None:
+            return None
+
+        expires_at, version, user = entry
+        if expires_at <= time.monotonic() or cache.get(version_key(user_id)) != version:
+            with self._lock:
+                if self._users.get(str(user_id)) is entry:
+                    del self._users[str(user_id)]
+            return None
+        return copy.copy(user)
+
+    def set(self, user_id, user, version=None):
+        if self.timeout <= 0:
+            return
+        version = self.version(user_id) if version is None else version
+        with self._lock:
+            self._users.pop(str(user_id), None)
+            while len(self._users) >= self.max_entries:
+                del self._users[next(iter(self._users))]
+            self._users[str(user_id)] = (time.monotonic() + self.timeout, version, copy.copy(user))
+
+    def invalidate(self, user_id):
+        cache.set(version_key(user_id), time.time_ns(), None)
+        with self._lock:
+            self._users.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = user_cache.get(user_id) if user_id is not None else None
+        if user is None:
+            version = user_cache.version(user_id) if user_id is not None else None
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user, version)
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+        return user
+
+
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(getattr(instance, api_settings.USER_ID_FIELD))
+
+
+@receiver(accounts_updated, sender=Account)
+def invalidate_updated_users(sender, account_ids, **kwargs):
+    for account_id in account_ids:
+        user_cache.invalidate(account_id)
@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+import tempfile
+from django.conf import settings
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def latency_summary(latencies, elapsed, errors=0):
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    return {
+        "requests": len(latencies_ms),
+        "errors": errors,
+        "throughput": round(len(latencies_ms) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies_ms) / len(latencies_ms), 2) if latencies_ms else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 0.5), 2),
+        "p95_ms": round(percentile(latencies_ms, 0.95), 2),
+        "p99_ms": round(percentile(latencies_ms, 0.99), 2),
+    }
+
+
+def run_in_temporary_database(args, settings_module=None, env=None):
+    manage = os.path.join(settings.BASE_DIR, "manage.py")
+    with tempfile.TemporaryDirectory() as directory:
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": settings_module or os.environ.get("DJANGO_SETTINGS_MODULE", "quizsite.settings"),
+            "SQLITE_PATH": os.path.join(directory, "benchmark.sqlite3"),
+            "DJANGO_SECRET_KEY": os.environ.get("DJANGO_SECRET_KEY") or "temporary-benchmark-key",
+            "ALLOWED_HOSTS": os.environ.get("ALLOWED_HOSTS") or "testserver,localhost",
+            "ALLOW_LOCAL_CACHE": "1",
+            "CACHE_BACKEND": os.environ.get("CACHE_BACKEND") or "django.core.cache.backends.locmem.LocMemCache",
+            **(env or {}),
+        }
+        subprocess.run([sys.executable, manage, "migrate", "--no-input", "-v", "0"], env=env, check=True)
+        return subprocess.run(
+            [sys.executable, manage, *args], env=env, check=True, capture_output=True, text=True
+        ).stdout
@@ -0,0 +1,246 @@
+import csv
+from django.db import transaction
+from django.utils.timezone import now
+from .history_cache import invalidate_history
+from .models import Account, CompletedQuiz, CompletedQuizQuestion, GradingJob, Question
+from .question_import import iter_json_lines
+from .sampling import remember_questions
+from .scoring import score_submissions
+from .stats import record_quizzes_stats
+from .utils import (
+    build_quiz_questions, grade_for_percentage, long_answer_items, mark_long_answers, quiz_percentage, quiz_topic
+)
+
+FIELDS = ("username", "question_id", "answer")
+
+
+class InvalidSubmission(ValueError):
+    pass
+
+
+class Submission:
+    def __init__(self, username, first_row):
+        self.username = username
+        self.first_row = first_row
+        self.last_row = first_row
+        self.answers = {}
+        self.rows = {}
+
+    def add(self, position, question_id, answer):
+        self.last_row = position
+        if str(question_id) in self.answers:
+            raise InvalidSubmission(
+                f"Duplicate answer to question {question_id} (first given on row {self.rows[str(question_id)]})."
+            )
+        self.answers[str(question_id)] = answer
+        self.rows[str(question_id)] = position
+
+
+def iter_csv_rows(file):
+    reader = csv.DictReader(file)
+    missing = [field for field in FIELDS if field not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"Missing CSV columns: {', '.join(missing)}.")
+    return iter(reader)
+
+
+def iter_rows(file, file_format="auto"):
+    if file_format == "auto":
+        first = ""
+        while not first:
+            char = file.read(1)
+            if not char:
+                return iter(())
+            first = char.strip()
+        file.seek(0)
+        file_format = "jsonl" if first == "{" else "csv"
+
+    return iter_json_lines(file) if file_format == "jsonl" else iter_csv_rows(file)
+
+
+def normalize_row(record):
+    if not isinstance(record, dict):
+        raise InvalidSubmission("Row must be an object.")
+
+    missing = [field for field in FIELDS if record.get(field) in (None, "")]
+    if missing:
+        raise InvalidSubmission(f"Missing fields: {', '.join(missing)}.")
+
+    try:
+        question_id = int(record["question_id"])
+    except (TypeError, ValueError):
+        raise InvalidSubmission("question_id must be an integer.")
+
+    answer = record["answer"]
+    if isinstance(answer, list):
+        answer = [str(option).strip() for option in answer]
+    else:
+        answer = str(answer).strip()
+
+    return str(record["username"]).strip(), question_id, answer
+
+
+def iter_submissions(records, errors, start=0):
+    submission = None
+    for position, record in enumerate(records, start=1):
+        if position <= start:
+            continue
+
+        try:
+            username, question_id, answer = normalize_row(record)
+        except InvalidSubmission as e:
+            errors.append((position, str(e)))
+            continue
+
+        if submission is None or submission.username != username:
+            if submission is not None:
+                yield submission
+            submission = Submission(username, position)
+        try:
+            submission.add(position, question_id, answer)
+        except InvalidSubmission as e:
+            errors.append((position, str(e)))
+
+    if submission is not None:
+        yield submission
+
+
+def submission_answers(question, answer):
+    if question["question_type"] != Question.MULTIPLE_SELECT and isinstance(answer, list):
+        return ", ".join(answer)
+    return answer
+
+
+class ClassSubmissionImport:
+    def __init__(self, defer_grading=False):
+        self.defer_grading = defer_grading
+        self.questions = {}
+        self.errors = []
+        self.saved = 0
+
+    def load_questions(self, submissions):
+        missing = {
+            int(question_id)
+            for submission in submissions
+            for question_id in submission.answers
+            if int(question_id) not in self.questions
+        }
+        if missing:
+            for question in Question.objects.filter(pk__in=missing):
+                self.questions[question.id] = question.as_dict()
+
+    def prepare(self, submissions):
+        accounts = Account.objects.in_bulk({submission.username for submission in submissions}, field_name="username")
+        self.load_questions(submissions)
+
+        prepared = []
+        for submission in submissions:
+            user = accounts.get(submission.username)
+            if user is None:
+                self.errors.append((submission.first_row, f"Unknown username '{submission.username}'."))
+                continue
+
+            questions = []
+            answers = {}
+            for question_id, answer in submission.answers.items():
+                question = self.questions.get(int(question_id))
+                if question is None:
+                    self.errors.append((submission.rows[question_id], f"Unknown question id {question_id}."))
+                    continue
+                questions.append(question)
+                answers[question_id] = submission_answers(question, answer)
+
+            if questions:
+                questions.sort(key=lambda question: question["id"])
+                prepared.append((user, questions, answers))
+        return prepared
+
+    def grade(self, prepared):
+        items = [long_answer_items(questions, answers) for _, questions, answers in prepared]
+        if self.defer_grading:
+            return [[None] * len(submission_items) for submission_items in items]
+
+        by_topic = {}
+        for position, (_, questions, _) in enumerate(prepared):
+            by_topic.setdefault(quiz_topic(questions), []).append(position)
+
+        marks = [None] * len(prepared)
+        for topic, positions in by_topic.items():
+            topic_marks = iter(mark_long_answers([item for position in positions for item in items[position]], topic))
+            for position in positions:
+                marks[position] = [next(topic_marks) for _ in items[position]]
+        return marks
+
+    def score(self, prepared):
+        papers = {}
+        for position, (_, questions, _) in enumerate(prepared):
+            papers.setdefault(tuple(question["id"] for question in questions), []).append(position)
+
+        marks = [None] * len(prepared)
+        for positions in papers.values():
+            questions = prepared[positions[0]][1]
+            scores = score_submissions(questions, [prepared[position][2] for position in positions])
+            for position, submission_marks in zip(positions, scores):
+                marks[position] = submission_marks
+        return marks
+
+    def save(self, prepared, marks):
+        created_at = now()
+        quizzes = []
+        quiz_questions = []
+        for (user, questions, answers), long_answer_marks, objective in zip(prepared, marks, self.score(prepared)):
+            scored = build_quiz_questions(questions, answers, long_answer_marks, objective)
+            percentage = quiz_percentage(scored)
+            difficulties = {question["difficulty"] for question in questions}
+            quizzes.append(CompletedQuiz(
+                user=user,
+                topic=quiz_topic(questions),
+                number_of_questions=len(scored),
+                difficulty=difficulties.pop() if len(difficulties) == 1 else None,
+                grade=grade_for_percentage(percentage),
+                percentage=percentage,
+                status=CompletedQuiz.PENDING if any(question.pending for question in scored) else CompletedQuiz.GRADED,
+                created_at=created_at,
+            ))
+            quiz_questions.append(scored)
+
+        with transaction.atomic():
+            quizzes = CompletedQuiz.objects.bulk_create(quizzes)
+            for quiz, scored in zip(quizzes, quiz_questions):
+                for question in scored:
+                    question.quiz = quiz
+            CompletedQuizQuestion.objects.bulk_create(
+                [question for scored in quiz_questions for question in scored], batch_size=500
+            )
+            GradingJob.objects.bulk_create(
+                [GradingJob(quiz=quiz) for quiz in quizzes if quiz.status == CompletedQuiz.PENDING]
+            )
+            record_quizzes_stats(quizzes)
+            for user, questions, _ in prepared:
+                remember_questions(user, [question["id"] for question in questions])
+            for user_id in {quiz.user_id for quiz in quizzes}:
+                invalidate_history(user_id)
+
+        return quizzes
+
+    def process(self, submissions):
+        prepared = self.prepare(submissions)
+        if prepared:
+            self.saved += len(self.save(prepared, self.grade(prepared)))
+
+    def run(self, records, batch_size=50, start=0, progress=None):
+        batch = []
+        for submission in iter_submissions(records, self.errors, start):
+            batch.append(submission)
+            if len(batch) >= batch_size:
+                self.process(batch)
+                if progress:
+                    progress(batch[-1].last_row, self)
+                batch = []
+
+        if batch:
+            self.process(batch)
+            if progress:
+                progress(batch[-1].last_row, self)
+
+        return self.saved, self.errors
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", {})
+    if connection.vendor != "sqlite" or not pragmas:
+        return
+
+    with connection.cursor() as cursor:
+        for pragma, value in pragmas.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
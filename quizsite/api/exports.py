@@ -0,0 +1,93 @@
+import csv
+import json
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.utils.timezone import make_aware
+from .models import CompletedQuiz, CompletedQuizQuestion
+
+QUIZ_FIELDS = [
+    ("quiz_id", "id"),
+    ("username", "user__username"),
+    ("year_group", "user__year_group"),
+    ("topic", "topic"),
+    ("difficulty", "difficulty"),
+    ("number_of_questions", "number_of_questions"),
+    ("grade", "grade"),
+    ("percentage", "percentage"),
+    ("status", "status"),
+    ("created_at", "created_at"),
+]
+
+QUESTION_FIELDS = [
+    ("question_id", "id"),
+    ("quiz_id", "quiz_id"),
+    ("username", "quiz__user__username"),
+    ("year_group", "quiz__user__year_group"),
+    ("topic", "quiz__topic"),
+    ("difficulty", "quiz__difficulty"),
+    ("created_at", "quiz__created_at"),
+    ("question_text", "question_text"),
+    ("answer_key", "answer_key"),
+    ("submitted_answer", "submitted_answer"),
+    ("marks", "marks"),
+    ("total_marks", "total_marks"),
+    ("is_correct", "is_correct"),
+]
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def parse_date(value):
+    return make_aware(datetime.strptime(value, "%Y-%m-%d"))
+
+
+def export_filters(params, prefix=""):
+    filters = {}
+    if params.get("username"):
+        filters[f"{prefix}user__username__iexact"] = params["username"]
+    if params.get("topic"):
+        filters[f"{prefix}topic"] = params["topic"]
+    if params.get("difficulty"):
+        filters[f"{prefix}difficulty"] = params["difficulty"]
+    if params.get("year_group"):
+        filters[f"{prefix}user__year_group"] = int(params["year_group"])
+    if params.get("start"):
+        filters[f"{prefix}created_at__gte"] = parse_date(params["start"])
+    if params.get("end"):
+        filters[f"{prefix}created_at__lt"] = parse_date(params["end"]) + timedelta(days=1)
+    return filters
+
+
+def quiz_rows(params):
+    return (
+        CompletedQuiz.objects.filter(**export_filters(params))
+        .order_by("id")
+        .values_list(*(field for _, field in QUIZ_FIELDS))
+    )
+
+
+def question_rows(params):
+    return (
+        CompletedQuizQuestion.objects.filter(**export_filters(params, prefix="quiz__"))
+        .order_by("id")
+        .values_list(*(field for _, field in QUESTION_FIELDS))
+    )
+
+
+def export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows.iterator(chunk_size=getattr(settings, "EXPORT_CHUNK_SIZE", 2000)):
+        yield writer.writerow([export_value(value) for value in row])
+
+
+def stream_jsonl(columns, rows):
+    for row in rows.iterator(chunk_size=getattr(settings, "EXPORT_CHUNK_SIZE", 2000)):
+        yield json.dumps(dict(zip(columns, map(export_value, row)))) + "\n"
@@ -0,0 +1,108 @@
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .graders import deterministic_marks
+
+
+def grade_request(body):
+    messages = body.get("messages", [])
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+
+    if body.get("response_format"):
+        items = json.loads(user)
+        return json.dumps({"grades": [
+            {"id": item["id"], "marks": deterministic_marks(item["student_answer"], item["mark_scheme"], item["max_marks"])}
+            for item in items
+        ]})
+
+    marks = re.search(r"between 0 and (\d+)", system)
+    parts = re.match(r"Student answer: (.*)\nMark scheme: (.*)", user, re.DOTALL)
+    if not marks or not parts:
+        return "0"
+    return str(deterministic_marks(parts.group(1), parts.group(2), int(marks.group(1))))
+
+
+class FakeGraderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        super().__init__(address, FakeGraderHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.requests_served = 0
+        self.errors_served = 0
+
+    def next_delay_and_error(self):
+        with self.lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            error = self.random.random() < self.error_rate
+            return delay, error, next(self.ids)
+
+
+class FakeGraderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+
+        delay, error, request_id = self.server.next_delay_and_error()
+        if delay:
+            time.sleep(delay)
+
+        if error:
+            with self.server.lock:
+                self.server.errors_served += 1
+            status = 429 if request_id % 2 else 500
+            self.send_json(status, {"error": {"message": "Injected fake grader error", "type": "server_error"}})
+            return
+
+        content = grade_request(body)
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+        with self.server.lock:
+            self.server.requests_served += 1
+        self.send_json(200, {
+            "id": f"chatcmpl-fake-{request_id}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake-grader"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content.split()),
+                "total_tokens": prompt_tokens + len(content.split()),
+            },
+        })
+
+
+def serve(host="127.0.0.1", port=8765, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+    server = FakeGraderServer((host, port), latency, jitter, error_rate, seed)
+    thread = threading.Thread(target=server.serve_forever, name="fake-grader", daemon=True)
+    thread.start()
+    return server, thread
@@ -0,0 +1,257 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+import weakref
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from .grading_client import CircuitBreaker, InvalidGrade, record_usage
+
+SYSTEM_PROMPT = "You are a grader, all you will return is a numerical answer between 0 and {marks} for the question depending on how correct the answer is. Answers not explicitly mentioned in the mark scheme may be correct. Therefore where BOD is present in the mark scheme, give benefit of the doubt."
+
+BATCH_SYSTEM_PROMPT = "You are a grader. For each item, award a whole number of marks between 0 and that item's max_marks depending on how correct the student answer is. Answers not explicitly mentioned in the mark scheme may be correct. Therefore where BOD is present in the mark scheme, give benefit of the doubt. Return one grade per item id."
+
+BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "grades",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "grades": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "integer"},
+                            "marks": {"type": "integer"},
+                        },
+                        "required": ["id", "marks"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["grades"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def single_messages(answer, answer_key, marks):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT.format(marks=marks)},
+        {"role": "user", "content": f"Student answer: {answer}\nMark scheme: {answer_key}"},
+    ]
+
+
+def batch_messages(items):
+    return [
+        {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+        {"role": "user", "content": json.dumps([
+            {"id": i, "student_answer": answer, "mark_scheme": answer_key, "max_marks": int(marks)}
+            for i, (answer, answer_key, marks) in enumerate(items)
+        ])},
+    ]
+
+
+def parse_batch_grades(content, items):
+    try:
+        grades = json.loads(content)["grades"]
+    except (TypeError, ValueError, KeyError):
+        return {}
+
+    parsed = {}
+    for grade in grades if isinstance(grades, list) else []:
+        if not isinstance(grade, dict):
+            continue
+        item_id, marks = grade.get("id"), grade.get("marks")
+        if (
+            isinstance(item_id, int) and 0 <= item_id < len(items)
+            and isinstance(marks, int) and not isinstance(marks, bool)
+            and 0 <= marks <= int(items[item_id][2])
+        ):
+            parsed.setdefault(item_id, marks)
+    return parsed
+
+
+def parse_marks(content, marks):
+    match = re.search(r"-?\d+", str(content or ""))
+    if match is None:
+        raise InvalidGrade(f"Grader returned a non-numeric reply: {str(content)[:100]!r}")
+    return min(max(int(match.group()), 0), int(marks))
+
+
+def deterministic_marks(answer, answer_key, marks):
+    key_terms = set(re.findall(r"\w{3,}", str(answer_key).casefold()))
+    if not key_terms:
+        return 0
+    answer_terms = set(re.findall(r"\w{3,}", str(answer).casefold()))
+    return min(int(marks), round(int(marks) * len(key_terms & answer_terms) / len(key_terms)))
+
+
+class BaseGrader:
+    model = "base"
+
+    def __init__(self, **options):
+        self.options = options
+        self.breaker = CircuitBreaker()
+
+    def mark_answer(self, answer, answer_key, marks):
+        raise NotImplementedError
+
+    def mark_answers(self, items):
+        return [self.mark_answer(*item) for item in items]
+
+    async def amark_answer(self, answer, answer_key, marks):
+        return await sync_to_async(self.mark_answer, thread_sensitive=False)(answer, answer_key, marks)
+
+    async def amark_answers(self, items):
+        return await sync_to_async(self.mark_answers, thread_sensitive=False)(items)
+
+
+class OpenAIGrader(BaseGrader):
+    model = "gpt-4o-mini"
+
+    def __init__(self, model=None, client=None, **options):
+        super().__init__(**options)
+        self.model = model or self.model
+        self._client = client
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def client_options(self):
+        return {
+            "api_key": self.options.get("api_key") or os.getenv("OPENAI_API_KEY"),
+            "timeout": getattr(settings, "GRADING_TIMEOUT", 30),
+            "max_retries": 0,
+            **{k: v for k, v in self.options.items() if k != "api_key"},
+        }
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import openai
+
+                    self._client = openai.OpenAI(**self.client_options())
+        return self._client
+
+    @property
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            import openai
+
+            client = self._async_clients[loop] = openai.AsyncOpenAI(**self.client_options())
+        return client
+
+    def complete(self, messages, **kwargs):
+        response = self.client.chat.completions.create(model=self.model, messages=messages, **kwargs)
+        record_usage(getattr(response, "usage", None))
+        return response.choices[0].message.content
+
+    def mark_answer(self, answer, answer_key, marks):
+        return parse_marks(self.complete(single_messages(answer, answer_key, marks)), marks)
+
+    def mark_answers(self, items):
+        if not items:
+            return []
+        if len(items) == 1:
+            return [self.mark_answer(*items[0])]
+
+        grades = parse_batch_grades(
+            self.complete(batch_messages(items), response_format=BATCH_RESPONSE_FORMAT), items
+        )
+        return [grades[i] if i in grades else self.mark_answer(*item) for i, item in enumerate(items)]
+
+    async def acomplete(self, messages, **kwargs):
+        response = await self.async_client.chat.completions.create(model=self.model, messages=messages, **kwargs)
+        record_usage(getattr(response, "usage", None))
+        return response.choices[0].message.content
+
+    async def amark_answer(self, answer, answer_key, marks):
+        return parse_marks(await self.acomplete(single_messages(answer, answer_key, marks)), marks)
+
+    async def amark_answers(self, items):
+        if not items:
+            return []
+        if len(items) == 1:
+            return [await self.amark_answer(*items[0])]
+
+        grades = parse_batch_grades(
+            await self.acomplete(batch_messages(items), response_format=BATCH_RESPONSE_FORMAT), items
+        )
+        missing = [i for i in range(len(items)) if i not in grades]
+        regraded = await asyncio.gather(*(self.amark_answer(*items[i]) for i in missing))
+        grades.update(zip(missing, regraded))
+        return [grades[i] for i in range(len(items))]
+
+
+class HTTPFakeGrader(OpenAIGrader):
+    model = "fake-grader"
+
+    def __init__(self, base_url=None, api_key="fake", **options):
+        super().__init__(
+            base_url=base_url or os.getenv("FAKE_GRADER_URL", "http://127.0.0.1:8765/v1"),
+            api_key=api_key,
+            **options,
+        )
+
+
+class DeterministicGrader(BaseGrader):
+    model = "deterministic"
+
+    def __init__(self, latency=0, **options):
+        super().__init__(**options)
+        self.latency = latency
+
+    def mark_answer(self, answer, answer_key, marks):
+        if self.latency:
+            time.sleep(self.latency)
+        return deterministic_marks(answer, answer_key, marks)
+
+    def mark_answers(self, items):
+        if self.latency:
+            time.sleep(self.latency)
+        return [deterministic_marks(*item) for item in items]
+
+    async def amark_answer(self, answer, answer_key, marks):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return deterministic_marks(answer, answer_key, marks)
+
+    async def amark_answers(self, items):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [deterministic_marks(*item) for item in items]
+
+
+_grader = None
+_grader_lock = threading.Lock()
+
+
+def get_grader():
+    global _grader
+    if _grader is None:
+        with _grader_lock:
+            if _grader is None:
+                config = getattr(settings, "GRADER", {})
+                backend = import_string(config.get("BACKEND", "api.graders.OpenAIGrader"))
+                _grader = backend(**config.get("OPTIONS", {}))
+    return _grader
+
+
+@receiver(setting_changed)
+def reset_grader(setting, **kwargs):
+    global _grader
+    if setting == "GRADER":
+        _grader = None
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.dispatch import receiver
+from django.utils.timezone import now
+from .models import GradedAnswer
+from .signals import mark_scheme_changed
+
+logger = logging.getLogger(__name__)
+
+TRAILING_PUNCTUATION = ".,;:!?"
+
+
+def normalize_answer(answer):
+    return " ".join(str(answer).casefold().split()).rstrip(TRAILING_PUNCTUATION).rstrip()
+
+
+def scheme_hash(answer_key, marks):
+    return hashlib.sha256(json.dumps([answer_key, int(marks)]).encode()).hexdigest()
+
+
+def cache_key(answer, answer_key, marks, model):
+    payload = json.dumps([model, scheme_hash(answer_key, marks), normalize_answer(answer)])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class GradingCache:
+    def __init__(self, max_size=None, ttl=None):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    @property
+    def max_size(self):
+        return self._max_size or getattr(settings, "GRADING_CACHE_SIZE", 1024)
+
+    @property
+    def ttl(self):
+        return timedelta(seconds=self._ttl or getattr(settings, "GRADING_CACHE_TTL", 30 * 24 * 60 * 60))
+
+    def _remember(self, key, scheme, marks, created_at):
+        with self._lock:
+            self._entries[key] = (scheme, marks, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get(self, answer, answer_key, marks, model):
+        key = cache_key(answer, answer_key, marks, model)
+        expires_before = now() - self.ttl
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] < expires_before:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return entry[1]
+
+        graded = GradedAnswer.objects.filter(key=key, created_at__gte=expires_before).first()
+        if graded is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        self._remember(key, graded.scheme_hash, graded.marks, graded.created_at)
+        with self._lock:
+            self.db_hits += 1
+        return graded.marks
+
+    def set(self, answer, answer_key, marks, model, awarded):
+        key = cache_key(answer, answer_key, marks, model)
+        scheme = scheme_hash(answer_key, marks)
+        created_at = now()
+        self._remember(key, scheme, awarded, created_at)
+        try:
+            with transaction.atomic():
+                GradedAnswer.objects.bulk_create(
+                    [GradedAnswer(key=key, scheme_hash=scheme, model=model, marks=awarded, created_at=created_at)],
+                    update_conflicts=True,
+                    unique_fields=["key"],
+                    update_fields=["scheme_hash", "model", "marks", "created_at"],
+                )
+        except DatabaseError:
+            logger.warning("Could not store graded answer %s", key[:12], exc_info=True)
+
+    def invalidate_schemes(self, schemes):
+        schemes = set(schemes)
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[0] in schemes]:
+                del self._entries[key]
+        GradedAnswer.objects.filter(scheme_hash__in=schemes).delete()
+
+    def prune(self):
+        return GradedAnswer.objects.filter(created_at__lt=now() - self.ttl).delete()[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.memory_hits = self.db_hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.db_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+            }
+
+
+grading_cache = GradingCache()
+
+
+@receiver(mark_scheme_changed)
+def invalidate_changed_mark_schemes(sender, questions, **kwargs):
+    grading_cache.invalidate_schemes(
+        scheme_hash(question["answer_key"], question["marks"]) for question in questions
+    )
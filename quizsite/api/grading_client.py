@@ -0,0 +1,228 @@
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from .metrics import record_grading_call
+from .models import GradingCall
+
+current_call = contextvars.ContextVar("current_grading_call", default=None)
+current_session = contextvars.ContextVar("current_grading_session", default=None)
+
+
+class GradingError(Exception):
+    pass
+
+
+class GradingUnavailable(GradingError):
+    pass
+
+
+class GradingFailed(GradingError):
+    pass
+
+
+class InvalidGrade(GradingError):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=None, reset_timeout=None):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def failure_threshold(self):
+        return self._failure_threshold or getattr(settings, "GRADING_BREAKER_THRESHOLD", 5)
+
+    @property
+    def reset_timeout(self):
+        return self._reset_timeout or getattr(settings, "GRADING_BREAKER_RESET_TIMEOUT", 30)
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def reset(self):
+        self.record_success()
+
+
+def record_usage(usage):
+    call = current_call.get()
+    if call is not None and usage is not None:
+        call["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+        call["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+
+def retryable(error):
+    if isinstance(error, (InvalidGrade, TimeoutError, ConnectionError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code == 429 or status_code >= 500
+    try:
+        import openai
+    except ImportError:
+        return False
+    return isinstance(error, (openai.APITimeoutError, openai.APIConnectionError))
+
+
+def backoff_delays():
+    base = getattr(settings, "GRADING_BACKOFF_BASE", 0.5)
+    cap = getattr(settings, "GRADING_BACKOFF_MAX", 8)
+    for attempt in range(getattr(settings, "GRADING_MAX_RETRIES", 2)):
+        yield random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def outcome_for(error):
+    if isinstance(error, GradingUnavailable):
+        return GradingCall.REJECTED
+    if isinstance(error, InvalidGrade):
+        return GradingCall.INVALID
+    if isinstance(error, TimeoutError) or type(error).__name__ == "APITimeoutError":
+        return GradingCall.TIMEOUT
+    return GradingCall.ERROR
+
+
+def start_call(model, items):
+    return {
+        "model": model,
+        "items": items,
+        "attempts": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "started": time.perf_counter(),
+    }
+
+
+def finish_call(call, error=None):
+    latency = time.perf_counter() - call.pop("started")
+    outcome = GradingCall.OK if error is None else outcome_for(error)
+    record_grading_call(call["model"], latency, outcome)
+
+    session = current_session.get()
+    if session is not None:
+        session.append(GradingCall(
+            latency_ms=round(latency * 1000, 2),
+            outcome=outcome,
+            error=str(error or "")[:500],
+            **call,
+        ))
+
+
+def call_grader(grader, method, args, items=1):
+    breaker = grader.breaker
+    call = start_call(grader.model, items)
+    token = current_call.set(call)
+    delays = backoff_delays()
+    try:
+        while True:
+            if not breaker.allow():
+                raise GradingUnavailable("Grading circuit breaker is open.")
+            call["attempts"] += 1
+            try:
+                result = getattr(grader, method)(*args)
+            except Exception as e:
+                breaker.record_failure()
+                delay = next(delays, None) if retryable(e) else None
+                if delay is None:
+                    raise GradingFailed(str(e)) from e
+                time.sleep(delay)
+                continue
+            breaker.record_success()
+            finish_call(call)
+            return result
+    except GradingError as e:
+        finish_call(call, e.__cause__ or e)
+        raise
+    finally:
+        current_call.reset(token)
+
+
+async def acall_grader(grader, method, args, items=1):
+    breaker = grader.breaker
+    call = start_call(grader.model, items)
+    token = current_call.set(call)
+    delays = backoff_delays()
+    try:
+        while True:
+            if not breaker.allow():
+                raise GradingUnavailable("Grading circuit breaker is open.")
+            call["attempts"] += 1
+            try:
+                result = await asyncio.wait_for(
+                    getattr(grader, method)(*args), getattr(settings, "GRADING_TIMEOUT", 30)
+                )
+            except Exception as e:
+                breaker.record_failure()
+                delay = next(delays, None) if retryable(e) else None
+                if delay is None:
+                    raise GradingFailed(str(e)) from e
+                await asyncio.sleep(delay)
+                continue
+            breaker.record_success()
+            finish_call(call)
+            return result
+    except GradingError as e:
+        finish_call(call, e.__cause__ or e)
+        raise
+    finally:
+        current_call.reset(token)
+
+
+@contextmanager
+def grading_session():
+    calls = []
+    token = current_session.set(calls)
+    try:
+        yield calls
+    finally:
+        current_session.reset(token)
+
+
+def save_grading_calls(calls, topic=""):
+    for call in calls:
+        call.topic = topic or ""
+    if calls:
+        GradingCall.objects.bulk_create(calls)
@@ -0,0 +1,174 @@
+import logging
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils.timezone import now
+from .graders import get_grader
+from .grading_client import GradingFailed, GradingUnavailable
+from .models import CompletedQuiz, CompletedQuizQuestion, GradingJob
+from .stats import record_quiz_stats
+from .utils import grade_for_percentage, mark_long_answers, quiz_percentage
+
+logger = logging.getLogger(__name__)
+
+
+def claim_next_job():
+    stale_before = now() - timedelta(seconds=getattr(settings, "GRADING_JOB_TIMEOUT", 300))
+    claimable = Q(status=GradingJob.QUEUED) | Q(status=GradingJob.RUNNING, started_at__lt=stale_before)
+
+    for job_id in GradingJob.objects.filter(claimable).order_by("created_at").values_list("id", flat=True)[:10]:
+        claimed = GradingJob.objects.filter(claimable, pk=job_id).update(
+            status=GradingJob.RUNNING, started_at=now(), attempts=F("attempts") + 1
+        )
+        if claimed:
+            return GradingJob.objects.select_related("quiz").get(pk=job_id)
+
+    return None
+
+
+def owned_job(job):
+    return GradingJob.objects.filter(pk=job.pk, status=GradingJob.RUNNING, started_at=job.started_at)
+
+
+def finish_job(job, quiz_questions, pending):
+    finished_at = now()
+    with transaction.atomic():
+        if not owned_job(job).update(status=GradingJob.DONE, error="", finished_at=finished_at):
+            return False
+
+        quiz = job.quiz
+        quiz.percentage = quiz_percentage(quiz_questions)
+        quiz.grade = grade_for_percentage(quiz.percentage)
+        quiz.status = CompletedQuiz.GRADED
+        CompletedQuizQuestion.objects.bulk_update(pending, ["marks", "is_correct", "pending"])
+        quiz.save(update_fields=["percentage", "grade", "status"])
+        record_quiz_stats(quiz)
+
+    job.status = GradingJob.DONE
+    job.error = ""
+    job.finished_at = finished_at
+    return True
+
+
+def fail_job(job, error):
+    if isinstance(error, GradingUnavailable):
+        if owned_job(job).update(status=GradingJob.QUEUED, attempts=F("attempts") - 1, error=str(error)):
+            job.status = GradingJob.QUEUED
+            job.attempts -= 1
+            job.error = str(error)
+        return
+
+    max_attempts = getattr(settings, "GRADING_JOB_MAX_ATTEMPTS", 3)
+    status = GradingJob.FAILED if job.attempts >= max_attempts else GradingJob.QUEUED
+    finished_at = now() if status == GradingJob.FAILED else None
+    if owned_job(job).update(status=status, error=str(error), finished_at=finished_at):
+        job.status = status
+        job.error = str(error)
+        job.finished_at = finished_at
+
+
+def grading_error():
+    breaker = get_grader().breaker
+    if breaker.state != breaker.CLOSED:
+        return GradingUnavailable("Grading circuit breaker is open.")
+    return GradingFailed("Grading failed for some answers.")
+
+
+def grade_topic(topic, jobs):
+    quiz_questions = {job.pk: list(job.quiz.questions.order_by("id")) for job in jobs}
+    pending_by_job = {
+        job.pk: [question for question in quiz_questions[job.pk] if question.pending] for job in jobs
+    }
+    pending = [question for job in jobs for question in pending_by_job[job.pk]]
+
+    try:
+        marks = iter(mark_long_answers(
+            [(question.submitted_answer, question.answer_key, question.total_marks) for question in pending],
+            topic,
+        ))
+    except Exception as e:
+        for job in jobs:
+            fail_job(job, e)
+        return not isinstance(e, GradingUnavailable)
+
+    available = True
+    for job in jobs:
+        job_marks = [next(marks) for _ in pending_by_job[job.pk]]
+        if None in job_marks:
+            error = grading_error()
+            available = available and not isinstance(error, GradingUnavailable)
+            fail_job(job, error)
+            continue
+
+        for question, _marks in zip(pending_by_job[job.pk], job_marks):
+            question.marks = _marks
+            question.is_correct = _marks == question.total_marks
+            question.pending = False
+        try:
+            finish_job(job, quiz_questions[job.pk], pending_by_job[job.pk])
+        except Exception as e:
+            fail_job(job, e)
+    return available
+
+
+def process_jobs(jobs):
+    jobs_by_topic = {}
+    for job in jobs:
+        jobs_by_topic.setdefault(job.quiz.topic, []).append(job)
+
+    available = True
+    for topic, topic_jobs in jobs_by_topic.items():
+        if not available:
+            for job in topic_jobs:
+                fail_job(job, GradingUnavailable("Grading circuit breaker is open."))
+            continue
+        available = grade_topic(topic, topic_jobs)
+    return available
+
+
+def claim_jobs(limit):
+    jobs = []
+    while len(jobs) < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        jobs.append(job)
+    return jobs
+
+
+def process_pending_jobs(limit=None):
+    batch_size = max(1, getattr(settings, "GRADING_JOBS_PER_BATCH", 10))
+    processed = 0
+    while limit is None or processed < limit:
+        jobs = claim_jobs(batch_size if limit is None else min(batch_size, limit - processed))
+        if not jobs:
+            break
+        if not process_jobs(jobs):
+            break
+        processed += len(jobs)
+    return processed
+
+
+def run_workers(workers, poll_interval, stop_event=None):
+    stop_event = stop_event or threading.Event()
+
+    def work():
+        try:
+            while not stop_event.is_set():
+                close_old_connections()
+                try:
+                    processed = process_pending_jobs(limit=getattr(settings, "GRADING_JOBS_PER_BATCH", 10))
+                except Exception:
+                    logger.exception("Grading worker %s failed; retrying.", threading.current_thread().name)
+                    processed = 0
+                if not processed:
+                    stop_event.wait(poll_interval)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=work, name=f"grading-worker-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    return threads, stop_event
@@ -0,0 +1,90 @@
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Account, CompletedQuiz
+
+
+def version_key(user_id):
+    return f"quiz_history_version:{user_id}"
+
+
+def new_version():
+    return time.time_ns()
+
+
+class HistoryCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def timeout(self):
+        return getattr(settings, "QUIZ_HISTORY_CACHE_TTL", 10 * 60)
+
+    def version(self, user_id):
+        version = cache.get(version_key(user_id))
+        if version is None:
+            version = new_version()
+            if not cache.add(version_key(user_id), version, None):
+                version = cache.get(version_key(user_id), version)
+        return version
+
+    def key(self, user_id, limit, include_questions, cursor):
+        return (
+            f"quiz_history:{user_id}:{self.version(user_id)}:{limit}:"
+            f"{'questions' if include_questions else 'summary'}:{cursor or ''}"
+        )
+
+    def get(self, key):
+        payload = cache.get(key)
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return payload
+
+    def set(self, key, payload):
+        cache.set(key, payload, self.timeout)
+
+    def invalidate(self, user_id):
+        cache.set(version_key(user_id), new_version(), None)
+
+    def clear(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+history_cache = HistoryCache()
+
+
+def invalidate_history(user_id):
+    history_cache.invalidate(user_id)
+    transaction.on_commit(lambda: history_cache.invalidate(user_id))
+
+
+@receiver(post_save, sender=CompletedQuiz)
+@receiver(post_delete, sender=CompletedQuiz)
+def invalidate_quiz_history(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_history(instance.user_id)
+
+
+@receiver(post_save, sender=Account)
+def reset_new_account_history(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        history_cache.invalidate(instance.pk)
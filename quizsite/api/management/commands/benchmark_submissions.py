@@ -0,0 +1,150 @@
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from api.benchmarks import latency_summary, run_in_temporary_database
+from api.models import Account, Question
+
+DEFAULT_SETTINGS_MODULES = ["quizsite.settings", "quizsite.settings_production"]
+
+SUBMIT_URLS = {"wsgi": "/api/submit-quiz/", "asgi": "/api/submit-quiz/async/"}
+
+
+def submission(buckets, rng, n):
+    questions = rng.choice(buckets)
+    questions = rng.sample(questions, min(5, len(questions)))
+    return {
+        "topic": questions[0].topic,
+        "difficulty": questions[0].difficulty,
+        "submitted_answers": {
+            str(question.id): (
+                question.answer_key if rng.random() < 0.5 else "I am not sure."
+            ) if question.question_type != Question.LONG_ANSWER else f"{question.answer_key} (attempt {n})"
+            for question in questions
+        },
+    }
+
+
+def summarize(interface, results, elapsed, concurrency):
+    return {
+        "settings": os.environ.get("DJANGO_SETTINGS_MODULE", ""),
+        "interface": interface,
+        "debug": settings.DEBUG,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        **latency_summary(
+            [latency for latency, _ in results], elapsed,
+            errors=sum(1 for _, status_code in results if status_code >= 400),
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = "Measure submit-quiz throughput under concurrent submits for settings modules and server interfaces."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=8, help="WSGI worker threads.")
+        parser.add_argument("--in-flight", type=int, default=0, help="ASGI in-flight requests (0 = all).")
+        parser.add_argument("--grader-latency", type=float, default=0.0, help="Seconds per grading call.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--settings-module", action="append", dest="settings_modules")
+        parser.add_argument("--interface", action="append", dest="interfaces", choices=sorted(SUBMIT_URLS))
+        parser.add_argument("--worker", action="store_true", help="Run the load against the configured database.")
+
+    def handle(self, *args, **options):
+        options["interfaces"] = options["interfaces"] or ["wsgi"]
+        if options["worker"]:
+            self.stdout.write(json.dumps(self.run_load(options)))
+            return
+
+        results = [result
+                   for module in options["settings_modules"] or DEFAULT_SETTINGS_MODULES
+                   for result in self.run_settings_module(module, options)]
+
+        self.stdout.write(
+            f"{'settings':<32}{'interface':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}"
+        )
+        for result in results:
+            self.stdout.write(
+                f"{result['settings']:<32}{result['interface']:>10}{result['throughput']:>10.1f}"
+                f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['errors']:>8}"
+            )
+
+    def run_settings_module(self, module, options):
+        args = [
+            "benchmark_submissions", "--worker",
+            "--requests", str(options["requests"]), "--concurrency", str(options["concurrency"]),
+            "--in-flight", str(options["in_flight"]), "--grader-latency", str(options["grader_latency"]),
+            "--seed", str(options["seed"]),
+        ]
+        for interface in options["interfaces"]:
+            args += ["--interface", interface]
+        output = run_in_temporary_database(
+            args, module, env={"GRADER_BACKEND": "api.graders.DeterministicGrader"}
+        )
+        return json.loads(output.strip().splitlines()[-1])
+
+    def run_load(self, options):
+        rng = random.Random(options["seed"])
+        user = Account.objects.create_user(
+            first_name="Bench", last_name="Mark", date_of_birth=date(2008, 1, 1), year_group=12, password="benchmark"
+        )
+        token = str(RefreshToken.for_user(user).access_token)
+
+        buckets = {}
+        for question in Question.objects.order_by("id"):
+            buckets.setdefault((question.topic, question.difficulty), []).append(question)
+        buckets = list(buckets.values())
+
+        grader = {"BACKEND": "api.graders.DeterministicGrader", "OPTIONS": {"latency": options["grader_latency"]}}
+        results = []
+        with override_settings(GRADER=grader):
+            for interface in options["interfaces"]:
+                payloads = [submission(buckets, rng, n) for n in range(options["requests"])]
+                connection.close()
+                run = self.run_wsgi if interface == "wsgi" else self.run_asgi
+                results.append(run(payloads, token, options))
+        return results
+
+    def run_wsgi(self, payloads, token, options):
+        def submit(payload):
+            client = Client(HTTP_AUTHORIZATION=f"Bearer {token}", raise_request_exception=False)
+            started = time.perf_counter()
+            response = client.post(SUBMIT_URLS["wsgi"], payload, content_type="application/json")
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            results = list(executor.map(submit, payloads))
+        return summarize("wsgi", results, time.perf_counter() - started, options["concurrency"])
+
+    def run_asgi(self, payloads, token, options):
+        in_flight = options["in_flight"] or len(payloads)
+
+        async def run():
+            client = AsyncClient(raise_request_exception=False)
+            semaphore = asyncio.Semaphore(in_flight)
+
+            async def submit(payload):
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.post(
+                        SUBMIT_URLS["asgi"], payload, content_type="application/json",
+                        headers={"Authorization": f"Bearer {token}"},
+                    )
+                    return time.perf_counter() - started, response.status_code
+
+            return await asyncio.gather(*(submit(payload) for payload in payloads))
+
+        started = time.perf_counter()
+        results = asyncio.run(run())
+        return summarize("asgi", results, time.perf_counter() - started, in_flight)
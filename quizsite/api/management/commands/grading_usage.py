@@ -0,0 +1,38 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+from api.benchmarks import percentile
+from api.models import GradingCall
+
+
+class Command(BaseCommand):
+    help = "Summarise LLM grading calls per topic: volume, failures, token usage and tail latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7)
+
+    def handle(self, *args, **options):
+        calls = (
+            GradingCall.objects.filter(created_at__gte=now() - timedelta(days=options["days"]))
+            .order_by("topic", "latency_ms")
+            .values_list("topic", "outcome", "latency_ms", "prompt_tokens", "completion_tokens")
+        )
+
+        topics = {}
+        for topic, outcome, latency_ms, prompt_tokens, completion_tokens in calls.iterator():
+            summary = topics.setdefault(topic or "-", {"calls": 0, "failed": 0, "tokens": 0, "latencies": []})
+            summary["calls"] += 1
+            summary["failed"] += outcome != GradingCall.OK
+            summary["tokens"] += prompt_tokens + completion_tokens
+            summary["latencies"].append(latency_ms)
+
+        self.stdout.write(
+            f"{'topic':<24}{'calls':>8}{'failed':>8}{'tokens':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        )
+        for topic, summary in topics.items():
+            latencies = summary["latencies"]
+            self.stdout.write(
+                f"{topic:<24}{summary['calls']:>8}{summary['failed']:>8}{summary['tokens']:>10}"
+                f"{percentile(latencies, 0.5):>10.1f}{percentile(latencies, 0.95):>10.1f}"
+                f"{percentile(latencies, 0.99):>10.1f}"
+            )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.question_import import import_questions, iter_records
+
+
+class Command(BaseCommand):
+    help = "Stream a JSON array or JSON-lines question bank into the Question table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["auto", "json", "jsonl"], default="auto")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--dry-run", action="store_true", help="Validate records without saving them.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], encoding="utf-8") as file:
+                imported, errors = import_questions(
+                    iter_records(file, options["format"]),
+                    batch_size=options["batch_size"],
+                    dry_run=options["dry_run"],
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+
+        for position, error in errors:
+            self.stderr.write(f"Record {position}: {error}")
+
+        verb = "Validated" if options["dry_run"] else "Imported"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {imported} questions, skipped {len(errors)} invalid records."))
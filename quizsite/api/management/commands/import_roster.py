@@ -0,0 +1,48 @@
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from api.roster_import import RosterImport, iter_roster_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create student accounts from a CSV roster with first_name, last_name, date_of_birth, year_group and "
+        "password columns, and write the allocated usernames."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--workers", type=int, help="Password hashing processes (defaults to PASSWORD_HASH_WORKERS).")
+        parser.add_argument("--output", help="CSV file for the created usernames (defaults to stdout).")
+
+    def handle(self, *args, **options):
+        def progress(row, roster_import):
+            self.stderr.write(f"Row {row}: created {len(roster_import.created)} accounts.")
+
+        roster_import = RosterImport(workers=options["workers"])
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as file:
+                created, errors = roster_import.run(
+                    iter_roster_rows(file), batch_size=max(1, options["batch_size"]), progress=progress
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+
+        output = open(options["output"], "w", newline="") if options["output"] else self.stdout
+        try:
+            writer = csv.writer(output)
+            writer.writerow(["row", "username", "first_name", "last_name"])
+            for position, account in created:
+                writer.writerow([position, account.username, account.first_name, account.last_name])
+        finally:
+            if options["output"]:
+                output.close()
+
+        for position, error in sorted(errors):
+            self.stderr.write(f"Row {position}: {error}")
+
+        message = f"Created {len(created)} accounts, skipped {len(errors)} invalid rows."
+        if options["output"]:
+            self.stdout.write(self.style.SUCCESS(message))
+        else:
+            self.stderr.write(message)
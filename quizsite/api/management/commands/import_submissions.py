@@ -0,0 +1,71 @@
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+from api.class_submissions import ClassSubmissionImport, iter_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Grade and save a class's quiz answers from a CSV or JSON-lines file of username, question_id and answer "
+        "rows. Rows for each student must be contiguous; each run of rows becomes one completed quiz."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["auto", "csv", "jsonl"], default="auto")
+        parser.add_argument("--batch-size", type=int, default=50, help="Submissions graded and saved together.")
+        parser.add_argument("--defer-grading", action="store_true", help="Queue long answers for the grading worker.")
+        parser.add_argument("--checkpoint", help="Progress file used to resume (defaults to <path>.checkpoint).")
+        parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint.")
+
+    def handle(self, *args, **options):
+        path = os.path.abspath(options["path"])
+        checkpoint = options["checkpoint"] or f"{path}.checkpoint"
+        start = 0 if options["restart"] else self.read_checkpoint(checkpoint, path)
+        if start:
+            self.stderr.write(f"Resuming after row {start}.")
+
+        def progress(row, submission_import):
+            self.write_checkpoint(checkpoint, path, row)
+            self.stderr.write(
+                f"Row {row}: saved {submission_import.saved} submissions, {len(submission_import.errors)} errors."
+            )
+
+        submission_import = ClassSubmissionImport(defer_grading=options["defer_grading"])
+        try:
+            with open(path, encoding="utf-8", newline="") as file:
+                saved, errors = submission_import.run(
+                    iter_rows(file, options["format"]),
+                    batch_size=max(1, options["batch_size"]),
+                    start=start,
+                    progress=progress,
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        for position, error in sorted(errors):
+            self.stderr.write(f"Row {position}: {error}")
+
+        self.stdout.write(self.style.SUCCESS(f"Saved {saved} submissions, skipped {len(errors)} invalid rows."))
+
+    def read_checkpoint(self, checkpoint, path):
+        try:
+            with open(checkpoint) as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read checkpoint {checkpoint}: {e}")
+
+        if state.get("path") != path:
+            raise CommandError(f"Checkpoint {checkpoint} belongs to {state.get('path')}; use --restart to ignore it.")
+        return int(state.get("row", 0))
+
+    def write_checkpoint(self, checkpoint, path, row):
+        temporary = f"{checkpoint}.tmp"
+        with open(temporary, "w") as file:
+            json.dump({"path": path, "row": row}, file)
+        os.replace(temporary, checkpoint)
@@ -0,0 +1,246 @@
+import json
+import os
+import platform
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max
+from django.test import Client, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from api.benchmarks import latency_summary, run_in_temporary_database
+from api.fake_grader import serve
+from api.metrics import registry
+from api.models import Account, Question
+from api.question_import import import_questions
+from api.search import index_accounts
+
+ENDPOINTS = ["questions", "submit_quiz", "user_completed_quizzes"]
+
+DIFFICULTIES = ["easy", "medium", "hard"]
+
+WORDS = "force mass energy cell atom market poem river empire vector signal protein".split()
+
+
+def synthetic_questions(count, topics, start_id, rng):
+    for n in range(count):
+        question_type = ["multiple_choice", "multiple_select", "long_answer"][n % 3]
+        options = rng.sample(WORDS, 4)
+        record = {
+            "id": start_id + n,
+            "topic": f"Load Topic {n % topics + 1}",
+            "difficulty": DIFFICULTIES[n // 3 % 3],
+            "question_type": question_type,
+            "question_text": f"Synthetic question {start_id + n}?",
+            "options": options,
+            "answer_key": options[0],
+            "marks": 1,
+        }
+        if question_type == "multiple_select":
+            record["answer_key"] = options[:2]
+            record["marks"] = 2
+        elif question_type == "long_answer":
+            record["options"] = []
+            record["answer_key"] = " ".join(rng.sample(WORDS, 5))
+            record["marks"] = 4
+        yield record
+
+
+def answer_for(question, rng, n):
+    if question["question_type"] == Question.MULTIPLE_CHOICE:
+        return rng.choice(question["options"])
+    if question["question_type"] == Question.MULTIPLE_SELECT:
+        return rng.sample(question["options"], rng.randint(1, len(question["options"])))
+    return f"{' '.join(rng.sample(question['answer_key'].split(), 3))} attempt {n}"
+
+
+def queries_per_request():
+    _, histograms = registry.snapshot()
+    return {
+        dict(labels)["view"]: round(total / count, 2)
+        for (name, labels), (_, _, total, count) in histograms.items()
+        if name == "quizmaster_db_queries_per_request" and count
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate concurrent students fetching quizzes, submitting answers and loading their history, "
+        "and report per-endpoint throughput, latency percentiles and query counts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=50)
+        parser.add_argument("--quizzes", type=int, default=3, help="Quizzes taken by each student.")
+        parser.add_argument("--questions", type=int, default=300, help="Synthetic questions to add to the bank.")
+        parser.add_argument("--topics", type=int, default=5)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--grader", choices=["fake", "deterministic"], default="fake")
+        parser.add_argument("--grader-latency", type=float, default=0.05)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", default="loadtest-results.json")
+        parser.add_argument("--baseline", help="Earlier results file to compare against.")
+        parser.add_argument("--settings-module", help="Settings module for the temporary database run.")
+        parser.add_argument(
+            "--in-place", action="store_true",
+            help="Seed and load the configured database instead of a temporary one.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["in_place"]:
+            args = ["load_test", "--in-place", "--output", os.path.abspath(options["output"])]
+            for option in ("students", "quizzes", "questions", "topics", "concurrency", "grader",
+                           "grader_latency", "seed"):
+                args += [f"--{option.replace('_', '-')}", str(options[option])]
+            if options["baseline"]:
+                args += ["--baseline", os.path.abspath(options["baseline"])]
+            self.stdout.write(run_in_temporary_database(args, options["settings_module"]), ending="")
+            return
+
+        rng = random.Random(options["seed"])
+        tokens = self.seed_accounts(options["students"])
+        self.seed_questions(options["questions"], options["topics"], rng)
+        quizzes = [
+            (token, [(f"Load Topic {rng.randint(1, options['topics'])}", rng.choice(DIFFICULTIES))
+                     for _ in range(options["quizzes"])], random.Random(rng.random()))
+            for token in tokens
+        ]
+
+        server = None
+        if options["grader"] == "fake":
+            server, _ = serve(port=0, latency=options["grader_latency"], seed=options["seed"])
+            grader = {"BACKEND": "api.graders.HTTPFakeGrader",
+                      "OPTIONS": {"base_url": f"http://127.0.0.1:{server.server_port}/v1"}}
+        else:
+            grader = {"BACKEND": "api.graders.DeterministicGrader",
+                      "OPTIONS": {"latency": options["grader_latency"]}}
+
+        registry.clear()
+        connection.close()
+        try:
+            with override_settings(GRADER=grader):
+                started = time.perf_counter()
+                if options["concurrency"] > 1:
+                    with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+                        students = list(executor.map(self.run_student, quizzes))
+                else:
+                    students = [self.run_student(student) for student in quizzes]
+                samples = [sample for student in students for sample in student]
+                elapsed = time.perf_counter() - started
+        finally:
+            if server is not None:
+                server.shutdown()
+
+        results = self.results(options, samples, elapsed)
+        with open(options["output"], "w") as file:
+            json.dump(results, file, indent=2)
+
+        self.report(results)
+        if options["baseline"]:
+            self.compare(results, options["baseline"])
+        self.stdout.write(f"Results written to {options['output']}")
+
+    def seed_accounts(self, count):
+        password = make_password("loadtest")
+        Account.objects.bulk_create([
+            Account(username=f"LOADTEST{n:05d}", first_name="Load", last_name=f"Student{n}",
+                    date_of_birth=date(2008, 9, 1), year_group=12, password=password)
+            for n in range(count)
+        ], ignore_conflicts=True)
+        accounts = list(Account.objects.filter(username__startswith="LOADTEST").order_by("username")[:count])
+        index_accounts(accounts)
+        return [str(RefreshToken.for_user(account).access_token) for account in accounts]
+
+    def seed_questions(self, count, topics, rng):
+        start_id = (Question.objects.aggregate(Max("id"))["id__max"] or 0) + 1
+        _, errors = import_questions(synthetic_questions(count, topics, start_id, rng))
+        if errors:
+            raise CommandError(f"Generated {len(errors)} invalid questions.")
+
+    def run_student(self, student):
+        token, quizzes, rng = student
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {token}", raise_request_exception=False)
+        samples = []
+
+        def timed(endpoint, method, *args, **kwargs):
+            started = time.perf_counter()
+            response = getattr(client, method)(*args, **kwargs)
+            samples.append((endpoint, time.perf_counter() - started, response.status_code))
+            return response
+
+        for n, (topic, difficulty) in enumerate(quizzes):
+            response = timed("questions", "get", "/api/questions/", {"topic": topic, "difficulty": difficulty})
+            questions = response.json() if response.status_code == 200 else []
+            if questions:
+                timed("submit_quiz", "post", "/api/submit-quiz/", {
+                    "topic": topic,
+                    "difficulty": difficulty,
+                    "submitted_answers": {str(q["id"]): answer_for(q, rng, n) for q in questions},
+                }, content_type="application/json")
+            timed("user_completed_quizzes", "get", "/api/completed-quizzes/")
+
+        if threading.current_thread() is not threading.main_thread():
+            connection.close()
+        return samples
+
+    def results(self, options, samples, elapsed):
+        queries = queries_per_request()
+        endpoints = {}
+        for endpoint in ENDPOINTS:
+            latencies = [latency for name, latency, _ in samples if name == endpoint]
+            errors = sum(1 for name, _, status_code in samples if name == endpoint and status_code >= 400)
+            endpoints[endpoint] = {
+                **latency_summary(latencies, elapsed, errors),
+                "queries_per_request": queries.get(endpoint, 0.0),
+            }
+
+        return {
+            "config": {key: options[key] for key in (
+                "students", "quizzes", "questions", "topics", "concurrency", "grader", "grader_latency", "seed"
+            )},
+            "environment": {
+                "settings": os.environ.get("DJANGO_SETTINGS_MODULE", ""),
+                "debug": settings.DEBUG,
+                "python": platform.python_version(),
+                "django": django.get_version(),
+            },
+            "elapsed_s": round(elapsed, 3),
+            "total": latency_summary(
+                [latency for _, latency, _ in samples], elapsed,
+                sum(1 for _, _, status_code in samples if status_code >= 400),
+            ),
+            "endpoints": endpoints,
+        }
+
+    def report(self, results):
+        self.stdout.write(
+            f"{'endpoint':<26}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'queries':>9}"
+        )
+        for endpoint, summary in results["endpoints"].items():
+            self.stdout.write(
+                f"{endpoint:<26}{summary['requests']:>9}{summary['errors']:>8}{summary['throughput']:>9.1f}"
+                f"{summary['p50_ms']:>9.1f}{summary['p95_ms']:>9.1f}{summary['p99_ms']:>9.1f}"
+                f"{summary['queries_per_request']:>9.1f}"
+            )
+
+    def compare(self, results, baseline_path):
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+
+        self.stdout.write(f"Change against {baseline_path}:")
+        for endpoint, summary in results["endpoints"].items():
+            before = baseline.get("endpoints", {}).get(endpoint)
+            if not before:
+                continue
+            changes = []
+            for metric in ("throughput", "p95_ms", "queries_per_request"):
+                if before[metric]:
+                    changes.append(f"{metric} {100 * (summary[metric] - before[metric]) / before[metric]:+.1f}%")
+            self.stdout.write(f"  {endpoint}: {', '.join(changes)}")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api.grading_cache import grading_cache
+
+
+class Command(BaseCommand):
+    help = "Delete cached long-answer grades older than GRADING_CACHE_TTL."
+
+    def handle(self, *args, **options):
+        deleted = grading_cache.prune()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired graded answers."))
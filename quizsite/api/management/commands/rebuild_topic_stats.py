@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api.stats import rebuild_topic_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-topic/difficulty report table from CompletedQuiz history."
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_topic_stats()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {rebuilt} topic/difficulty pairs."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from api.fake_grader import FakeGraderServer
+
+
+class Command(BaseCommand):
+    help = "Serve a local fake of the OpenAI chat-completions API for load tests and benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--latency", type=float, default=0.5, help="Base response latency in seconds.")
+        parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency in seconds.")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail.")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        server = FakeGraderServer(
+            (options["host"], options["port"]),
+            options["latency"],
+            options["jitter"],
+            options["error_rate"],
+            options["seed"],
+        )
+        self.stdout.write(f"Fake grader listening on http://{options['host']}:{server.server_port}/v1")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
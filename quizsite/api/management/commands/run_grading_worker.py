@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.grading_queue import process_pending_jobs, run_workers
+
+
+class Command(BaseCommand):
+    help = "Grade deferred long-answer submissions from the GradingJob queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=getattr(settings, "GRADING_WORKERS", 4))
+        parser.add_argument("--poll-interval", type=float, default=1.0)
+        parser.add_argument("--once", action="store_true", help="Drain the queue and exit.")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            processed = process_pending_jobs()
+            self.stdout.write(self.style.SUCCESS(f"Processed {processed} grading jobs."))
+            return
+
+        threads, stop_event = run_workers(options["workers"], options["poll_interval"])
+        self.stdout.write(f"Started {len(threads)} grading workers.")
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(1)
+        except KeyboardInterrupt:
+            stop_event.set()
+            for thread in threads:
+                thread.join()
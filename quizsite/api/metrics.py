@@ -0,0 +1,251 @@
+import contextvars
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from .authentication import CachedJWTAuthentication
+from .grading_cache import grading_cache
+from .history_cache import history_cache
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+METRICS = {
+    "quizmaster_http_requests_total": ("counter", "HTTP requests by URL name, method and status."),
+    "quizmaster_http_request_duration_seconds": ("histogram", "HTTP request latency by URL name."),
+    "quizmaster_http_response_size_bytes": ("histogram", "HTTP response body size by URL name."),
+    "quizmaster_db_queries_per_request": ("histogram", "Database queries issued per request by URL name."),
+    "quizmaster_db_query_duration_seconds_total": ("counter", "Time spent in database queries by URL name."),
+    "quizmaster_grading_calls_total": ("counter", "LLM grading calls by URL name, model and outcome."),
+    "quizmaster_grading_duration_seconds": ("histogram", "LLM grading call latency by URL name and model."),
+    "quizmaster_cache_hits": ("gauge", "Cache hits since process start by cache and tier."),
+    "quizmaster_cache_misses": ("gauge", "Cache misses since process start by cache."),
+    "quizmaster_cache_hit_ratio": ("gauge", "Share of cache lookups served from cache by cache."),
+    "quizmaster_cache_entries": ("gauge", "Entries held in process memory by cache."),
+}
+
+current_request = contextvars.ContextVar("current_request", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestStats:
+    def __init__(self, request):
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.request = request
+
+    def add_query(self, seconds):
+        with self.lock:
+            self.queries += 1
+            self.query_seconds += seconds
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = value
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                key: (h.buckets, list(h.counts), h.sum, h.count) for key, h in self._histograms.items()
+            }
+        return counters, histograms
+
+    def render(self):
+        counters, histograms = self.snapshot()
+        lines = []
+        for name, (kind, description) in METRICS.items():
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+            for (metric, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + ("+Inf",), counts):
+                    cumulative += bucket_count
+                    bucket_labels = labels + (("le", format_value(bound)),)
+                    lines.append(f"{name}_bucket{format_labels(bucket_labels)} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {format_value(total)}")
+                lines.append(f"{name}_count{format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def format_value(value):
+    return value if isinstance(value, str) else repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = MetricsRegistry()
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.url_name if match and match.url_name else "unmatched"
+
+
+def current_view():
+    stats = current_request.get()
+    return view_name(stats.request) if stats is not None else "none"
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(time.perf_counter() - started)
+
+
+def record_grading_call(model, seconds, outcome):
+    view = current_view()
+    registry.inc("quizmaster_grading_calls_total", {"view": view, "model": model, "outcome": outcome})
+    registry.observe("quizmaster_grading_duration_seconds", {"view": view, "model": model}, seconds)
+
+
+def record_request(request, response, stats, seconds):
+    view = view_name(request)
+    labels = {"view": view}
+
+    registry.inc(
+        "quizmaster_http_requests_total",
+        {"view": view, "method": request.method, "status": str(response.status_code)},
+    )
+    registry.observe("quizmaster_http_request_duration_seconds", labels, seconds)
+    if not response.streaming:
+        registry.observe("quizmaster_http_response_size_bytes", labels, len(response.content), SIZE_BUCKETS)
+    registry.observe("quizmaster_db_queries_per_request", labels, stats.queries, QUERY_BUCKETS)
+    registry.inc("quizmaster_db_query_duration_seconds_total", labels, stats.query_seconds)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        stats = RequestStats(request)
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        record_request(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats(request)
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        record_request(request, response, stats, time.perf_counter() - started)
+        return response
+
+
+def collect_cache_stats():
+    grading = grading_cache.stats()
+    history = history_cache.stats()
+    registry.set_gauge("quizmaster_cache_hits", {"cache": "grading", "tier": "memory"}, grading["memory_hits"])
+    registry.set_gauge("quizmaster_cache_hits", {"cache": "grading", "tier": "db"}, grading["db_hits"])
+    registry.set_gauge("quizmaster_cache_hits", {"cache": "history", "tier": "shared"}, history["hits"])
+    for name, stats in (("grading", grading), ("history", history)):
+        registry.set_gauge("quizmaster_cache_misses", {"cache": name}, stats["misses"])
+        registry.set_gauge("quizmaster_cache_hit_ratio", {"cache": name}, float(stats["hit_ratio"]))
+    registry.set_gauge("quizmaster_cache_entries", {"cache": "grading"}, grading["size"])
+
+
+def can_scrape(request):
+    token = getattr(settings, "METRICS_TOKEN", "")
+    header = request.headers.get("Authorization", "")
+    if token and hmac.compare_digest(header.encode(), f"Bearer {token}".encode()):
+        return True
+
+    try:
+        authenticated = CachedJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return authenticated is not None and authenticated[0].is_staff
+
+
+def metrics_view(request):
+    if not can_scrape(request):
+        return HttpResponse("Forbidden", status=403, content_type="text/plain; charset=utf-8")
+    collect_cache_stats()
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_completedquiz_difficulty'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradedAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('scheme_hash', models.CharField(db_index=True, max_length=64)),
+                ('model', models.CharField(max_length=50)),
+                ('marks', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_gradedanswer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='completedquiz',
+            name='status',
+            field=models.CharField(choices=[('graded', 'Graded'), ('pending', 'Pending')], default='graded', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='completedquizquestion',
+            name='pending',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='GradingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='queued', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('quiz', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='grading_job', to='api.completedquiz')),
+            ],
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def populate_stats(apps, schema_editor):
+    CompletedQuiz = apps.get_model('api', 'CompletedQuiz')
+    TopicDifficultyStats = apps.get_model('api', 'TopicDifficultyStats')
+
+    graded = CompletedQuiz.objects.filter(status='graded', difficulty__isnull=False).exclude(difficulty='')
+    groups = graded.values('topic', 'difficulty').annotate(
+        quiz_count=Count('id'), percentage_sum=Sum('percentage'), max_percentage=Max('percentage')
+    )
+    TopicDifficultyStats.objects.bulk_create([
+        TopicDifficultyStats(
+            top_user_id=graded.filter(topic=group['topic'], difficulty=group['difficulty'])
+            .order_by('-percentage', 'created_at', 'id').values_list('user_id', flat=True).first(),
+            **group
+        )
+        for group in groups
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_gradingjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicDifficultyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=50)),
+                ('difficulty', models.CharField(max_length=20)),
+                ('quiz_count', models.PositiveIntegerField(default=0)),
+                ('percentage_sum', models.FloatField(default=0)),
+                ('max_percentage', models.FloatField(default=0)),
+                ('top_user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('topic', 'difficulty')},
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_topicdifficultystats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='completedquiz',
+            index=models.Index(fields=['user', '-created_at'], name='completedquiz_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='completedquiz',
+            index=models.Index(fields=['topic', 'difficulty', '-percentage'], name='completedquiz_topic_score'),
+        ),
+    ]
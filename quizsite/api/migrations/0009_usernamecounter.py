@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:39
+
+import re
+from django.db import migrations, models
+
+
+def populate_counters(apps, schema_editor):
+    Account = apps.get_model('api', 'Account')
+    UsernameCounter = apps.get_model('api', 'UsernameCounter')
+
+    counts = {}
+    for username in Account.objects.values_list('username', flat=True).iterator():
+        match = re.fullmatch(r'(.+)_(\d+)', username)
+        base, count = (match.group(1), int(match.group(2))) if match else (username, 1)
+        counts[base] = max(counts.get(base, 0), count)
+
+    UsernameCounter.objects.bulk_create(
+        [UsernameCounter(base=base, count=count) for base, count in counts.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_completedquiz_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsernameCounter',
+            fields=[
+                ('base', models.CharField(max_length=150, primary_key=True, serialize=False)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
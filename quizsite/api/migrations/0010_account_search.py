@@ -0,0 +1,35 @@
+from django.db import migrations
+
+SEARCH_TABLE = 'api_account_search'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    Account = apps.get_model('api', 'Account')
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+        f"USING fts5(username, first_name, last_name, tokenize='unicode61', prefix='2 3')"
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, username, first_name, last_name) VALUES (%s, %s, %s, %s)",
+            list(Account.objects.values_list('id', 'username', 'first_name', 'last_name')),
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_usernamecounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:43
+
+import json
+import os
+from django.db import migrations, models
+
+QUESTIONS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'questions.json')
+
+QUESTION_TYPES = {
+    'multiple_choice': 'multiple_choice',
+    'multi_choice': 'multiple_choice',
+    'multiple_select': 'multiple_select',
+    'multi_select': 'multiple_select',
+    'long_answer': 'long_answer',
+    'long_anwser': 'long_answer',
+}
+
+DIFFICULTIES = {'easy', 'medium', 'hard'}
+
+
+def normalize_question(record):
+    if not isinstance(record, dict):
+        return None
+
+    try:
+        question_id = int(record['id'])
+        marks = int(record['marks'])
+        topic = ' '.join(word[:1].upper() + word[1:] for word in str(record['topic']).split())
+        difficulty = str(record['difficulty']).strip().lower()
+        question_type = QUESTION_TYPES.get(str(record['question_type']).strip().lower())
+        question_text = str(record['question_text']).strip()
+        answer_key = record['answer_key']
+    except (KeyError, TypeError, ValueError):
+        return None
+    options = [str(option).strip() for option in record.get('options') or []]
+
+    if question_id < 1 or marks < 1 or not topic or not question_text:
+        return None
+    if difficulty not in DIFFICULTIES or question_type is None:
+        return None
+
+    if question_type == 'multiple_choice':
+        answer_key = str(answer_key).strip()
+        if answer_key.lower() not in {option.lower() for option in options}:
+            return None
+    elif question_type == 'multiple_select':
+        if not isinstance(answer_key, list) or not answer_key:
+            return None
+        answer_key = [str(answer).strip() for answer in answer_key]
+        if not set(answer_key) <= set(options):
+            return None
+    else:
+        answer_key = str(answer_key).strip()
+        options = []
+        if not answer_key:
+            return None
+
+    return {
+        'id': question_id,
+        'topic': topic,
+        'difficulty': difficulty,
+        'question_type': question_type,
+        'question_text': question_text,
+        'options': options,
+        'answer_key': answer_key,
+        'marks': marks,
+    }
+
+
+def load_question_bank(apps, schema_editor):
+    if not os.path.exists(QUESTIONS_FILE):
+        return
+
+    Question = apps.get_model('api', 'Question')
+    with open(QUESTIONS_FILE, encoding='utf-8') as file:
+        records = json.load(file)
+
+    questions = {}
+    for record in records:
+        question = normalize_question(record)
+        if question is not None:
+            questions.setdefault(question['id'], Question(**question))
+
+    Question.objects.bulk_create(list(questions.values()), batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_account_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Question',
+            fields=[
+                ('id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('topic', models.CharField(max_length=50)),
+                ('difficulty', models.CharField(choices=[('easy', 'Easy'), ('medium', 'Medium'), ('hard', 'Hard')], max_length=20)),
+                ('question_type', models.CharField(choices=[('multiple_choice', 'Multiple choice'), ('multiple_select', 'Multiple select'), ('long_answer', 'Long answer')], max_length=20)),
+                ('question_text', models.TextField()),
+                ('options', models.JSONField(blank=True, default=list)),
+                ('answer_key', models.JSONField()),
+                ('marks', models.PositiveIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['topic', 'difficulty'], name='question_topic_difficulty')],
+            },
+        ),
+        migrations.RunPython(load_question_bank, migrations.RunPython.noop),
+    ]
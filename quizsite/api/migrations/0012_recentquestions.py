@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_question'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecentQuestions',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recent_questions', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('question_ids', models.BinaryField(default=bytes)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
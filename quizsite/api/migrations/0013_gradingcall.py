@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_recentquestions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradingCall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=50)),
+                ('topic', models.CharField(blank=True, max_length=50)),
+                ('items', models.PositiveIntegerField(default=1)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('outcome', models.CharField(choices=[('ok', 'OK'), ('error', 'Error'), ('timeout', 'Timeout'), ('invalid', 'Invalid reply'), ('rejected', 'Rejected')], max_length=10)),
+                ('latency_ms', models.FloatField()),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('completion_tokens', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['topic', 'created_at'], name='gradingcall_topic_created')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_gradingcall'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='completedquiz',
+            name='completedquiz_user_created',
+        ),
+        migrations.AddIndex(
+            model_name='completedquiz',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='completedquiz_user_created_id'),
+        ),
+    ]
@@ -1,41 +1,108 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
+from .signals import accounts_updated
 
-class AccountManager(BaseUserManager):
+def build_username_base(first_name, last_name, date_of_birth):
+    return (
+        first_name[:3].capitalize() +
+        last_name[:3].upper() +
+        date_of_birth.strftime("%m%d")
+    )
+
+def username_from_count(username_base, count):
+    return username_base if count <= 1 else f"{username_base}_{count}"
+
+class UsernameCounter(models.Model):
+    base = models.CharField(max_length=150, primary_key=True)
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.base} ({self.count})"
+
+class AccountQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        account_ids = list(self.values_list("pk", flat=True))
+        updated = super().update(**kwargs)
+        accounts_updated.send(sender=self.model, account_ids=account_ids)
+        return updated
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        updated = super().bulk_update(objs, fields, batch_size=batch_size)
+        accounts_updated.send(sender=self.model, account_ids=[obj.pk for obj in objs])
+        return updated
+
+class AccountManager(BaseUserManager.from_queryset(AccountQuerySet)):
     def create_user(self, first_name, last_name, date_of_birth, year_group, password=None):
         if not first_name or not last_name or not date_of_birth:
             raise ValueError("Users must have a first name, last name, and date of birth")
 
-        username = self.generate_username(first_name, last_name, date_of_birth)
-
         user = self.model(
-            username=username,
             first_name=first_name,
             last_name=last_name,
             date_of_birth=date_of_birth,
             year_group=year_group,
         )
         user.set_password(password)
-        user.save(using=self._db)
+
+        with transaction.atomic(using=self._db):
+            user.username = self.generate_username(first_name, last_name, date_of_birth)
+            user.save(using=self._db)
         return user
 
     def generate_username(self, first_name, last_name, date_of_birth):
-        username_base = (
-            first_name[:3].capitalize() +
-            last_name[:3].upper() +
-            date_of_birth.strftime("%m%d")
-        )
+        username_base = build_username_base(first_name, last_name, date_of_birth)
+        counters = UsernameCounter.objects.filter(base=username_base)
+
+        with transaction.atomic(using=self._db):
+            if not counters.update(count=models.F("count") + 1):
+                try:
+                    with transaction.atomic(using=self._db):
+                        UsernameCounter.objects.create(base=username_base, count=1)
+                except IntegrityError:
+                    counters.update(count=models.F("count") + 1)
+            count = counters.values_list("count", flat=True).get()
+
+        return username_from_count(username_base, count)
 
-        similar_usernames = Account.objects.filter(username__startswith=username_base)
-        if similar_usernames.exists():
-            count = similar_usernames.count()
-            username = f"{username_base}_{count + 1}"
-        else:
-            username = username_base
+    def allocate_usernames(self, people):
+        bases = [build_username_base(*person) for person in people]
+        requested = {}
+        for base in bases:
+            requested[base] = requested.get(base, 0) + 1
 
-        return username
+        for attempt in range(3):
+            try:
+                with transaction.atomic(using=self._db):
+                    counters = UsernameCounter.objects.select_for_update().in_bulk(list(requested))
+                    for base, counter in counters.items():
+                        counter.count += requested[base]
+                    UsernameCounter.objects.bulk_update(counters.values(), ["count"])
+                    UsernameCounter.objects.bulk_create([
+                        UsernameCounter(base=base, count=count)
+                        for base, count in requested.items() if base not in counters
+                    ])
+                break
+            except IntegrityError:
+                if attempt == 2:
+                    raise
+
+        next_count = {
+            base: (counters[base].count if base in counters else requested[base]) - requested[base] + 1
+            for base in requested
+        }
+        usernames = []
+        for base in bases:
+            usernames.append(username_from_count(base, next_count[base]))
+            next_count[base] += 1
+        return usernames
+
+    def suggest_username(self, first_name, last_name, date_of_birth):
+        username_base = build_username_base(first_name, last_name, date_of_birth)
+        count = UsernameCounter.objects.filter(base=username_base).values_list("count", flat=True).first() or 0
+        return username_from_count(username_base, count + 1)
 
     def create_superuser(self, first_name, last_name, date_of_birth, year_group, password=None):
         user = self.create_user(first_name, last_name, date_of_birth, year_group, password)
@@ -64,15 +131,71 @@ class Account(AbstractBaseUser, PermissionsMixin):
 
 user = get_user_model()
 
+class Question(models.Model):
+    EASY = "easy"
+    MEDIUM = "medium"
+    HARD = "hard"
+    DIFFICULTY_CHOICES = [(EASY, "Easy"), (MEDIUM, "Medium"), (HARD, "Hard")]
+
+    MULTIPLE_CHOICE = "multiple_choice"
+    MULTIPLE_SELECT = "multiple_select"
+    LONG_ANSWER = "long_answer"
+    QUESTION_TYPE_CHOICES = [
+        (MULTIPLE_CHOICE, "Multiple choice"),
+        (MULTIPLE_SELECT, "Multiple select"),
+        (LONG_ANSWER, "Long answer"),
+    ]
+
+    id = models.PositiveIntegerField(primary_key=True)
+    topic = models.CharField(max_length=50)
+    difficulty = models.CharField(max_length=20, choices=DIFFICULTY_CHOICES)
+    question_type = models.CharField(max_length=20, choices=QUESTION_TYPE_CHOICES)
+    question_text = models.TextField()
+    options = models.JSONField(default=list, blank=True)
+    answer_key = models.JSONField()
+    marks = models.PositiveIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["topic", "difficulty"], name="question_topic_difficulty"),
+        ]
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "question_text": self.question_text,
+            "difficulty": self.difficulty,
+            "question_type": self.question_type,
+            "options": self.options,
+            "answer_key": self.answer_key,
+            "marks": self.marks,
+            "topic": self.topic,
+        }
+
+    def __str__(self):
+        return f"Question {self.id}: {self.question_text[:50]}"
+
 class CompletedQuiz(models.Model):
+    GRADED = "graded"
+    PENDING = "pending"
+    STATUS_CHOICES = [(GRADED, "Graded"), (PENDING, "Pending")]
+
     user = models.ForeignKey(user, on_delete=models.CASCADE, related_name="completed_quizzes")
     topic = models.CharField(max_length=50)
     number_of_questions = models.PositiveIntegerField()
     difficulty = models.CharField(max_length=20, null=True, blank=True)
     grade = models.CharField(max_length=2)
     percentage = models.FloatField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=GRADED)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="completedquiz_user_created_id"),
+            models.Index(fields=["topic", "difficulty", "-percentage"], name="completedquiz_topic_score"),
+        ]
+
     def __str__(self):
         return f"Quiz: {self.topic} by {self.user.username} on {self.created_at}. Difficulty: {self.difficulty}"
 
@@ -84,6 +207,87 @@ class CompletedQuizQuestion(models.Model):
     marks = models.PositiveIntegerField()
     total_marks = models.PositiveIntegerField()
     is_correct = models.BooleanField()
+    pending = models.BooleanField(default=False)
 
     def __str__(self):
         return f"Question: {self.question_text[:50]}... (Correct: {self.is_correct})"
+
+
+class RecentQuestions(models.Model):
+    user = models.OneToOneField(user, on_delete=models.CASCADE, primary_key=True, related_name="recent_questions")
+    question_ids = models.BinaryField(default=bytes)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Recent questions for {self.user_id}"
+
+class TopicDifficultyStats(models.Model):
+    topic = models.CharField(max_length=50)
+    difficulty = models.CharField(max_length=20)
+    quiz_count = models.PositiveIntegerField(default=0)
+    percentage_sum = models.FloatField(default=0)
+    max_percentage = models.FloatField(default=0)
+    top_user = models.ForeignKey(user, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+
+    class Meta:
+        unique_together = ("topic", "difficulty")
+
+    def __str__(self):
+        return f"{self.topic} ({self.difficulty}): {self.quiz_count} quizzes"
+
+class GradingJob(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(QUEUED, "Queued"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")]
+
+    quiz = models.OneToOneField(CompletedQuiz, on_delete=models.CASCADE, related_name="grading_job")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Grading job {self.pk} for quiz {self.quiz_id} ({self.status})"
+
+class GradingCall(models.Model):
+    OK = "ok"
+    ERROR = "error"
+    TIMEOUT = "timeout"
+    INVALID = "invalid"
+    REJECTED = "rejected"
+    OUTCOME_CHOICES = [
+        (OK, "OK"), (ERROR, "Error"), (TIMEOUT, "Timeout"), (INVALID, "Invalid reply"), (REJECTED, "Rejected"),
+    ]
+
+    model = models.CharField(max_length=50)
+    topic = models.CharField(max_length=50, blank=True)
+    items = models.PositiveIntegerField(default=1)
+    attempts = models.PositiveIntegerField(default=0)
+    outcome = models.CharField(max_length=10, choices=OUTCOME_CHOICES)
+    latency_ms = models.FloatField()
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["topic", "created_at"], name="gradingcall_topic_created"),
+        ]
+
+    def __str__(self):
+        return f"{self.model} call for {self.topic or 'unknown topic'} ({self.outcome})"
+
+class GradedAnswer(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    scheme_hash = models.CharField(max_length=64, db_index=True)
+    model = models.CharField(max_length=50)
+    marks = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Graded answer {self.key[:12]} ({self.marks} marks)"
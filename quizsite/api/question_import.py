@@ -0,0 +1,205 @@
+import json
+from django.db import transaction
+from .models import Question
+from .sampling import question_buckets
+from .signals import mark_scheme_changed
+
+QUESTION_TYPE_ALIASES = {
+    "multiple_choice": Question.MULTIPLE_CHOICE,
+    "multi_choice": Question.MULTIPLE_CHOICE,
+    "multiple_select": Question.MULTIPLE_SELECT,
+    "multi_select": Question.MULTIPLE_SELECT,
+    "long_answer": Question.LONG_ANSWER,
+    "long_anwser": Question.LONG_ANSWER,
+}
+
+DIFFICULTIES = {choice for choice, _ in Question.DIFFICULTY_CHOICES}
+
+UPDATE_FIELDS = ["topic", "difficulty", "question_type", "question_text", "options", "answer_key", "marks", "updated_at"]
+
+
+class InvalidQuestion(ValueError):
+    pass
+
+
+def normalize_topic(topic):
+    return " ".join(word[:1].upper() + word[1:] for word in str(topic).split())
+
+
+def normalize_question(record):
+    if not isinstance(record, dict):
+        raise InvalidQuestion("Record must be an object.")
+
+    missing = [
+        field for field in ("id", "topic", "difficulty", "question_type", "question_text", "answer_key", "marks")
+        if field not in record
+    ]
+    if missing:
+        raise InvalidQuestion(f"Missing fields: {', '.join(missing)}.")
+
+    try:
+        question_id = int(record["id"])
+        marks = int(record["marks"])
+    except (TypeError, ValueError):
+        raise InvalidQuestion("id and marks must be integers.")
+    if question_id < 1 or marks < 1:
+        raise InvalidQuestion("id and marks must be positive.")
+
+    topic = normalize_topic(record["topic"])
+    difficulty = str(record["difficulty"]).strip().lower()
+    question_type = QUESTION_TYPE_ALIASES.get(str(record["question_type"]).strip().lower())
+    question_text = str(record["question_text"]).strip()
+    options = [str(option).strip() for option in record.get("options") or []]
+    answer_key = record["answer_key"]
+
+    if not topic or not question_text:
+        raise InvalidQuestion("topic and question_text must not be empty.")
+    if difficulty not in DIFFICULTIES:
+        raise InvalidQuestion(f"Unknown difficulty '{record['difficulty']}'.")
+    if question_type is None:
+        raise InvalidQuestion(f"Unknown question_type '{record['question_type']}'.")
+
+    if question_type == Question.MULTIPLE_CHOICE:
+        answer_key = str(answer_key).strip()
+        if answer_key.lower() not in {option.lower() for option in options}:
+            raise InvalidQuestion("answer_key must be one of the options.")
+    elif question_type == Question.MULTIPLE_SELECT:
+        if not isinstance(answer_key, list) or not answer_key:
+            raise InvalidQuestion("answer_key must be a non-empty list.")
+        answer_key = [str(answer).strip() for answer in answer_key]
+        if not set(answer_key) <= set(options):
+            raise InvalidQuestion("answer_key must be a subset of the options.")
+    else:
+        answer_key = str(answer_key).strip()
+        options = []
+        if not answer_key:
+            raise InvalidQuestion("answer_key must not be empty.")
+
+    return Question(
+        id=question_id,
+        topic=topic,
+        difficulty=difficulty,
+        question_type=question_type,
+        question_text=question_text,
+        options=options,
+        answer_key=answer_key,
+        marks=marks,
+    )
+
+
+def iter_json_array(file, chunk_size=64 * 1024):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    eof = False
+
+    while True:
+        buffer = buffer.lstrip()
+        if not started:
+            if not buffer and not eof:
+                chunk = file.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            if not buffer.startswith("["):
+                raise ValueError("Expected a JSON array of questions.")
+            buffer = buffer[1:]
+            started = True
+            continue
+
+        if buffer.startswith(","):
+            buffer = buffer[1:]
+            continue
+        if buffer.startswith("]"):
+            return
+
+        try:
+            record, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+
+        if end == len(buffer) and not eof:
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+
+        yield record
+        buffer = buffer[end:]
+
+
+def iter_json_lines(file):
+    for line in file:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_records(file, file_format="auto"):
+    if file_format == "auto":
+        first = ""
+        while not first:
+            char = file.read(1)
+            if not char:
+                return iter(())
+            first = char.strip()
+        file.seek(0)
+        file_format = "json" if first == "[" else "jsonl"
+
+    return iter_json_array(file) if file_format == "json" else iter_json_lines(file)
+
+
+def changed_mark_schemes(questions):
+    existing = Question.objects.in_bulk([question.id for question in questions])
+    return [
+        existing[question.id].as_dict()
+        for question in questions
+        if question.id in existing
+        and (existing[question.id].answer_key, existing[question.id].marks) != (question.answer_key, question.marks)
+    ]
+
+
+def save_questions(questions):
+    with transaction.atomic():
+        changed = changed_mark_schemes(questions)
+        Question.objects.bulk_create(
+            questions,
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=UPDATE_FIELDS,
+        )
+    question_buckets.invalidate()
+    if changed:
+        mark_scheme_changed.send(sender=Question, questions=changed)
+
+
+def import_questions(records, batch_size=500, dry_run=False):
+    imported = 0
+    errors = []
+    batch = {}
+
+    for position, record in enumerate(records, start=1):
+        try:
+            question = normalize_question(record)
+        except InvalidQuestion as e:
+            errors.append((position, str(e)))
+            continue
+
+        batch[question.id] = question
+        if len(batch) >= batch_size:
+            if not dry_run:
+                save_questions(list(batch.values()))
+            imported += len(batch)
+            batch = {}
+
+    if batch:
+        if not dry_run:
+            save_questions(list(batch.values()))
+        imported += len(batch)
+
+    return imported, errors
@@ -0,0 +1,142 @@
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from .authentication import user_cache
+from .history_cache import history_cache
+from .models import Account
+from .search import index_accounts
+from .serializers import AccountSerializer
+
+FIELDS = ("first_name", "last_name", "date_of_birth", "year_group", "password")
+
+
+def iter_roster_rows(file):
+    reader = csv.DictReader(file)
+    missing = [field for field in FIELDS if field not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"Missing CSV columns: {', '.join(missing)}.")
+    return iter(reader)
+
+
+def validate_row(record):
+    serializer = AccountSerializer(data={field: (record.get(field) or "").strip() for field in FIELDS})
+    if not serializer.is_valid():
+        raise ValueError(" ".join(
+            f"{field}: {' '.join(str(error) for error in errors)}" for field, errors in serializer.errors.items()
+        ))
+    return serializer.validated_data
+
+
+def setup_worker(settings_module):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    django.setup()
+
+
+def hash_passwords(passwords, executor=None, workers=1):
+    if executor is None:
+        return [make_password(password) for password in passwords]
+    return list(executor.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def accounts_created(accounts):
+    index_accounts(accounts)
+    for account in accounts:
+        history_cache.invalidate(account.pk)
+        user_cache.invalidate(account.pk)
+
+
+class RosterImport:
+    def __init__(self, workers=None):
+        self.workers = workers if workers is not None else getattr(settings, "PASSWORD_HASH_WORKERS", os.cpu_count())
+        self.created = []
+        self.errors = []
+
+    def save(self, rows):
+        usernames = Account.objects.allocate_usernames(
+            [(data["first_name"], data["last_name"], data["date_of_birth"]) for _, data, _ in rows]
+        )
+        accounts = [
+            Account(
+                username=username,
+                first_name=data["first_name"],
+                last_name=data["last_name"],
+                date_of_birth=data["date_of_birth"],
+                year_group=data["year_group"],
+                password=password,
+            )
+            for username, (_, data, password) in zip(usernames, rows)
+        ]
+
+        try:
+            with transaction.atomic():
+                created = Account.objects.bulk_create(accounts)
+                accounts_created(created)
+            self.created += [(position, account) for (position, _, _), account in zip(rows, created)]
+            return
+        except IntegrityError:
+            pass
+
+        saved = []
+        for (position, _, _), account in zip(rows, accounts):
+            for attempt in range(3):
+                try:
+                    with transaction.atomic():
+                        account.save()
+                except IntegrityError as e:
+                    error = f"Could not create {account.username}: {e}"
+                    account.username = Account.objects.generate_username(
+                        account.first_name, account.last_name, account.date_of_birth
+                    )
+                else:
+                    saved.append((position, account))
+                    break
+            else:
+                self.errors.append((position, error))
+
+        accounts_created([account for _, account in saved])
+        self.created += saved
+
+    def process(self, batch, executor):
+        rows = []
+        for position, record in batch:
+            try:
+                rows.append((position, validate_row(record)))
+            except ValueError as e:
+                self.errors.append((position, str(e)))
+
+        if rows:
+            passwords = hash_passwords([data["password"] for _, data in rows], executor, self.workers)
+            self.save([(position, data, password) for (position, data), password in zip(rows, passwords)])
+
+    def run(self, records, batch_size=500, progress=None):
+        executor = None
+        if self.workers > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=setup_worker,
+                initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", "quizsite.settings"),),
+            )
+
+        try:
+            batch = []
+            for position, record in enumerate(records, start=1):
+                batch.append((position, record))
+                if len(batch) >= batch_size:
+                    self.process(batch, executor)
+                    if progress:
+                        progress(position, self)
+                    batch = []
+
+            if batch:
+                self.process(batch, executor)
+                if progress:
+                    progress(batch[-1][0], self)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        return self.created, self.errors
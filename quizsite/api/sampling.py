@@ -0,0 +1,101 @@
+import random
+import threading
+import time
+from array import array
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Question, RecentQuestions
+
+BUCKETS_VERSION_KEY = "question_buckets_version"
+
+
+class QuestionBuckets:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = None
+        self._version = None
+        self._built_at = 0
+
+    def invalidate(self):
+        try:
+            cache.incr(BUCKETS_VERSION_KEY)
+        except ValueError:
+            cache.set(BUCKETS_VERSION_KEY, 1, None)
+        with self._lock:
+            self._buckets = None
+
+    def buckets(self):
+        version = cache.get(BUCKETS_VERSION_KEY, 0)
+        max_age = getattr(settings, "QUESTION_BUCKETS_MAX_AGE", 300)
+        buckets = self._buckets
+        if buckets is not None and version == self._version and time.monotonic() - self._built_at < max_age:
+            return buckets
+
+        with self._lock:
+            if self._buckets is not None and version == self._version and time.monotonic() - self._built_at < max_age:
+                return self._buckets
+
+            grouped = defaultdict(lambda: array("I"))
+            for topic, difficulty, question_id in Question.objects.values_list("topic", "difficulty", "id"):
+                grouped[(topic, difficulty)].append(question_id)
+            self._buckets = dict(grouped)
+            self._version = version
+            self._built_at = time.monotonic()
+            return self._buckets
+
+    def sample(self, topic, difficulty, k, exclude=()):
+        bucket = self.buckets().get((topic, difficulty), array("I"))
+        k = min(k, len(bucket))
+        exclude = set(exclude)
+
+        chosen = []
+        tried = set()
+        for _ in range(4 * k + len(exclude)):
+            if len(chosen) == k or len(tried) == len(bucket):
+                break
+            question_id = bucket[random.randrange(len(bucket))]
+            if question_id not in tried:
+                tried.add(question_id)
+                if question_id not in exclude:
+                    chosen.append(question_id)
+
+        if len(chosen) < k:
+            taken = set(chosen)
+            fresh = [i for i in bucket if i not in exclude and i not in taken]
+            chosen += random.sample(fresh, min(len(fresh), k - len(chosen)))
+            taken.update(chosen)
+            seen = [i for i in bucket if i not in taken]
+            chosen += random.sample(seen, k - len(chosen))
+
+        return chosen
+
+
+question_buckets = QuestionBuckets()
+
+
+def recent_question_ids(user):
+    recent = RecentQuestions.objects.filter(user=user).values_list("question_ids", flat=True).first()
+    return array("I", bytes(recent)) if recent else array("I")
+
+
+def remember_questions(user, question_ids):
+    limit = getattr(settings, "RECENT_QUESTIONS_LIMIT", 50)
+    question_ids = [int(question_id) for question_id in question_ids]
+    submitted = set(question_ids)
+
+    with transaction.atomic(savepoint=False):
+        RecentQuestions.objects.bulk_create([RecentQuestions(user=user)], ignore_conflicts=True)
+        row = RecentQuestions.objects.select_for_update().get(user=user)
+        recent = [i for i in array("I", bytes(row.question_ids)) if i not in submitted]
+        row.question_ids = array("I", (recent + question_ids)[-limit:]).tobytes()
+        row.save(update_fields=["question_ids", "updated_at"])
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_buckets(sender, **kwargs):
+    question_buckets.invalidate()
@@ -0,0 +1,78 @@
+from functools import lru_cache
+from .models import Question
+
+OBJECTIVE_TYPES = (Question.MULTIPLE_CHOICE, Question.MULTIPLE_SELECT)
+
+
+def normalize_option(option):
+    return " ".join(str(option).split()).lower()
+
+
+def selected_options(answer):
+    if isinstance(answer, str):
+        return [option for option in answer.split(",") if option.strip()]
+    return list(answer or [])
+
+
+class MultipleChoiceKey:
+    def __init__(self, answer_key, marks):
+        self.answer = normalize_option(answer_key)
+        self.marks = marks
+
+    def score(self, answer):
+        return self.marks if normalize_option(answer) == self.answer else 0
+
+
+class MultipleSelectKey:
+    def __init__(self, options, answer_key):
+        self.bits = {}
+        for option in list(options) + list(answer_key):
+            self.bits.setdefault(normalize_option(option), 1 << len(self.bits))
+        self.mask = 0
+        for option in answer_key:
+            self.mask |= self.bits[normalize_option(option)]
+
+    def score(self, answer):
+        selected = 0
+        unknown = 0
+        for option in selected_options(answer):
+            bit = self.bits.get(normalize_option(option))
+            if bit is None or selected & bit:
+                unknown += 1
+            else:
+                selected |= bit
+        correct = (selected & self.mask).bit_count()
+        return max(0, correct - (selected & ~self.mask).bit_count() - unknown)
+
+
+@lru_cache(maxsize=4096)
+def compiled_key(question_type, options, answer_key, marks):
+    if question_type == Question.MULTIPLE_CHOICE:
+        return MultipleChoiceKey(answer_key, marks)
+    return MultipleSelectKey(options, answer_key)
+
+
+def answer_key_for(question):
+    answer_key = question["answer_key"]
+    return compiled_key(
+        question["question_type"],
+        tuple(question.get("options") or ()),
+        tuple(answer_key) if isinstance(answer_key, list) else answer_key,
+        int(question["marks"]),
+    )
+
+
+def score_submissions(questions, submissions):
+    scores = [[None] * len(questions) for _ in submissions]
+    for position, question in enumerate(questions):
+        if question["question_type"] not in OBJECTIVE_TYPES:
+            continue
+        key = answer_key_for(question)
+        question_id = str(question["id"])
+        for marks, submitted_answers in zip(scores, submissions):
+            marks[position] = key.score(submitted_answers.get(question_id, ""))
+    return scores
+
+
+def objective_marks(questions, submitted_answers):
+    return score_submissions(questions, [submitted_answers])[0]
@@ -0,0 +1,80 @@
+import re
+from django.db import connection
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Account
+
+SEARCH_TABLE = "api_account_search"
+SEARCH_FIELDS = ("username", "first_name", "last_name")
+
+_indexed_databases = set()
+
+
+def fts_enabled():
+    if connection.vendor != "sqlite":
+        return False
+
+    database = connection.settings_dict["NAME"]
+    if database not in _indexed_databases and SEARCH_TABLE in connection.introspection.table_names():
+        _indexed_databases.add(database)
+    return database in _indexed_databases
+
+
+def search_terms(query):
+    return re.findall(r"[^\W_]+", query.casefold())
+
+
+def index_accounts(accounts):
+    if not fts_enabled():
+        return
+
+    rows = [(a.pk, a.username, a.first_name, a.last_name) for a in accounts]
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, username, first_name, last_name) VALUES (%s, %s, %s, %s)", rows
+        )
+
+
+def unindex_account(account_id):
+    if not fts_enabled():
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [account_id])
+
+
+def search_accounts(query, limit=10):
+    terms = search_terms(query)
+    if not terms:
+        return list(Account.objects.all()[:limit])
+
+    if fts_enabled():
+        match = " ".join(f'"{term}"*' for term in terms)
+        return list(Account.objects.raw(
+            f"SELECT api_account.* FROM {SEARCH_TABLE} "
+            f"JOIN api_account ON api_account.id = {SEARCH_TABLE}.rowid "
+            f"WHERE {SEARCH_TABLE} MATCH %s "
+            f"ORDER BY bm25({SEARCH_TABLE}, 2.0, 1.0, 1.0), api_account.username LIMIT %s",
+            [match, limit],
+        ))
+
+    condition = Q()
+    for term in terms:
+        condition &= (
+            Q(username__istartswith=term) | Q(first_name__istartswith=term) | Q(last_name__istartswith=term)
+        )
+    return list(Account.objects.filter(condition).order_by("username")[:limit])
+
+
+@receiver(post_save, sender=Account)
+def index_saved_account(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not set(update_fields) & set(SEARCH_FIELDS)):
+        return
+    index_accounts([instance])
+
+
+@receiver(post_delete, sender=Account)
+def unindex_deleted_account(sender, instance, **kwargs):
+    unindex_account(instance.pk)
@@ -18,7 +18,6 @@ class AccountSerializer(serializers.ModelSerializer):
             last_name=validated_data['last_name'],
             date_of_birth=validated_data['date_of_birth'],
             year_group=validated_data['year_group'],
+            password=validated_data['password'],
         )
-        user.set_password(validated_data['password'])
-        user.save()
         return user
\ No newline at end of file
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+mark_scheme_changed = Signal()
+
+accounts_updated = Signal()
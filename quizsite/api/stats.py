@@ -0,0 +1,66 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Sum
+from .models import CompletedQuiz, TopicDifficultyStats
+
+
+def record_quiz_stats(quiz):
+    record_quizzes_stats([quiz])
+
+
+def record_quizzes_stats(quizzes):
+    groups = {}
+    for quiz in quizzes:
+        if quiz.difficulty and quiz.status == CompletedQuiz.GRADED:
+            groups.setdefault((quiz.topic, quiz.difficulty), []).append(quiz)
+
+    for (topic, difficulty), group in groups.items():
+        count = len(group)
+        percentage_sum = sum(quiz.percentage for quiz in group)
+        top_quiz = max(group, key=lambda quiz: quiz.percentage)
+        record_stats(topic, difficulty, count, percentage_sum, top_quiz.percentage, top_quiz.user_id)
+
+
+def record_stats(topic, difficulty, count, percentage_sum, max_percentage, top_user_id):
+    stats = TopicDifficultyStats.objects.filter(topic=topic, difficulty=difficulty)
+    updated = stats.update(quiz_count=F("quiz_count") + count, percentage_sum=F("percentage_sum") + percentage_sum)
+    if not updated:
+        try:
+            with transaction.atomic():
+                TopicDifficultyStats.objects.create(
+                    topic=topic,
+                    difficulty=difficulty,
+                    quiz_count=count,
+                    percentage_sum=percentage_sum,
+                    max_percentage=max_percentage,
+                    top_user_id=top_user_id,
+                )
+            return
+        except IntegrityError:
+            stats.update(quiz_count=F("quiz_count") + count, percentage_sum=F("percentage_sum") + percentage_sum)
+
+    stats.filter(max_percentage__lt=max_percentage).update(
+        max_percentage=max_percentage, top_user_id=top_user_id
+    )
+
+
+def rebuild_topic_stats():
+    graded = CompletedQuiz.objects.filter(status=CompletedQuiz.GRADED, difficulty__isnull=False).exclude(difficulty="")
+    groups = graded.values("topic", "difficulty").annotate(
+        quiz_count=Count("id"), percentage_sum=Sum("percentage"), max_percentage=Max("percentage")
+    )
+
+    rows = []
+    for group in groups:
+        top_quiz = (
+            graded.filter(topic=group["topic"], difficulty=group["difficulty"])
+            .order_by("-percentage", "created_at", "id")
+            .only("user_id")
+            .first()
+        )
+        rows.append(TopicDifficultyStats(top_user_id=top_quiz.user_id, **group))
+
+    with transaction.atomic():
+        TopicDifficultyStats.objects.all().delete()
+        TopicDifficultyStats.objects.bulk_create(rows)
+
+    return len(rows)
@@ -1,12 +1,24 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.conf import settings
-from .models import CompletedQuiz, CompletedQuizQuestion
+from .models import CompletedQuiz, CompletedQuizQuestion, GradedAnswer, Question, TopicDifficultyStats
+from .grading_cache import grading_cache
+from .history_cache import history_cache
+from .question_import import import_questions
+from .scoring import objective_marks, score_submissions
+from .search import search_accounts
 from django.utils.timezone import now
 from datetime import date
 from rest_framework_simplejwt.tokens import RefreshToken
+import csv
+import io
 import json
 import os
+import random
+import tempfile
+from unittest import mock
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
 from rest_framework import status
 
 User = get_user_model()
@@ -59,9 +71,9 @@ class SubmitQuizViewTest(TestCase):
         ]
         with open(settings.BASE_DIR / 'test_questions.json', 'w') as file:
             json.dump(self.questions_data, file)
+        import_questions(self.questions_data)
 
     def tearDown(self):
-        import os
         os.remove(settings.BASE_DIR / 'test_questions.json')
 
     def test_submit_quiz_with_marks(self):
@@ -123,6 +135,7 @@ class SubmitQuizViewTest(TestCase):
         })
         with open(settings.BASE_DIR / 'test_questions.json', 'w') as file:
             json.dump(self.questions_data, file)
+        import_questions(self.questions_data)
         data = {
             "topic": "Physics",
             "difficulty": "hard",
@@ -130,7 +143,7 @@ class SubmitQuizViewTest(TestCase):
                 "4": "Gravity is a force that pulls objects towards the Earth."
             }
         }
-        with self.settings(BASE_DIR=settings.BASE_DIR):
+        with self.settings(BASE_DIR=settings.BASE_DIR), mock.patch("api.utils.mark_answer", return_value=4):
             response = self.client.post(
                 "/api/submit-quiz/", data, content_type="application/json", **headers
             )
@@ -208,9 +221,9 @@ class CompletedQuizViewTest(TestCase):
         )
 
     def test_get_user_completed_quizzes_with_marks(self):
-        response = self.client.get("/api/completed-quizzes/")
+        response = self.client.get("/api/completed-quizzes/", {"include": "questions"})
         self.assertEqual(response.status_code, 200)
-        data = response.json()
+        data = response.json()["results"]
         self.assertEqual(len(data), 1)
         quiz = data[0]
         self.assertEqual(quiz["topic"], "Maths")
@@ -225,6 +238,47 @@ class CompletedQuizViewTest(TestCase):
         self.assertEqual(questions[1]["total_marks"], 1)
         self.assertEqual(questions[1]["is_correct"], False)
 
+    def test_history_is_cursor_paginated_summaries(self):
+        from datetime import timedelta
+
+        base = now()
+        for i in range(5):
+            quiz = CompletedQuiz.objects.create(
+                user=self.user, topic=f"Topic {i}", number_of_questions=1, grade="A", percentage=90.0
+            )
+            CompletedQuiz.objects.filter(pk=quiz.pk).update(created_at=base + timedelta(minutes=i % 3))
+
+        self.client.get("/api/completed-quizzes/", {"limit": 1})
+        topics = []
+        cursor = None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            with self.assertNumQueries(1):
+                data = self.client.get("/api/completed-quizzes/", params).json()
+            self.assertLessEqual(len(data["results"]), 2)
+            self.assertTrue(all("questions" not in quiz for quiz in data["results"]))
+            topics += [quiz["topic"] for quiz in data["results"]]
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+
+        self.assertEqual(topics, ["Topic 2", "Topic 4", "Topic 1", "Topic 3", "Topic 0", "Maths"])
+
+    def test_invalid_cursor_and_limit_are_rejected(self):
+        self.assertEqual(self.client.get("/api/completed-quizzes/", {"cursor": "nope"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/completed-quizzes/", {"limit": "0"}).status_code, 400)
+
+    def test_quiz_detail_loads_questions_for_owner_only(self):
+        response = self.client.get(f"/api/completed-quizzes/{self.quiz.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([q["submitted_answer"] for q in response.json()["questions"]], ["4", "5"])
+
+        other = User.objects.create_user(
+            first_name="Other", last_name="User", date_of_birth=date(2001, 2, 2), year_group=12, password="pw"
+        )
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(other).access_token}")
+        self.assertEqual(client.get(f"/api/completed-quizzes/{self.quiz.id}/").status_code, 404)
+
 class QuestionListViewTest(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(
@@ -261,11 +315,23 @@ class QuestionListViewTest(TestCase):
                 "answer_key": ["Python", "JavaScript"],
                 "marks": "2",
                 "topic": "Computer Science"
+            },
+            {
+                "id": 3,
+                "question_text": "What is 3 x 3?",
+                "difficulty": "easy",
+                "question_type": "multiple_choice",
+                "options": ["6", "9"],
+                "answer_key": "9",
+                "marks": "1",
+                "topic": "Maths"
             }
         ]
 
         with open(self.questions_file_path, "w") as file:
             json.dump(self.sample_questions, file)
+        Question.objects.all().delete()
+        import_questions(self.sample_questions)
 
         self.url = "/api/questions/"
 
@@ -293,3 +359,1843 @@ class QuestionListViewTest(TestCase):
 
         data = response.json()
         self.assertEqual(len(data), 0)
+
+@override_settings(GRADING_BATCH_SIZE=1)
+class ConcurrentMarkingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            first_name="Test",
+            last_name="User",
+            date_of_birth=date(2000, 1, 1),
+            year_group=12,
+            password="testpassword"
+        )
+        self.questions = [
+            {"id": i, "question_text": f"Explain idea {i}.", "difficulty": "hard", "question_type": "long_answer",
+             "options": [], "answer_key": f"Key {i}", "marks": 3, "topic": "Physics"}
+            for i in range(1, 7)
+        ]
+        self.questions.insert(2, {"id": 10, "question_text": "What is 2 + 2?", "difficulty": "hard",
+                                  "question_type": "multiple_choice", "options": ["3", "4"], "answer_key": "4",
+                                  "marks": "1", "topic": "Physics"})
+        self.answers = {str(q["id"]): f"Answer {q['id']}" for q in self.questions}
+        self.answers["10"] = "4"
+        grading_cache.clear()
+
+    def fake_grader(self, delay):
+        import threading
+        import time
+
+        self.active = self.peak = 0
+        lock = threading.Lock()
+
+        def mark(answer, answer_key, marks):
+            with lock:
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+            time.sleep(delay)
+            with lock:
+                self.active -= 1
+            return int(answer_key.split()[-1]) % (marks + 1)
+
+        return mark
+
+    def test_long_answers_are_marked_concurrently_in_question_order(self):
+        import time
+        from .utils import save_completed_quiz
+
+        with mock.patch("api.utils.mark_answer", self.fake_grader(0.2)), self.settings(GRADING_MAX_WORKERS=6):
+            started = time.monotonic()
+            quiz, _ = save_completed_quiz(self.user, "Physics", self.questions, self.answers, "hard")
+            elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 0.6)
+        self.assertEqual(self.peak, 6)
+        marks = list(quiz.questions.order_by("id").values_list("question_text", "marks"))
+        self.assertEqual(marks, [
+            ("Explain idea 1.", 1), ("Explain idea 2.", 2), ("What is 2 + 2?", 1), ("Explain idea 3.", 3),
+            ("Explain idea 4.", 0), ("Explain idea 5.", 1), ("Explain idea 6.", 2),
+        ])
+
+    def test_concurrency_is_bounded_by_setting(self):
+        from .utils import save_completed_quiz
+
+        with mock.patch("api.utils.mark_answer", self.fake_grader(0.05)), self.settings(GRADING_MAX_WORKERS=2):
+            save_completed_quiz(self.user, "Physics", self.questions, self.answers, "hard")
+
+        self.assertEqual(self.peak, 2)
+
+@override_settings(GRADING_BATCH_SIZE=1)
+class GradingCacheTest(TestCase):
+    def setUp(self):
+        grading_cache.clear()
+        self.calls = []
+
+    def fake_mark_answer(self, answer, answer_key, marks):
+        self.calls.append(answer)
+        return 2
+
+    def mark(self, *items):
+        from .utils import mark_long_answers
+
+        with mock.patch("api.utils.mark_answer", self.fake_mark_answer):
+            return mark_long_answers(list(items))
+
+    def test_normalized_answers_share_one_grading_call(self):
+        marks = self.mark(
+            ("Gravity pulls objects together.", "Attractive force", 3),
+            ("  gravity PULLS objects together ", "Attractive force", 3),
+        )
+        self.assertEqual(marks, [2, 2])
+        self.assertEqual(len(self.calls), 1)
+
+        self.assertEqual(self.mark(("Gravity  pulls objects   together;", "Attractive force", 3)), [2])
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(grading_cache.stats()["memory_hits"], 1)
+
+    def test_signs_and_operators_are_part_of_the_key(self):
+        from .grading_cache import normalize_answer
+
+        for first, second in (("-5", "5"), ("x > 5", "x < 5"), ("a && b", "a || b"), ("10^3", "10 3")):
+            self.assertNotEqual(normalize_answer(first), normalize_answer(second))
+        self.mark(("x > 5", "x is greater than 5", 2), ("x < 5", "x is greater than 5", 2))
+        self.assertEqual(len(self.calls), 2)
+
+    def test_failed_cache_write_does_not_fail_grading(self):
+        from django.db import OperationalError
+
+        with mock.patch.object(GradedAnswer.objects, "bulk_create", side_effect=OperationalError("database is locked")), \
+                self.assertLogs("api.grading_cache", "WARNING"):
+            self.assertEqual(self.mark(("Gravity pulls.", "Attractive force", 3)), [2])
+        self.assertEqual(self.mark(("Gravity pulls.", "Attractive force", 3)), [2])
+        self.assertEqual(len(self.calls), 1)
+        self.assertFalse(GradedAnswer.objects.exists())
+
+    def test_database_tier_survives_process_cache_loss(self):
+        self.mark(("Gravity pulls.", "Attractive force", 3))
+        grading_cache.clear()
+
+        self.assertEqual(self.mark(("Gravity pulls.", "Attractive force", 3)), [2])
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(grading_cache.stats()["db_hits"], 1)
+
+    def test_mark_scheme_is_part_of_the_key(self):
+        self.mark(("Gravity pulls.", "Attractive force", 3))
+        self.mark(("Gravity pulls.", "Attractive force", 4))
+        self.mark(("Gravity pulls.", "A force between masses", 3))
+        self.assertEqual(len(self.calls), 3)
+
+    def test_expired_entries_are_regraded(self):
+        from datetime import timedelta
+
+        self.mark(("Gravity pulls.", "Attractive force", 3))
+        GradedAnswer.objects.update(created_at=now() - timedelta(days=365))
+        grading_cache.clear()
+
+        self.mark(("Gravity pulls.", "Attractive force", 3))
+        self.assertEqual(len(self.calls), 2)
+
+    def test_changed_mark_scheme_invalidates_cached_grades(self):
+        question = {"id": 1, "question_text": "Explain gravity.", "difficulty": "hard",
+                    "question_type": "long_answer", "options": [], "answer_key": "Attractive force",
+                    "marks": 3, "topic": "Physics"}
+        import_questions([question])
+
+        self.mark(("Gravity pulls.", "Attractive force", 3))
+        self.mark(("Gravity pulls.", "Something else", 3))
+        self.assertEqual(GradedAnswer.objects.count(), 2)
+
+        import_questions([dict(question, question_text="Explain gravity again.")])
+        self.assertEqual(GradedAnswer.objects.count(), 2)
+
+        import_questions([dict(question, answer_key="A force between masses")])
+        self.assertEqual(GradedAnswer.objects.count(), 1)
+        self.assertEqual(grading_cache.stats()["size"], 1)
+
+class SubmissionQueryCountTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            first_name="Test",
+            last_name="User",
+            date_of_birth=date(2000, 1, 1),
+            year_group=12,
+            password="testpassword"
+        )
+        TopicDifficultyStats.objects.create(topic="Maths", difficulty="easy", quiz_count=1, percentage_sum=50)
+
+    def questions(self, count):
+        return [
+            {"id": i, "question_text": f"What is {i} + {i}?", "difficulty": "easy",
+             "question_type": "multiple_choice", "options": [str(i), str(2 * i)], "answer_key": str(2 * i),
+             "marks": "1", "topic": "Maths"}
+            for i in range(1, count + 1)
+        ]
+
+    def test_submission_is_written_in_a_fixed_number_of_queries(self):
+        from .utils import save_completed_quiz
+
+        for count in (1, 6, 40):
+            questions = self.questions(count)
+            answers = {str(q["id"]): q["answer_key"] for q in questions}
+            with self.assertNumQueries(9):
+                quiz, quiz_questions = save_completed_quiz(self.user, "Maths", questions, answers, "easy")
+
+            self.assertEqual(quiz.grade, "A+")
+            self.assertEqual(quiz.percentage, 100.0)
+            self.assertEqual(quiz.questions.count(), count)
+            self.assertTrue(all(question.pk for question in quiz_questions))
+
+    def test_submit_view_builds_response_without_reloading_questions(self):
+        Question.objects.all().delete()
+        import_questions(self.questions(3))
+        questions = [q.as_dict() for q in Question.objects.order_by("id")]
+        answers = {str(q["id"]): "wrong" for q in questions}
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+        with self.assertNumQueries(11):
+            response = client.post(
+                "/api/submit-quiz/",
+                {"topic": "Maths", "difficulty": "easy", "submitted_answers": answers},
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [q["question_text"] for q in response.json()["submitted_questions"]],
+            [q["question_text"] for q in questions],
+        )
+
+@override_settings(GRADING_BATCH_SIZE=1)
+class DeferredGradingTest(TestCase):
+    def setUp(self):
+        grading_cache.clear()
+        self.user = User.objects.create_user(
+            first_name="Test",
+            last_name="User",
+            date_of_birth=date(2000, 1, 1),
+            year_group=12,
+            password="testpassword"
+        )
+        self.client = Client(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        self.questions = [
+            {"id": 1, "question_text": "What is 2 + 2?", "difficulty": "hard", "question_type": "multiple_choice",
+             "options": ["3", "4"], "answer_key": "4", "marks": "1", "topic": "Physics"},
+            {"id": 2, "question_text": "Explain gravity.", "difficulty": "hard", "question_type": "long_answer",
+             "options": [], "answer_key": "An attractive force.", "marks": 3, "topic": "Physics"},
+        ]
+        self.answers = {"1": "4", "2": "Masses attract each other."}
+        import_questions(self.questions)
+
+    def submit(self):
+        with mock.patch("api.utils.mark_answer") as mark_answer:
+            response = self.client.post(
+                "/api/submit-quiz/",
+                {"topic": "Physics", "difficulty": "hard", "submitted_answers": self.answers, "defer_grading": True},
+                content_type="application/json",
+            )
+        mark_answer.assert_not_called()
+        return response
+
+    def test_submit_returns_accepted_with_objective_marks(self):
+        response = self.submit()
+        self.assertEqual(response.status_code, 202)
+        data = response.json()
+        self.assertEqual(data["status"], "pending")
+        self.assertEqual(data["percentage"], 25.0)
+        self.assertEqual([(q["marks"], q["pending"]) for q in data["submitted_questions"]], [(1, False), (0, True)])
+
+        status_response = self.client.get(f"/api/grading-jobs/{data['job_id']}/")
+        self.assertEqual(status_response.status_code, 200)
+        self.assertEqual(status_response.json()["status"], "queued")
+
+    def test_defer_grading_strings_are_parsed_as_booleans(self):
+        payload = {"topic": "Physics", "difficulty": "hard", "submitted_answers": self.answers}
+        with mock.patch("api.utils.mark_answer", return_value=3):
+            for value, status_code in (("false", 201), ("0", 201), ("true", 202), ("maybe", 400)):
+                response = self.client.post(
+                    "/api/submit-quiz/", dict(payload, defer_grading=value), content_type="application/json"
+                )
+                self.assertEqual(response.status_code, status_code, value)
+
+    def test_worker_grades_job_and_status_endpoint_returns_result(self):
+        from .grading_queue import process_pending_jobs
+
+        job_id = self.submit().json()["job_id"]
+        with mock.patch("api.utils.mark_answer", return_value=3):
+            self.assertEqual(process_pending_jobs(), 1)
+        self.assertEqual(process_pending_jobs(), 0)
+
+        data = self.client.get(f"/api/grading-jobs/{job_id}/").json()
+        self.assertEqual(data["status"], "done")
+        self.assertEqual(data["quiz_status"], "graded")
+        self.assertEqual(data["percentage"], 100.0)
+        self.assertEqual(data["grade"], "A+")
+        self.assertEqual([(q["marks"], q["pending"]) for q in data["submitted_questions"]], [(1, False), (3, False)])
+
+    def test_failed_grading_is_retried_then_marked_failed(self):
+        from .grading_queue import process_pending_jobs
+        from .models import GradingJob
+
+        job_id = self.submit().json()["job_id"]
+        with mock.patch("api.utils.mark_answer", side_effect=RuntimeError("upstream error")), \
+                self.settings(GRADING_JOB_MAX_ATTEMPTS=2):
+            process_pending_jobs()
+
+        job = GradingJob.objects.get(pk=job_id)
+        self.assertEqual(job.status, GradingJob.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(job.error, "upstream error")
+        self.assertEqual(job.quiz.status, CompletedQuiz.PENDING)
+
+    def deferred_quiz(self, topic):
+        from .utils import save_completed_quiz
+
+        question = dict(self.questions[1], topic=topic)
+        quiz, _ = save_completed_quiz(self.user, topic, [question], {"2": "Masses attract."}, "hard",
+                                      defer_long_answers=True)
+        return quiz
+
+    def test_failed_topic_does_not_hold_back_other_jobs(self):
+        from .grading_queue import process_pending_jobs
+        from .models import GradingJob
+
+        physics, chemistry = self.deferred_quiz("Physics"), self.deferred_quiz("Chemistry")
+        marks = lambda items, topic: [None if topic == "Physics" else 3] * len(items)
+        with mock.patch("api.grading_queue.mark_long_answers", side_effect=marks), \
+                self.settings(GRADING_JOB_MAX_ATTEMPTS=1):
+            process_pending_jobs()
+
+        self.assertEqual(GradingJob.objects.get(quiz=physics).status, GradingJob.FAILED)
+        self.assertEqual(GradingJob.objects.get(quiz=chemistry).status, GradingJob.DONE)
+        self.assertEqual(CompletedQuiz.objects.get(pk=chemistry.pk).percentage, 100.0)
+
+    def test_committed_jobs_are_not_reset_by_a_later_failure(self):
+        from .grading_queue import process_pending_jobs
+        from .models import GradingJob
+        from .stats import record_quiz_stats
+
+        first, second = self.deferred_quiz("Physics"), self.deferred_quiz("Physics")
+        calls = []
+
+        def flaky_stats(quiz):
+            calls.append(quiz.pk)
+            if quiz.pk == second.pk and calls.count(quiz.pk) == 1:
+                raise RuntimeError("database hiccup")
+            record_quiz_stats(quiz)
+
+        with mock.patch("api.utils.mark_answer", return_value=3), \
+                mock.patch("api.grading_queue.record_quiz_stats", side_effect=flaky_stats):
+            process_pending_jobs(limit=2)
+            first_job = GradingJob.objects.get(quiz=first)
+            second_job = GradingJob.objects.get(quiz=second)
+            self.assertEqual(first_job.status, GradingJob.DONE)
+            self.assertEqual((second_job.status, second_job.error), (GradingJob.QUEUED, "database hiccup"))
+            self.assertEqual(CompletedQuiz.objects.get(pk=second.pk).status, CompletedQuiz.PENDING)
+
+            self.assertEqual(process_pending_jobs(), 1)
+
+        self.assertEqual(calls, [first.pk, second.pk, second.pk])
+        self.assertEqual(TopicDifficultyStats.objects.get(topic="Physics", difficulty="hard").quiz_count, 2)
+
+    def test_reclaimed_job_is_finished_by_its_new_owner_only(self):
+        from datetime import timedelta
+        from .grading_queue import claim_next_job, fail_job, finish_job
+        from .models import GradingJob
+
+        quiz = self.deferred_quiz("Physics")
+        stale = claim_next_job()
+        GradingJob.objects.filter(pk=stale.pk).update(started_at=now() - timedelta(hours=1))
+        stale.started_at = GradingJob.objects.get(pk=stale.pk).started_at
+        current = claim_next_job()
+        self.assertEqual(current.pk, stale.pk)
+
+        def graded(job):
+            questions = list(job.quiz.questions.order_by("id"))
+            for question in questions:
+                question.marks, question.is_correct, question.pending = 3, True, False
+            return questions
+
+        self.assertFalse(finish_job(stale, graded(stale), graded(stale)))
+        fail_job(stale, RuntimeError("late failure"))
+        self.assertEqual(GradingJob.objects.get(pk=current.pk).status, GradingJob.RUNNING)
+
+        questions = graded(current)
+        self.assertTrue(finish_job(current, questions, questions))
+        self.assertFalse(finish_job(stale, graded(stale), graded(stale)))
+        self.assertEqual(GradingJob.objects.get(pk=current.pk).status, GradingJob.DONE)
+        self.assertEqual(CompletedQuiz.objects.get(pk=quiz.pk).status, CompletedQuiz.GRADED)
+        self.assertEqual(TopicDifficultyStats.objects.get(topic="Physics", difficulty="hard").quiz_count, 1)
+
+    def test_worker_thread_survives_a_failed_batch(self):
+        from .grading_queue import run_workers
+
+        results = iter([RuntimeError("boom"), 1])
+
+        def process_pending_jobs(limit=None):
+            result = next(results, 0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        with mock.patch("api.grading_queue.process_pending_jobs", side_effect=process_pending_jobs) as run, \
+                mock.patch("api.grading_queue.close_old_connections"), \
+                mock.patch("api.grading_queue.connection"), \
+                self.assertLogs("api.grading_queue", "ERROR") as logs:
+            threads, stop_event = run_workers(1, poll_interval=0.01)
+            for _ in range(200):
+                if run.call_count >= 3:
+                    break
+                stop_event.wait(0.01)
+            stop_event.set()
+            threads[0].join(1)
+
+        self.assertGreaterEqual(run.call_count, 3)
+        self.assertIn("boom", "\n".join(logs.output))
+
+    def test_other_users_cannot_poll_job(self):
+        job_id = self.submit().json()["job_id"]
+        other = User.objects.create_user(
+            first_name="Other", last_name="User", date_of_birth=date(2001, 2, 2), year_group=12, password="pw"
+        )
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(other).access_token}")
+        self.assertEqual(client.get(f"/api/grading-jobs/{job_id}/").status_code, 404)
+
+class BatchGradingTest(TestCase):
+    def setUp(self):
+        grading_cache.clear()
+        self.items = [
+            ("Masses attract.", "An attractive force.", 3),
+            ("Energy is conserved.", "Energy cannot be created or destroyed.", 2),
+            ("It speeds up.", "Acceleration is the rate of change of velocity.", 4),
+        ]
+
+    def completion(self, content):
+        from types import SimpleNamespace
+
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    def grader(self, *contents):
+        from .graders import OpenAIGrader
+
+        client = mock.Mock()
+        client.chat.completions.create.side_effect = [self.completion(content) for content in contents]
+        return OpenAIGrader(client=client), client.chat.completions.create
+
+    def test_items_are_graded_in_one_structured_completion(self):
+        content = json.dumps({"grades": [{"id": 2, "marks": 1}, {"id": 0, "marks": 3}, {"id": 1, "marks": 2}]})
+        grader, create = self.grader(content)
+        self.assertEqual(grader.mark_answers(self.items), [3, 2, 1])
+
+        create.assert_called_once()
+        self.assertEqual(create.call_args.kwargs["response_format"]["type"], "json_schema")
+
+    def test_missing_or_out_of_range_items_are_retried_individually(self):
+        content = json.dumps({"grades": [{"id": 0, "marks": 9}, {"id": 1, "marks": 2}]})
+        grader, create = self.grader(content, "1", "1")
+        self.assertEqual(grader.mark_answers(self.items), [1, 2, 1])
+
+        retried = [call.kwargs["messages"][1]["content"] for call in create.call_args_list[1:]]
+        self.assertEqual(retried, [
+            "Student answer: Masses attract.\nMark scheme: An attractive force.",
+            "Student answer: It speeds up.\nMark scheme: Acceleration is the rate of change of velocity.",
+        ])
+
+    def test_unparseable_reply_falls_back_to_single_grading(self):
+        grader, create = self.grader("3, 2, 1", "0", "0", "0")
+        self.assertEqual(grader.mark_answers(self.items), [0, 0, 0])
+        self.assertEqual(create.call_count, 4)
+
+    @override_settings(GRADING_BATCH_SIZE=2, GRADING_MAX_WORKERS=4)
+    def test_submission_long_answers_are_split_into_batches(self):
+        from .utils import mark_long_answers
+
+        with mock.patch("api.utils.mark_answers", side_effect=lambda batch: [len(batch)] * len(batch)) as batches, \
+                mock.patch("api.utils.mark_answer", return_value=0):
+            self.assertEqual(mark_long_answers(self.items), [2, 2, 0])
+
+        self.assertEqual(batches.call_count, 1)
+
+    def test_worker_batches_pending_answers_across_submissions(self):
+        from .grading_queue import process_pending_jobs
+        from .utils import save_completed_quiz
+
+        user = User.objects.create_user(
+            first_name="Test", last_name="User", date_of_birth=date(2000, 1, 1), year_group=12, password="pw"
+        )
+        question = {"id": 1, "question_text": "Explain gravity.", "difficulty": "hard", "question_type": "long_answer",
+                    "options": [], "answer_key": "An attractive force.", "marks": 3, "topic": "Physics"}
+        for answer in ("Masses attract.", "Things fall down.", "Masses attract!"):
+            save_completed_quiz(user, "Physics", [question], {"1": answer}, "hard", defer_long_answers=True)
+
+        with mock.patch("api.utils.mark_answers", side_effect=lambda batch: [2] * len(batch)) as batches:
+            self.assertEqual(process_pending_jobs(), 3)
+
+        self.assertEqual(len(batches.call_args.args[0]), 2)
+        self.assertEqual(
+            list(CompletedQuiz.objects.order_by("id").values_list("status", "percentage")),
+            [("graded", 66.67)] * 3,
+        )
+
+class GraderBackendTest(TestCase):
+    def setUp(self):
+        grading_cache.clear()
+
+    def test_backend_is_selected_from_settings(self):
+        from .graders import DeterministicGrader, OpenAIGrader, get_grader
+
+        with self.settings(GRADER={"BACKEND": "api.graders.DeterministicGrader"}):
+            self.assertIsInstance(get_grader(), DeterministicGrader)
+        self.assertIsInstance(get_grader(), OpenAIGrader)
+
+    def test_deterministic_grader_is_stable_and_bounded(self):
+        from .graders import DeterministicGrader
+
+        grader = DeterministicGrader()
+        key = "Gravity is a force that attracts two bodies towards each other."
+        self.assertEqual(grader.mark_answer("Gravity is a force that attracts bodies.", key, 5), 3)
+        self.assertEqual(grader.mark_answer(key.upper(), key, 5), 5)
+        self.assertEqual(grader.mark_answer("No idea", key, 5), 0)
+        self.assertEqual(grader.mark_answers([("No idea", key, 5), (key, key, 2)]), [0, 2])
+
+    @override_settings(GRADER={"BACKEND": "api.graders.DeterministicGrader"})
+    def test_submission_is_graded_by_configured_backend_and_cached_per_model(self):
+        from .models import GradedAnswer
+        from .utils import save_completed_quiz
+
+        user = User.objects.create_user(
+            first_name="Test", last_name="User", date_of_birth=date(2000, 1, 1), year_group=12, password="pw"
+        )
+        question = {"id": 4, "question_text": "Explain the concept of gravity.", "difficulty": "hard",
+                    "question_type": "long_answer", "options": [], "marks": 5, "topic": "Physics",
+                    "answer_key": "Gravity is a force that attracts two bodies towards each other."}
+        quiz, _ = save_completed_quiz(
+            user, "Physics", [question], {"4": "Gravity is a force that attracts bodies."}, "hard"
+        )
+
+        self.assertEqual(quiz.percentage, 60.0)
+        self.assertEqual(GradedAnswer.objects.get().model, "deterministic")
+
+    def test_http_fake_serves_chat_completions(self):
+        from .fake_grader import serve
+        from .graders import HTTPFakeGrader
+
+        server, thread = serve(port=0, latency=0, error_rate=0)
+        self.addCleanup(server.shutdown)
+        grader = HTTPFakeGrader(base_url=f"http://127.0.0.1:{server.server_port}/v1", max_retries=0)
+
+        key = "Gravity is a force that attracts two bodies towards each other."
+        self.assertEqual(grader.mark_answer("Gravity is a force that attracts bodies.", key, 5), 3)
+        self.assertEqual(grader.mark_answers([("No idea", key, 5), (key, key, 2)]), [0, 2])
+        self.assertEqual(server.requests_served, 2)
+
+    def test_http_fake_injects_errors(self):
+        import openai
+        from .fake_grader import serve
+        from .graders import HTTPFakeGrader
+
+        server, thread = serve(port=0, latency=0, error_rate=1)
+        self.addCleanup(server.shutdown)
+        grader = HTTPFakeGrader(base_url=f"http://127.0.0.1:{server.server_port}/v1", max_retries=0)
+
+        with self.assertRaises(openai.APIStatusError):
+            grader.mark_answer("Masses attract.", "An attractive force.", 3)
+
+class TopicDifficultyReportTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            first_name="Admin", last_name="User", date_of_birth=date(1990, 1, 1), year_group=13, password="pw"
+        )
+        self.students = [
+            User.objects.create_user(
+                first_name=name, last_name="Student", date_of_birth=date(2008, 1, 1), year_group=11, password="pw"
+            )
+            for name in ("Amy", "Ben", "Cat")
+        ]
+        self.client = Client(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.admin).access_token}")
+        self.question = {"id": 1, "question_text": "What is 2 + 2?", "difficulty": "easy",
+                         "question_type": "multiple_choice", "options": ["3", "4"], "answer_key": "4",
+                         "marks": "1", "topic": "Maths"}
+        self.question2 = dict(self.question, id=2, question_text="What is 3 + 3?", answer_key="6")
+
+    def submit(self, student, *answers):
+        from .utils import save_completed_quiz
+
+        return save_completed_quiz(
+            student, "Maths", [self.question, self.question2], dict(zip(("1", "2"), answers)), "easy"
+        )[0]
+
+    def report(self):
+        return self.client.post(
+            "/api/topic-difficulty-report/", {"topic": "Maths", "difficulty": "easy"}, content_type="application/json"
+        )
+
+    def test_stats_are_maintained_on_submission_and_served_in_one_query(self):
+        self.submit(self.students[0], "4", "5")
+        self.submit(self.students[1], "4", "6")
+        self.submit(self.students[2], "4", "6")
+        self.submit(self.students[0], "3", "5")
+
+        stats = TopicDifficultyStats.objects.get(topic="Maths", difficulty="easy")
+        self.assertEqual((stats.quiz_count, stats.percentage_sum, stats.max_percentage), (4, 250.0, 100.0))
+        self.assertEqual(stats.top_user, self.students[1])
+
+        response = self.report()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            "topic": "Maths",
+            "difficulty": "easy",
+            "average_score": 62,
+            "highest_score": 100.0,
+            "top_user": {"username": self.students[1].username, "first_name": "Ben", "last_name": "Student"},
+        })
+
+        with self.assertNumQueries(1):
+            self.report()
+
+    def test_missing_stats_returns_not_found(self):
+        self.assertEqual(self.report().status_code, 404)
+
+    def test_deleted_top_user_is_reported_as_null(self):
+        self.submit(self.students[1], "4", "6")
+        self.students[1].delete()
+
+        response = self.report()
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()["top_user"])
+
+    def test_rebuild_matches_incremental_stats(self):
+        self.submit(self.students[0], "4", "5")
+        self.submit(self.students[2], "4", "6")
+        self.submit(self.students[1], "4", "6")
+        incremental = list(TopicDifficultyStats.objects.values_list(
+            "topic", "difficulty", "quiz_count", "percentage_sum", "max_percentage", "top_user"
+        ))
+
+        TopicDifficultyStats.objects.all().delete()
+        call_command("rebuild_topic_stats", stdout=open(os.devnull, "w"))
+
+        rebuilt = list(TopicDifficultyStats.objects.values_list(
+            "topic", "difficulty", "quiz_count", "percentage_sum", "max_percentage", "top_user"
+        ))
+        self.assertEqual(rebuilt, incremental)
+        self.assertEqual(rebuilt[0][-1], self.students[2].pk)
+
+class QueryPlanTest(TestCase):
+    def setUp(self):
+        from django.db import connection
+
+        if connection.vendor != "sqlite":
+            self.skipTest("EXPLAIN QUERY PLAN assertions are SQLite specific.")
+
+        self.user = User.objects.create_user(
+            first_name="Test", last_name="User", date_of_birth=date(2000, 1, 1), year_group=12, password="pw"
+        )
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(f"USING INDEX {index_name} ", plan)
+        self.assertNotIn("SCAN api_completedquiz", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_user_history_pages_use_user_created_index(self):
+        from .views import history_queryset
+
+        self.assertUsesIndex(history_queryset(self.user)[:21], "completedquiz_user_created_id")
+
+        cursor_page = history_queryset(self.user, (now(), 10))[:21]
+        self.assertUsesIndex(cursor_page, "completedquiz_user_created_id")
+        self.assertIn("created_at<", cursor_page.explain().replace(" ", ""))
+
+    def test_topic_leaderboard_uses_topic_score_index(self):
+        self.assertUsesIndex(
+            CompletedQuiz.objects.filter(topic="Maths", difficulty="easy").order_by("-percentage"),
+            "completedquiz_topic_score",
+        )
+
+class ExportViewTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            first_name="Admin", last_name="User", date_of_birth=date(1990, 1, 1), year_group=13, password="pw"
+        )
+        self.year11 = User.objects.create_user(
+            first_name="Amy", last_name="Student", date_of_birth=date(2008, 1, 1), year_group=11, password="pw"
+        )
+        self.year12 = User.objects.create_user(
+            first_name="Ben", last_name="Student", date_of_birth=date(2007, 1, 1), year_group=12, password="pw"
+        )
+        self.client = Client(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.admin).access_token}")
+        for user, topic in ((self.year11, "Maths"), (self.year11, "Physics"), (self.year12, "Maths")):
+            quiz = CompletedQuiz.objects.create(
+                user=user, topic=topic, number_of_questions=1, difficulty="easy", grade="A", percentage=90.0
+            )
+            CompletedQuizQuestion.objects.create(
+                quiz=quiz, question_text=f"{topic}, question", answer_key="4", submitted_answer="4",
+                marks=1, total_marks=1, is_correct=True
+            )
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_quizzes_stream_as_csv_with_filters(self):
+        response = self.client.get("/api/export/quizzes/", {"year_group": 11})
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(io.StringIO(self.content(response))))
+        self.assertEqual([(row["username"], row["topic"]) for row in rows],
+                         [(self.year11.username, "Maths"), (self.year11.username, "Physics")])
+
+    def test_questions_stream_as_json_lines(self):
+        response = self.client.get(
+            "/api/export/quiz-questions/",
+            {"output": "jsonl", "topic": "Maths", "start": now().strftime("%Y-%m-%d"),
+             "end": now().strftime("%Y-%m-%d")},
+        )
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual([row["username"] for row in rows], [self.year11.username, self.year12.username])
+        self.assertEqual(rows[0]["question_text"], "Maths, question")
+
+        response = self.client.get("/api/export/quiz-questions/", {"output": "jsonl", "start": "2000-01-01",
+                                                                    "end": "2000-01-02"})
+        self.assertEqual(self.content(response), "")
+
+    def test_invalid_parameters_and_non_admins_are_rejected(self):
+        self.assertEqual(self.client.get("/api/export/quizzes/", {"output": "xml"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/export/quizzes/", {"start": "yesterday"}).status_code, 400)
+
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.year11).access_token}")
+        self.assertEqual(client.get("/api/export/quizzes/").status_code, 403)
+
+class UsernameAllocationTest(TestCase):
+    def create(self, first_name="Test", last_name="User"):
+        return User.objects.create_user(
+            first_name=first_name, last_name=last_name, date_of_birth=date(2000, 1, 2), year_group=12, password="pw"
+        )
+
+    def test_usernames_are_allocated_from_per_base_counter(self):
+        self.assertEqual(self.create().username, "TesUSE0102")
+        self.assertEqual(self.create().username, "TesUSE0102_2")
+        self.assertEqual(self.create("Tess", "Useful").username, "TesUSE0102_3")
+        self.assertEqual(self.create("Amy").username, "AmyUSE0102")
+
+    def test_suggestion_is_a_single_lookup_and_matches_next_allocation(self):
+        self.create()
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                "/api/generate-username/", {"first_name": "Test", "last_name": "User", "date_of_birth": "2000-01-02"}
+            )
+        self.assertEqual(response.json(), {"username": "TesUSE0102_2"})
+        self.assertEqual(self.create().username, "TesUSE0102_2")
+
+    def test_suggestion_for_new_base_has_no_suffix(self):
+        response = self.client.get(
+            "/api/generate-username/", {"first_name": "New", "last_name": "Person", "date_of_birth": "2000-01-02"}
+        )
+        self.assertEqual(response.json(), {"username": "NewPER0102"})
+
+
+    def test_counter_created_by_a_concurrent_registration_is_reused(self):
+        from django.db.models import QuerySet
+        from .models import UsernameCounter
+
+        update = QuerySet.update
+        raced = []
+
+        def racing_update(queryset, **kwargs):
+            if queryset.model is UsernameCounter and not raced:
+                raced.append(True)
+                UsernameCounter.objects.bulk_create([UsernameCounter(base="TesUSE0102", count=1)])
+                return 0
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, "update", racing_update):
+            username = User.objects.generate_username("Test", "User", date(2000, 1, 2))
+
+        self.assertEqual(username, "TesUSE0102_2")
+        self.assertEqual(UsernameCounter.objects.get(base="TesUSE0102").count, 2)
+
+class UserSearchTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            first_name="Admin", last_name="Person", date_of_birth=date(1990, 1, 1), year_group=13, password="pw"
+        )
+        self.client = Client(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.admin).access_token}")
+        self.jane = self.create("Jane", "Smith")
+        self.janet = self.create("Janet", "Jones")
+        self.john = self.create("John", "Smithers")
+
+    def create(self, first_name, last_name):
+        return User.objects.create_user(
+            first_name=first_name, last_name=last_name, date_of_birth=date(2008, 3, 4), year_group=11, password="pw"
+        )
+
+    def search(self, query):
+        response = self.client.get("/api/search/", {"query": query})
+        self.assertEqual(response.status_code, 200)
+        return [user["username"] for user in response.json()]
+
+    def test_prefix_search_over_usernames_and_names(self):
+        self.assertEqual(set(self.search("jan")), {self.jane.username, self.janet.username})
+        self.assertEqual(set(self.search("smith")), {self.jane.username, self.john.username})
+        self.assertEqual(self.search("JohSMI"), [self.john.username])
+
+    def test_multi_term_queries_match_all_terms(self):
+        self.assertEqual(self.search("jan smi"), [self.jane.username])
+        self.assertEqual(self.search("jane smithers"), [])
+
+    def test_index_follows_account_changes(self):
+        self.janet.last_name = "Smith"
+        self.janet.save()
+        self.assertEqual(set(self.search("jan smith")), {self.jane.username, self.janet.username})
+
+        self.jane.delete()
+        self.assertEqual(self.search("jan smith"), [self.janet.username])
+
+    def test_saves_that_skip_name_fields_are_not_reindexed(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .search import SEARCH_TABLE
+
+        self.jane.year_group = 12
+        with CaptureQueriesContext(connection) as queries:
+            self.jane.save(update_fields=["year_group"])
+        self.assertFalse([query for query in queries if SEARCH_TABLE in query["sql"]])
+
+        self.jane.last_name = "Jones"
+        self.jane.save(update_fields=["last_name"])
+        self.assertEqual(set(self.search("jones")), {self.jane.username, self.janet.username})
+
+    def test_search_uses_fts_index_on_sqlite(self):
+        from django.db import connection
+        from .search import fts_enabled
+
+        if connection.vendor != "sqlite":
+            self.skipTest("FTS5 index is SQLite specific.")
+        self.assertTrue(fts_enabled())
+        with self.assertNumQueries(2):
+            self.search("jan")
+
+class QuestionImportTest(TestCase):
+    def setUp(self):
+        Question.objects.all().delete()
+        self.records = [
+            {"id": 12, "question_text": " Explain the causes of WW1. ", "difficulty": "Hard",
+             "question_type": "long_anwser", "options": [], "answer_key": "Alliances, imperialism.",
+             "marks": "6", "topic": "History"},
+            {"id": 30, "question_text": "What does CPU stand for?", "difficulty": "medium",
+             "question_type": "multiple_choice", "options": ["Central Processing Unit", "Core Power Unit"],
+             "answer_key": "Central Processing Unit", "marks": "1", "topic": "Computer science"},
+            {"id": 2, "question_text": "Which of these are programming languages?", "difficulty": "medium",
+             "question_type": "multi_select", "options": ["Python", "HTML", "JavaScript", "CSS"],
+             "answer_key": ["Python", "JavaScript"], "marks": "2", "topic": "Computer Science"},
+        ]
+
+    def test_records_are_normalized(self):
+        imported, errors = import_questions(self.records)
+        self.assertEqual((imported, errors), (3, []))
+
+        self.assertEqual(
+            list(Question.objects.order_by("id").values_list("id", "topic", "difficulty", "question_type", "marks")),
+            [(2, "Computer Science", "medium", "multiple_select", 2),
+             (12, "History", "hard", "long_answer", 6),
+             (30, "Computer Science", "medium", "multiple_choice", 1)],
+        )
+        self.assertEqual(Question.objects.get(pk=12).question_text, "Explain the causes of WW1.")
+
+    def test_invalid_records_are_reported_and_skipped(self):
+        records = self.records + [
+            {"id": 40, "question_text": "?", "difficulty": "impossible", "question_type": "multiple_choice",
+             "options": ["a"], "answer_key": "a", "marks": 1, "topic": "Maths"},
+            {"id": 41, "question_text": "?", "difficulty": "easy", "question_type": "multiple_choice",
+             "options": ["a", "b"], "answer_key": "c", "marks": 1, "topic": "Maths"},
+            {"question_text": "No id"},
+        ]
+        imported, errors = import_questions(records)
+        self.assertEqual(imported, 3)
+        self.assertEqual([position for position, _ in errors], [4, 5, 6])
+
+    def test_reimport_is_idempotent_and_updates_in_place(self):
+        import_questions(self.records, batch_size=2)
+        import_questions(self.records, batch_size=2)
+        self.assertEqual(Question.objects.count(), 3)
+
+        import_questions([dict(self.records[0], marks=8)])
+        self.assertEqual(Question.objects.count(), 3)
+        self.assertEqual(Question.objects.get(pk=12).marks, 8)
+
+    def test_json_array_and_json_lines_are_streamed(self):
+        from .question_import import iter_json_array, iter_records
+
+        array = json.dumps(self.records, indent=2)
+        self.assertEqual(list(iter_json_array(io.StringIO(array), chunk_size=7)), self.records)
+        self.assertEqual(list(iter_records(io.StringIO(array))), self.records)
+
+        lines = "\n".join(json.dumps(record) for record in self.records) + "\n\n"
+        self.assertEqual(list(iter_records(io.StringIO(lines))), self.records)
+
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO(array[:-20]), chunk_size=7))
+
+    def test_management_command_imports_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as file:
+            file.write("\n".join(json.dumps(record) for record in self.records))
+        self.addCleanup(os.remove, file.name)
+
+        out = io.StringIO()
+        call_command("import_questions", file.name, "--batch-size", "1", stdout=out, stderr=io.StringIO())
+        self.assertIn("Imported 3 questions, skipped 0 invalid records.", out.getvalue())
+        self.assertEqual(Question.objects.count(), 3)
+
+    def test_question_list_is_served_from_the_model(self):
+        user = User.objects.create_user(
+            first_name="Test", last_name="User", date_of_birth=date(2000, 1, 1), year_group=12, password="pw"
+        )
+        import_questions(self.records)
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+
+        data = client.get("/api/questions/", {"topic": "Computer Science", "difficulty": "medium"}).json()
+        self.assertEqual(sorted(q["id"] for q in data), [2, 30])
+
+
+class QuestionSamplingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            first_name="Test", last_name="User", date_of_birth=date(2000, 1, 1), year_group=12, password="pw"
+        )
+        self.client = Client(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        import_questions([
+            {"id": i, "question_text": f"What is {i} + {i}?", "difficulty": "easy",
+             "question_type": "multiple_choice", "options": [str(2 * i), "0"], "answer_key": str(2 * i),
+             "marks": 1, "topic": "Maths"}
+            for i in range(1, 8)
+        ])
+
+    def test_recently_answered_questions_are_not_repeated(self):
+        from .sampling import remember_questions
+
+        remember_questions(self.user, [1, 2, 3, 4])
+        for _ in range(10):
+            data = self.client.get("/api/questions/", {"topic": "Maths", "difficulty": "easy"}).json()
+            self.assertEqual(sorted(q["id"] for q in data), [5, 6, 7])
+
+    def test_exhausted_bucket_falls_back_to_seen_questions(self):
+        from .sampling import question_buckets, remember_questions
+
+        remember_questions(self.user, [1, 2, 3, 4, 5, 6])
+        chosen = question_buckets.sample("Maths", "easy", 3, exclude=[1, 2, 3, 4, 5, 6])
+        self.assertEqual(len(set(chosen)), 3)
+        self.assertIn(7, chosen)
+        self.assertEqual(question_buckets.sample("Maths", "hard", 3), [])
+
+    @override_settings(RECENT_QUESTIONS_LIMIT=4)
+    def test_recent_questions_are_a_bounded_ring(self):
+        from .sampling import recent_question_ids, remember_questions
+
+        remember_questions(self.user, [1, 2, 3])
+        remember_questions(self.user, [2, 4, 5])
+        self.assertEqual(list(recent_question_ids(self.user)), [3, 2, 4, 5])
+
+    def test_import_invalidates_buckets(self):
+        from .sampling import question_buckets
+
+        self.assertEqual(len(question_buckets.buckets()[("Maths", "easy")]), 7)
+        import_questions([{"id": 8, "question_text": "What is 8 + 8?", "difficulty": "easy",
+                           "question_type": "multiple_choice", "options": ["16", "0"], "answer_key": "16",
+                           "marks": 1, "topic": "Maths"}])
+        with self.assertNumQueries(1):
+            self.assertEqual(len(question_buckets.buckets()[("Maths", "easy")]), 8)
+        with self.assertNumQueries(0):
+            question_buckets.buckets()
+
+    def test_stale_bucket_skips_deleted_questions(self):
+        from .sampling import question_buckets
+
+        question_buckets.buckets()
+        with mock.patch.object(question_buckets, "invalidate"):
+            Question.objects.filter(pk__lte=6).delete()
+
+        response = self.client.get("/api/questions/", {"topic": "Maths", "difficulty": "easy"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue({q["id"] for q in response.json()} <= {7})
+        self.assertEqual(list(question_buckets.buckets()[("Maths", "easy")]), [7])
+
+    def test_submission_records_questions_as_recent(self):
+        from .sampling import recent_question_ids
+
+        self.client.post("/api/submit-quiz/", {"topic": "Maths", "difficulty": "easy", "submitted_answers": {"1": "2", "5": "10"}},
+                         content_type="application/json")
+        self.assertEqual(sorted(recent_question_ids(self.user)), [1, 5])
+
+
+class QuizHistoryCacheTest(TestCase):
+    def setUp(self):
+        history_cache.clear()
+        self.user = User.objects.create_user(
+            first_name="Test", last_name="User", date_of_birth=date(2000, 1, 1), year_group=12, password="pw"
+        )
+        self.client = Client(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        self.question = {"id": 1, "question_text": "What is 2 + 2?", "difficulty": "easy",
+                         "question_type": "multiple_choice", "options": ["3", "4"], "answer_key": "4",
+                         "marks": 1, "topic": "Maths"}
+
+    def submit(self, answer):
+        from .utils import save_completed_quiz
+
+        return save_completed_quiz(self.user, "Maths", [self.question], {"1": answer}, "easy")[0]
+
+    def test_repeated_loads_are_served_from_the_cache(self):
+        self.submit("4")
+        first = self.client.get("/api/completed-quizzes/", {"include": "questions"}).json()
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/completed-quizzes/", {"include": "questions"}).json()
+
+        self.assertEqual(first, second)
+        self.assertEqual(history_cache.stats(), {"hits": 1, "misses": 1, "hit_ratio": 0.5})
+
+    def test_cache_is_keyed_per_user_and_parameters(self):
+        other = User.objects.create_user(
+            first_name="Other", last_name="User", date_of_birth=date(2000, 1, 1), year_group=12, password="pw"
+        )
+        other_client = Client(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(other).access_token}")
+        self.submit("4")
+
+        self.assertEqual(len(self.client.get("/api/completed-quizzes/").json()["results"]), 1)
+        self.assertEqual(other_client.get("/api/completed-quizzes/").json()["results"], [])
+        data = self.client.get("/api/completed-quizzes/", {"include": "questions"}).json()
+        self.assertIn("questions", data["results"][0])
+
+    def test_new_submission_invalidates_history(self):
+        self.submit("4")
+        self.assertEqual(len(self.client.get("/api/completed-quizzes/").json()["results"]), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.submit("3")
+        results = self.client.get("/api/completed-quizzes/").json()["results"]
+        self.assertEqual(len(results), 2)
+
+    def test_finished_grading_invalidates_history(self):
+        quiz = self.submit("4")
+        self.client.get("/api/completed-quizzes/")
+
+        quiz.grade = "U"
+        quiz.save(update_fields=["grade"])
+        self.assertEqual(self.client.get("/api/completed-quizzes/").json()["results"][0]["grade"], "U")
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            caches = {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                                  "LOCATION": location}}
+            with self.settings(CACHES=caches):
+                self.submit("4")
+                first = self.client.get("/api/completed-quizzes/").json()
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.client.get("/api/completed-quizzes/").json(), first)
+                self.assertTrue(os.listdir(location))
+
+
+class ProductionSettingsTest(TestCase):
+    def load_production_settings(self, **env):
+        import importlib
+
+        env = {
+            "DJANGO_SECRET_KEY": "production-key", "ALLOWED_HOSTS": "quiz.example.com",
+            "CACHE_LOCATION": "redis://cache:6379/0", "ALLOW_LOCAL_CACHE": None, **env,
+        }
+        with mock.patch.dict(os.environ, {key: value for key, value in env.items() if value is not None}):
+            for key in [key for key, value in env.items() if value is None]:
+                os.environ.pop(key, None)
+            from quizsite import settings_production
+            return importlib.reload(settings_production)
+
+    def test_production_requires_secret_key_and_hosts(self):
+        from django.core.exceptions import ImproperlyConfigured
+
+        with self.assertRaisesMessage(ImproperlyConfigured, "DJANGO_SECRET_KEY"):
+            self.load_production_settings(DJANGO_SECRET_KEY=None)
+        with self.assertRaisesMessage(ImproperlyConfigured, "ALLOWED_HOSTS"):
+            self.load_production_settings(ALLOWED_HOSTS="")
+
+        settings_production = self.load_production_settings(ALLOWED_HOSTS="quiz.example.com, www.example.com")
+        self.assertEqual(settings_production.SECRET_KEY, "production-key")
+        self.assertEqual(settings_production.ALLOWED_HOSTS, ["quiz.example.com", "www.example.com"])
+
+    def test_production_requires_redis_or_memcached(self):
+        from django.core.exceptions import ImproperlyConfigured
+
+        for backend in ("django.core.cache.backends.locmem.LocMemCache", "django.core.cache.backends.db.DatabaseCache"):
+            with self.assertRaisesMessage(ImproperlyConfigured, "CACHE_BACKEND"):
+                self.load_production_settings(CACHE_BACKEND=backend, CACHE_LOCATION="quizsite_cache")
+        with self.assertRaisesMessage(ImproperlyConfigured, "CACHE_LOCATION"):
+            self.load_production_settings(CACHE_BACKEND=None, CACHE_LOCATION=None)
+
+        settings_production = self.load_production_settings(CACHE_BACKEND=None, CACHE_LOCATION="redis://cache:6379/0")
+        self.assertEqual(settings_production.CACHES["default"], {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://cache:6379/0",
+        })
+
+    def test_single_process_runs_may_use_a_local_cache(self):
+        settings_production = self.load_production_settings(
+            ALLOW_LOCAL_CACHE="1", CACHE_BACKEND="django.core.cache.backends.locmem.LocMemCache"
+        )
+        self.assertEqual(
+            settings_production.CACHES["default"]["BACKEND"], "django.core.cache.backends.locmem.LocMemCache"
+        )
+
+    def test_production_profile_drops_debug_tooling(self):
+        settings_production = self.load_production_settings()
+
+        self.assertFalse(settings_production.DEBUG)
+        self.assertNotIn("debug_toolbar", settings_production.INSTALLED_APPS)
+        self.assertFalse(any("debug_toolbar" in m for m in settings_production.MIDDLEWARE))
+        self.assertGreater(settings_production.DATABASES["default"]["CONN_MAX_AGE"], 0)
+        self.assertEqual(settings_production.SQLITE_PRAGMAS["journal_mode"], "WAL")
+        loaders = settings_production.TEMPLATES[0]["OPTIONS"]["loaders"]
+        self.assertEqual(loaders[0][0], "django.template.loaders.cached.Loader")
+
+    def test_pragmas_are_applied_to_new_connections(self):
+        from django.db import connection
+        from .db import configure_sqlite
+
+        with self.settings(SQLITE_PRAGMAS={"cache_size": -4321, "busy_timeout": 1234}):
+            configure_sqlite(sender=connection.__class__, connection=connection)
+
+        with connection.cursor() as cursor:
+            self.assertEqual(cursor.execute("PRAGMA cache_size").fetchone()[0], -4321)
+            self.assertEqual(cursor.execute("PRAGMA busy_timeout").fetchone()[0], 1234)
+
+
+@override_settings(GRADER={"BACKEND": "api.graders.DeterministicGrader"})
+class AsyncSubmissionTest(TestCase):
+    def setUp(self):
+        grading_cache.clear()
+        self.user = User.objects.create_user(
+            first_name="Test", last_name="User", date_of_birth=date(2000, 1, 1), year_group=12, password="pw"
+        )
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        import_questions([
+            {"id": 1, "question_text": "What is 2 + 2?", "difficulty": "easy", "question_type": "multiple_choice",
+             "options": ["3", "4"], "answer_key": "4", "marks": 1, "topic": "Physics"},
+            {"id": 2, "question_text": "Explain the concept of gravity.", "difficulty": "easy",
+             "question_type": "long_answer", "answer_key": "Gravity is a force that attracts two bodies.",
+             "marks": 4, "topic": "Physics"},
+        ])
+
+    def post(self, payload, token=None):
+        from django.test import AsyncClient
+
+        return AsyncClient().post(
+            "/api/submit-quiz/async/", payload, content_type="application/json",
+            headers={"Authorization": f"Bearer {token}"} if token else {},
+        )
+
+    async def test_async_submission_is_graded_and_saved(self):
+        response = await self.post(
+            {"topic": "Physics", "difficulty": "easy",
+             "submitted_answers": {"1": "4", "2": "Gravity is a force that attracts two bodies."}},
+            self.token,
+        )
+
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data["percentage"], 100.0)
+        self.assertEqual([q["marks"] for q in data["submitted_questions"]], [1, 4])
+        quiz = await CompletedQuiz.objects.aget(pk=data["quiz_id"])
+        self.assertEqual(await quiz.questions.acount(), 2)
+
+    async def test_async_submission_can_defer_grading(self):
+        response = await self.post(
+            {"topic": "Physics", "difficulty": "easy", "defer_grading": True, "submitted_answers": {"2": "Mass"}},
+            self.token,
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertIn("job_id", response.json())
+
+    async def test_async_submission_parses_defer_grading(self):
+        payload = {"topic": "Physics", "difficulty": "easy", "submitted_answers": {"2": "Mass"}}
+        response = await self.post(dict(payload, defer_grading="false"), self.token)
+        self.assertEqual(response.status_code, 201)
+        response = await self.post(dict(payload, defer_grading="maybe"), self.token)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_async_submission_requires_authentication_and_answers(self):
+        payload = {"topic": "Physics", "submitted_answers": {"1": "4"}}
+        self.assertEqual((await self.post(payload)).status_code, 401)
+        self.assertEqual((await self.post(payload, "nope")).status_code, 401)
+        self.assertEqual((await self.post({"topic": "Physics"}, self.token)).status_code, 400)
+        self.assertEqual((await self.post("[", self.token)).status_code, 400)
+
+    @override_settings(
+        GRADER={"BACKEND": "api.graders.DeterministicGrader", "OPTIONS": {"latency": 0.2}},
+        GRADING_BATCH_SIZE=1, GRADING_MAX_WORKERS=20,
+    )
+    async def test_long_answers_are_graded_concurrently_on_the_event_loop(self):
+        import time
+        from .utils import amark_long_answers
+
+        items = [(f"Gravity attracts bodies {i}", "Gravity is a force that attracts two bodies.", 4)
+                 for i in range(20)]
+        started = time.perf_counter()
+        marks = await amark_long_answers(items)
+        self.assertLess(time.perf_counter() - started, 2)
+        self.assertEqual(marks, [2] * 20)
+        self.assertEqual(await GradedAnswer.objects.acount(), 20)
+
+    async def test_openai_grader_batches_and_falls_back_asynchronously(self):
+        from types import SimpleNamespace
+        from .graders import OpenAIGrader
+
+        def completion(content):
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+        client = mock.Mock()
+        client.chat.completions.create = mock.AsyncMock(side_effect=[
+            completion(json.dumps({"grades": [{"id": 0, "marks": 2}]})),
+            completion("1"),
+        ])
+        grader = OpenAIGrader()
+        grader._async_clients = mock.MagicMock(get=mock.Mock(return_value=client))
+
+        self.assertEqual(await grader.amark_answers([("a", "key", 3), ("b", "key", 3)]), [2, 1])
+        self.assertEqual(client.chat.completions.create.await_count, 2)
+
+
+@override_settings(GRADER={"BACKEND": "api.graders.DeterministicGrader"})
+class MetricsTest(TestCase):
+    def setUp(self):
+        from .metrics import registry
+
+        registry.clear()
+        grading_cache.clear()
+        history_cache.clear()
+        self.user = User.objects.create_user(
+            first_name="Test", last_name="User", date_of_birth=date(2000, 1, 1), year_group=12, password="pw"
+        )
+        self.client = Client(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        import_questions([
+            {"id": 1, "question_text": "Explain the concept of gravity.", "difficulty": "easy",
+             "question_type": "long_answer", "answer_key": "Gravity is a force that attracts two bodies.",
+             "marks": 4, "topic": "Physics"},
+        ])
+
+    @override_settings(METRICS_TOKEN="scrape-token")
+    def metrics(self):
+        response = Client(HTTP_AUTHORIZATION="Bearer scrape-token").get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        return response.content.decode()
+
+    def test_requests_are_recorded_per_url_name(self):
+        self.client.get("/api/questions/", {"topic": "Physics", "difficulty": "easy"})
+        self.client.get("/api/questions/", {"topic": "Physics", "difficulty": "easy"})
+        self.client.get("/api/completed-quizzes/")
+
+        metrics = self.metrics()
+        self.assertIn('quizmaster_http_requests_total{method="GET",status="200",view="questions"} 2', metrics)
+        self.assertIn('quizmaster_http_request_duration_seconds_count{view="questions"} 2', metrics)
+        self.assertIn('quizmaster_http_request_duration_seconds_bucket{view="questions",le="+Inf"} 2', metrics)
+        self.assertIn('quizmaster_http_response_size_bytes_count{view="user_completed_quizzes"} 1', metrics)
+        self.assertIn('quizmaster_db_queries_per_request_count{view="questions"} 2', metrics)
+        self.assertIn('quizmaster_db_query_duration_seconds_total{view="questions"}', metrics)
+
+    @override_settings(METRICS_TOKEN="scrape-token")
+    def test_metrics_require_the_scrape_token_or_staff(self):
+        self.assertEqual(Client().get("/metrics").status_code, 403)
+        self.assertEqual(Client(HTTP_AUTHORIZATION="Bearer wrong").get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    def test_query_counts_match_the_queries_issued(self):
+        from .metrics import registry
+
+        with self.assertNumQueries(2):
+            self.client.get("/api/completed-quizzes/")
+        counters, histograms = registry.snapshot()
+        _, _, total, count = histograms[("quizmaster_db_queries_per_request", (("view", "user_completed_quizzes"),))]
+        self.assertEqual((total, count), (2, 1))
+
+    @override_settings(GRADING_BATCH_SIZE=1)
+    def test_grading_calls_are_attributed_to_the_submitting_view(self):
+        self.client.post(
+            "/api/submit-quiz/",
+            {"topic": "Physics", "difficulty": "easy", "submitted_answers": {"1": "Gravity attracts bodies."}},
+            content_type="application/json",
+        )
+
+        metrics = self.metrics()
+        self.assertIn(
+            'quizmaster_grading_calls_total{model="deterministic",outcome="ok",view="submit_quiz"} 1', metrics
+        )
+        self.assertIn('quizmaster_grading_duration_seconds_count{model="deterministic",view="submit_quiz"} 1', metrics)
+
+    @override_settings(GRADING_BATCH_SIZE=1)
+    def test_cache_stats_are_exported_as_gauges(self):
+        payload = {"topic": "Physics", "difficulty": "easy", "submitted_answers": {"1": "Gravity attracts bodies."}}
+        for _ in range(2):
+            self.client.post("/api/submit-quiz/", payload, content_type="application/json")
+            self.client.get("/api/completed-quizzes/")
+        self.client.get("/api/completed-quizzes/")
+
+        metrics = self.metrics()
+        self.assertIn("# TYPE quizmaster_cache_hit_ratio gauge", metrics)
+        self.assertIn('quizmaster_cache_hits{cache="grading",tier="memory"} 1', metrics)
+        self.assertIn('quizmaster_cache_misses{cache="grading"} 1', metrics)
+        self.assertIn('quizmaster_cache_hit_ratio{cache="grading"} 0.5', metrics)
+        self.assertIn('quizmaster_cache_entries{cache="grading"} 1', metrics)
+        self.assertIn('quizmaster_cache_hits{cache="history",tier="shared"} 1', metrics)
+        self.assertIn('quizmaster_cache_misses{cache="history"} 2', metrics)
+
+    def test_registry_is_safe_across_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from .metrics import MetricsRegistry
+
+        registry = MetricsRegistry()
+
+        def record(_):
+            for _ in range(1000):
+                registry.inc("quizmaster_http_requests_total", {"view": "questions"})
+                registry.observe("quizmaster_http_request_duration_seconds", {"view": "questions"}, 0.01)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(record, range(8)))
+
+        counters, histograms = registry.snapshot()
+        self.assertEqual(counters[("quizmaster_http_requests_total", (("view", "questions"),))], 8000)
+        self.assertEqual(histograms[("quizmaster_http_request_duration_seconds", (("view", "questions"),))][3], 8000)
+
+
+@override_settings(GRADING_BATCH_SIZE=1, GRADING_MAX_RETRIES=2, GRADING_BREAKER_THRESHOLD=3)
+class ResilientGradingTest(TestCase):
+    def setUp(self):
+        grading_cache.clear()
+        self.user = User.objects.create_user(
+            first_name="Test", last_name="User", date_of_birth=date(2000, 1, 1), year_group=12, password="pw"
+        )
+        self.question = {"id": 4, "question_text": "Explain the concept of gravity.", "difficulty": "hard",
+                         "question_type": "long_answer", "options": [], "marks": 5, "topic": "Physics",
+                         "answer_key": "Gravity is a force that attracts two bodies towards each other."}
+        self.client_mock = mock.Mock()
+        self.grader = {"BACKEND": "api.graders.OpenAIGrader", "OPTIONS": {"client": self.client_mock}}
+        sleep = mock.patch("api.grading_client.time.sleep")
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def completion(self, content, prompt_tokens=30, completion_tokens=1):
+        from types import SimpleNamespace
+
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens),
+        )
+
+    def submit(self, answer="Masses attract."):
+        from .utils import save_completed_quiz
+
+        return save_completed_quiz(self.user, "Physics", [self.question], {"4": answer}, "hard")[0]
+
+    def test_replies_are_parsed_and_clamped(self):
+        from .graders import parse_marks
+        from .grading_client import InvalidGrade
+
+        self.assertEqual(parse_marks("3", 5), 3)
+        self.assertEqual(parse_marks("Score: 4/5", 5), 4)
+        self.assertEqual(parse_marks("9", 5), 5)
+        with self.assertRaises(InvalidGrade):
+            parse_marks("Seven marks", 5)
+
+    def test_transient_failures_are_retried_with_backoff_and_recorded(self):
+        from .models import GradingCall
+
+        self.client_mock.chat.completions.create.side_effect = [
+            TimeoutError("read timed out"), self.completion("four"), self.completion("4", 40, 2),
+        ]
+        with self.settings(GRADER=self.grader):
+            quiz = self.submit()
+
+        self.assertEqual(quiz.status, CompletedQuiz.GRADED)
+        self.assertEqual(quiz.percentage, 80.0)
+        self.assertEqual(self.sleep.call_count, 2)
+        self.assertLessEqual(self.sleep.call_args_list[1].args[0], 1.0)
+
+        call = GradingCall.objects.get()
+        self.assertEqual((call.outcome, call.attempts, call.topic), (GradingCall.OK, 3, "Physics"))
+        self.assertEqual((call.prompt_tokens, call.completion_tokens), (70, 3))
+        self.assertGreaterEqual(call.latency_ms, 0)
+
+    def test_exhausted_retries_degrade_to_pending_grading(self):
+        from .models import GradingCall, GradingJob
+
+        self.client_mock.chat.completions.create.side_effect = TimeoutError("read timed out")
+        with self.settings(GRADER=self.grader):
+            quiz = self.submit()
+
+        self.assertEqual(quiz.status, CompletedQuiz.PENDING)
+        self.assertEqual(GradingJob.objects.get(quiz=quiz).status, GradingJob.QUEUED)
+        self.assertEqual(quiz.questions.get().pending, True)
+        self.assertEqual(GradingCall.objects.get().outcome, GradingCall.TIMEOUT)
+        self.assertFalse(GradedAnswer.objects.exists())
+
+    def test_open_breaker_rejects_calls_without_blocking(self):
+        from .graders import get_grader
+        from .models import GradingCall
+
+        self.client_mock.chat.completions.create.side_effect = TimeoutError("read timed out")
+        with self.settings(GRADER=self.grader):
+            self.submit()
+            self.assertEqual(get_grader().breaker.state, "open")
+
+            quiz = self.submit("Something else.")
+            self.assertEqual(quiz.status, CompletedQuiz.PENDING)
+            self.assertEqual(self.client_mock.chat.completions.create.call_count, 3)
+
+        self.assertEqual(
+            list(GradingCall.objects.order_by("id").values_list("outcome", flat=True)),
+            [GradingCall.TIMEOUT, GradingCall.REJECTED],
+        )
+
+    def test_worker_requeues_jobs_without_spending_attempts_while_breaker_is_open(self):
+        from .graders import get_grader
+        from .grading_queue import process_pending_jobs
+        from .models import GradingJob
+
+        self.client_mock.chat.completions.create.side_effect = TimeoutError("read timed out")
+        with self.settings(GRADER=self.grader):
+            quiz = self.submit()
+            self.assertEqual(process_pending_jobs(), 0)
+            job = GradingJob.objects.get(quiz=quiz)
+            self.assertEqual((job.status, job.attempts), (GradingJob.QUEUED, 0))
+
+            get_grader().breaker.reset()
+            self.client_mock.chat.completions.create.side_effect = None
+            self.client_mock.chat.completions.create.return_value = self.completion("5")
+            self.assertEqual(process_pending_jobs(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, GradingJob.DONE)
+        self.assertEqual(CompletedQuiz.objects.get(pk=quiz.pk).percentage, 100.0)
+
+    def test_usage_report_summarises_calls_per_topic(self):
+        from .models import GradingCall
+
+        GradingCall.objects.bulk_create(
+            [GradingCall(model="gpt", topic="Physics", outcome=GradingCall.OK, latency_ms=ms,
+                         prompt_tokens=10, completion_tokens=1) for ms in (100, 200, 300)]
+            + [GradingCall(model="gpt", topic="Physics", outcome=GradingCall.TIMEOUT, latency_ms=900)]
+        )
+        out = io.StringIO()
+        call_command("grading_usage", stdout=out)
+        self.assertEqual(out.getvalue().splitlines()[1].split(), ["Physics", "4", "1", "33", "300.0", "900.0", "900.0"])
+
+    def test_breaker_half_opens_after_reset_timeout(self):
+        from .grading_client import CircuitBreaker
+
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+        with mock.patch("api.grading_client.time.monotonic", return_value=100):
+            breaker.record_failure()
+            self.assertTrue(breaker.allow())
+            breaker.record_failure()
+            self.assertFalse(breaker.allow())
+        with mock.patch("api.grading_client.time.monotonic", return_value=111):
+            self.assertTrue(breaker.allow())
+            self.assertFalse(breaker.allow())
+            breaker.record_failure()
+            self.assertEqual(breaker.state, "open")
+        with mock.patch("api.grading_client.time.monotonic", return_value=122):
+            self.assertTrue(breaker.allow())
+            breaker.record_success()
+            self.assertEqual(breaker.state, "closed")
+
+
+class LoadTestCommandTest(TestCase):
+    def test_load_test_writes_per_endpoint_results(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.json")
+            call_command(
+                "load_test", "--in-place", "--students", "2", "--quizzes", "2", "--questions", "9",
+                "--topics", "1", "--concurrency", "1", "--grader", "deterministic", "--grader-latency", "0",
+                "--output", output, stdout=io.StringIO(),
+            )
+            out = io.StringIO()
+            call_command(
+                "load_test", "--in-place", "--students", "1", "--quizzes", "1", "--questions", "3",
+                "--topics", "1", "--concurrency", "1", "--grader", "deterministic", "--grader-latency", "0",
+                "--output", os.path.join(directory, "next.json"), "--baseline", output, stdout=out,
+            )
+            with open(output) as file:
+                results = json.load(file)
+
+        self.assertEqual(results["config"]["students"], 2)
+        self.assertEqual(set(results["endpoints"]), {"questions", "submit_quiz", "user_completed_quizzes"})
+        for summary in results["endpoints"].values():
+            self.assertEqual((summary["requests"], summary["errors"]), (4, 0))
+            self.assertGreater(summary["queries_per_request"], 0)
+        self.assertEqual(results["total"]["requests"], 12)
+        self.assertIn("submit_quiz: throughput", out.getvalue())
+
+
+    def test_concurrent_submissions_do_not_error(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.json")
+            call_command(
+                "load_test", "--students", "8", "--quizzes", "2", "--questions", "9", "--topics", "1",
+                "--concurrency", "4", "--grader", "deterministic", "--grader-latency", "0.01",
+                "--output", output, stdout=io.StringIO(),
+            )
+            with open(output) as file:
+                results = json.load(file)
+
+        for summary in results["endpoints"].values():
+            self.assertEqual((summary["requests"], summary["errors"]), (16, 0))
+
+
+class ClassSubmissionImportTest(TestCase):
+    def setUp(self):
+        grading_cache.clear()
+        self.alice = User.objects.create_user(
+            first_name="Alice", last_name="Smith", date_of_birth=date(2008, 1, 1), year_group=12, password="pw"
+        )
+        self.bob = User.objects.create_user(
+            first_name="Bob", last_name="Jones", date_of_birth=date(2008, 1, 1), year_group=12, password="pw"
+        )
+        import_questions([
+            {"id": 1, "topic": "Physics", "difficulty": "easy", "question_type": "multiple_choice",
+             "question_text": "Unit of force?", "options": ["Newton", "Joule"], "answer_key": "Newton", "marks": 1},
+            {"id": 2, "topic": "Physics", "difficulty": "easy", "question_type": "multiple_select",
+             "question_text": "Vectors?", "options": ["Force", "Mass", "Velocity"],
+             "answer_key": ["Force", "Velocity"], "marks": 2},
+            {"id": 3, "topic": "Physics", "difficulty": "easy", "question_type": "long_answer",
+             "question_text": "Define work.", "answer_key": "Force times distance", "marks": 3},
+        ])
+        self.rows = [
+            ("username", "question_id", "answer"),
+            (self.alice.username, "1", "newton"),
+            (self.alice.username, "2", "Force, Velocity"),
+            (self.alice.username, "3", "Force multiplied by distance"),
+            ("NOBODY", "1", "Newton"),
+            (self.bob.username, "1", "Joule"),
+            (self.bob.username, "", "Mass"),
+            (self.bob.username, "3", "Force multiplied by distance"),
+            (self.bob.username, "99", "?"),
+        ]
+
+    def write_csv(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, newline="") as file:
+            csv.writer(file).writerows(self.rows)
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    def import_submissions(self, path, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command("import_submissions", path, "--batch-size", "1", *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_class_answers_are_graded_and_saved_in_bulk(self):
+        path = self.write_csv()
+        with mock.patch("api.utils.mark_answer", return_value=2) as mark_answer, \
+                mock.patch("api.utils.mark_answers", side_effect=lambda batch: [2] * len(batch)) as mark_answers:
+            out, err = self.import_submissions(path, "--batch-size", "10")
+
+        self.assertEqual(mark_answer.call_count + mark_answers.call_count, 1)
+        self.assertIn("Saved 2 submissions, skipped 3 invalid rows.", out)
+        self.assertEqual(err.splitlines(), [
+            "Row 8: saved 2 submissions, 3 errors.",
+            "Row 4: Unknown username 'NOBODY'.",
+            "Row 6: Missing fields: question_id.",
+            "Row 8: Unknown question id 99.",
+        ])
+        self.assertFalse(os.path.exists(f"{path}.checkpoint"))
+
+        alice_quiz = CompletedQuiz.objects.get(user=self.alice)
+        self.assertEqual((alice_quiz.topic, alice_quiz.difficulty, alice_quiz.percentage), ("Physics", "easy", 83.33))
+        self.assertEqual(
+            list(alice_quiz.questions.order_by("id").values_list("marks", flat=True)), [1, 2, 2]
+        )
+        bob_quiz = CompletedQuiz.objects.get(user=self.bob)
+        self.assertEqual((bob_quiz.number_of_questions, bob_quiz.percentage), (2, 50.0))
+        self.assertEqual(TopicDifficultyStats.objects.get(topic="Physics", difficulty="easy").quiz_count, 2)
+
+    def test_students_sitting_the_same_paper_are_scored_together(self):
+        self.rows = [
+            ("username", "question_id", "answer"),
+            (self.alice.username, "1", "Newton"),
+            (self.alice.username, "2", "Force"),
+            (self.bob.username, "1", "Joule"),
+            (self.bob.username, "2", "Force,Velocity"),
+        ]
+        with mock.patch("api.class_submissions.score_submissions", wraps=score_submissions) as scorer:
+            self.import_submissions(self.write_csv(), "--batch-size", "10")
+
+        scorer.assert_called_once()
+        self.assertEqual(len(scorer.call_args.args[1]), 2)
+        self.assertEqual(
+            dict(CompletedQuiz.objects.values_list("user__username", "percentage")),
+            {self.alice.username: 66.67, self.bob.username: 66.67},
+        )
+
+    def test_repeated_question_is_a_row_error(self):
+        self.rows = [
+            ("username", "question_id", "answer"),
+            (self.alice.username, "1", "Newton"),
+            (self.alice.username, "1", "Joule"),
+            (self.alice.username, "2", "Force,Velocity"),
+        ]
+        out, err = self.import_submissions(self.write_csv(), "--batch-size", "10")
+
+        self.assertIn("Saved 1 submissions, skipped 1 invalid rows.", out)
+        self.assertIn("Row 2: Duplicate answer to question 1 (first given on row 1).", err)
+        quiz = CompletedQuiz.objects.get(user=self.alice)
+        self.assertEqual((quiz.number_of_questions, quiz.percentage), (2, 100.0))
+
+    def test_deferred_grading_queues_jobs(self):
+        from .models import GradingJob
+
+        self.import_submissions(self.write_csv(), "--defer-grading")
+        self.assertEqual(GradingJob.objects.filter(quiz__status=CompletedQuiz.PENDING).count(), 2)
+        self.assertFalse(TopicDifficultyStats.objects.exists())
+
+    def test_import_resumes_after_checkpoint(self):
+        path = self.write_csv()
+        with open(f"{path}.checkpoint", "w") as file:
+            json.dump({"path": path, "row": 4}, file)
+
+        with mock.patch("api.utils.mark_answer", return_value=3):
+            out, err = self.import_submissions(path)
+
+        self.assertIn("Resuming after row 4.", err)
+        self.assertNotIn("Row ", out)
+        self.assertEqual(list(CompletedQuiz.objects.values_list("user_id", flat=True)), [self.bob.id])
+        self.assertFalse(os.path.exists(f"{path}.checkpoint"))
+
+    def test_checkpoint_records_last_saved_row(self):
+        path = self.write_csv()
+        with mock.patch("api.utils.mark_answer", return_value=3), \
+                mock.patch("api.class_submissions.ClassSubmissionImport.save",
+                           side_effect=[[CompletedQuiz()], RuntimeError("interrupted")]):
+            with self.assertRaises(RuntimeError):
+                self.import_submissions(path)
+
+        with open(f"{path}.checkpoint") as file:
+            self.assertEqual(json.load(file), {"path": path, "row": 4})
+        os.remove(f"{path}.checkpoint")
+
+
+class ScoringEngineTest(TestCase):
+    def legacy_marks(self, question, submitted_answer):
+        if question["question_type"] == "multiple_choice":
+            return int(question["marks"]) if submitted_answer.lower() == question["answer_key"].lower() else 0
+        total = 0
+        for answer in submitted_answer:
+            total += 1 if answer in question["answer_key"] else -1
+        return max(0, total)
+
+    def random_question(self, rng, question_id):
+        options = rng.sample(["Force", "Mass", "Energy", "Velocity", "Newton", "Joule", "Atom", "Cell"], rng.randint(2, 6))
+        question = {
+            "id": question_id,
+            "question_type": rng.choice(["multiple_choice", "multiple_select"]),
+            "options": options,
+            "marks": rng.randint(1, 4),
+        }
+        if question["question_type"] == "multiple_choice":
+            question["answer_key"] = rng.choice(options)
+        else:
+            question["answer_key"] = rng.sample(options, rng.randint(1, len(options)))
+        return question
+
+    def random_answer(self, rng, question):
+        if question["question_type"] == "multiple_choice":
+            answer = rng.choice(question["options"])
+            return rng.choice([answer, answer.upper(), answer.lower()])
+        return rng.sample(question["options"], rng.randint(0, len(question["options"])))
+
+    def test_compiled_keys_match_legacy_rules_on_valid_answers(self):
+        rng = random.Random(2024)
+        for _ in range(300):
+            questions = [self.random_question(rng, question_id) for question_id in range(1, rng.randint(2, 8))]
+            answers = {str(question["id"]): self.random_answer(rng, question) for question in questions}
+            self.assertEqual(
+                objective_marks(questions, answers),
+                [self.legacy_marks(question, answers[str(question["id"])]) for question in questions],
+            )
+
+    def test_multiple_select_accepts_comma_separated_strings(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            question = self.random_question(rng, 1)
+            question["question_type"] = "multiple_select"
+            question["answer_key"] = rng.sample(question["options"], rng.randint(1, len(question["options"])))
+            selected = self.random_answer(rng, question)
+            self.assertEqual(
+                objective_marks([question], {"1": " , ".join(selected)}),
+                objective_marks([question], {"1": selected}),
+            )
+
+    def test_batch_scoring_matches_single_submissions(self):
+        rng = random.Random(99)
+        questions = [self.random_question(rng, question_id) for question_id in range(1, 9)]
+        questions.append({"id": 9, "question_type": "long_answer", "answer_key": "Anything.", "marks": 3})
+        submissions = [
+            {str(question["id"]): self.random_answer(rng, question) for question in questions[:-1]}
+            for _ in range(50)
+        ]
+
+        scores = score_submissions(questions, submissions)
+        self.assertEqual(scores, [objective_marks(questions, answers) for answers in submissions])
+        self.assertTrue(all(marks[-1] is None for marks in scores))
+
+    def test_unknown_and_repeated_selections_count_as_wrong(self):
+        question = {"id": 1, "question_type": "multiple_select", "options": ["3", "4", "6"],
+                    "answer_key": ["3", "6"], "marks": 2}
+        self.assertEqual(objective_marks([question], {"1": "3, 6"}), [2])
+        self.assertEqual(objective_marks([question], {"1": "3,6,7"}), [1])
+        self.assertEqual(objective_marks([question], {"1": ["3", "3"]}), [0])
+        self.assertEqual(objective_marks([question], {}), [0])
+
+
+class CachedAuthenticationTest(TestCase):
+    def setUp(self):
+        from .authentication import user_cache
+
+        user_cache.clear()
+        self.user = User.objects.create_user(
+            first_name="Test", last_name="User", date_of_birth=date(2000, 1, 1), year_group=12, password="pw"
+        )
+        self.client = Client(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def test_repeat_requests_resolve_the_user_from_cache(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get("/api/completed-quizzes/").status_code, 200)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/completed-quizzes/").status_code, 200)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get("/api/completed-quizzes/")
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.client.get("/api/completed-quizzes/").status_code, 401)
+
+    def test_queryset_update_invalidates_cached_user(self):
+        self.client.get("/api/completed-quizzes/")
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        self.assertEqual(self.client.get("/api/completed-quizzes/").status_code, 401)
+
+    def test_bulk_update_invalidates_cached_user(self):
+        self.client.get("/api/completed-quizzes/")
+        self.user.is_active = False
+        User.objects.bulk_update([self.user], ["is_active"])
+
+        self.assertEqual(self.client.get("/api/completed-quizzes/").status_code, 401)
+
+    def test_invalidation_from_another_process_is_seen(self):
+        from django.core.cache import cache
+        from .authentication import version_key
+
+        self.client.get("/api/completed-quizzes/")
+        cache.set(version_key(self.user.pk), 0, None)
+
+        with self.assertNumQueries(1):
+            self.client.get("/api/completed-quizzes/")
+
+    def test_inactive_cached_user_is_rejected(self):
+        from .authentication import user_cache
+
+        self.user.is_active = False
+        user_cache.set(self.user.pk, self.user)
+
+        self.assertEqual(self.client.get("/api/completed-quizzes/").status_code, 401)
+
+    @override_settings(JWT_USER_CACHE_TTL=5)
+    def test_cached_users_expire(self):
+        with mock.patch("api.authentication.time.monotonic", return_value=100):
+            self.client.get("/api/completed-quizzes/")
+        with mock.patch("api.authentication.time.monotonic", return_value=106), self.assertNumQueries(1):
+            self.client.get("/api/completed-quizzes/")
+
+    def test_token_view_reuses_authenticated_user(self):
+        with self.assertNumQueries(1):
+            response = Client().post(
+                "/api/token/", {"username": self.user.username, "password": "pw"}, content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["user"]["username"], self.user.username)
+
+        self.client = Client(HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}")
+        with self.assertNumQueries(1):
+            self.client.get("/api/completed-quizzes/")
+
+    def test_invalid_credentials_are_rejected(self):
+        response = Client().post("/api/token/", {"username": self.user.username, "password": "wrong"},
+                                 content_type="application/json")
+        self.assertEqual(response.status_code, 401)
+
+
+class RosterImportTest(TestCase):
+    def write_csv(self, rows):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, newline="") as file:
+            csv.writer(file).writerows([("first_name", "last_name", "date_of_birth", "year_group", "password")] + rows)
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    def import_roster(self, path, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command("import_roster", path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_roster_creates_accounts_with_allocated_usernames(self):
+        User.objects.create_user(
+            first_name="Jane", last_name="Doe", date_of_birth=date(2008, 3, 4), year_group=12, password="pw"
+        )
+        path = self.write_csv([
+            ("Jane", "Doe", "2008-03-04", "12", "first"),
+            ("Sam", "Lee", "2009-11-30", "11", "second"),
+            ("Bad", "Year", "2009-11-30", "20", "third"),
+            ("Jane", "Doe", "2008-03-04", "12", "fourth"),
+            ("", "Blank", "not a date", "11", "fifth"),
+        ])
+
+        out, err = self.import_roster(path, "--workers", "2", "--batch-size", "2")
+
+        self.assertEqual(out.splitlines(), [
+            "row,username,first_name,last_name",
+            "1,JanDOE0304_2,Jane,Doe",
+            "2,SamLEE1130,Sam,Lee",
+            "4,JanDOE0304_3,Jane,Doe",
+        ])
+        self.assertIn("Row 3: year_group:", err)
+        self.assertIn("Row 5: first_name:", err)
+        self.assertIn("Created 3 accounts, skipped 2 invalid rows.", err)
+        self.assertTrue(User.objects.get(username="JanDOE0304_3").check_password("fourth"))
+        self.assertEqual(User.objects.suggest_username("Jane", "Doe", date(2008, 3, 4)), "JanDOE0304_4")
+
+        self.assertEqual([user.username for user in search_accounts("sam")], ["SamLEE1130"])
+
+    def test_username_clash_is_reallocated(self):
+        User.objects.create(
+            username="SamLEE1130", first_name="Sam", last_name="Lee", date_of_birth=date(2009, 11, 30), year_group=11
+        )
+        path = self.write_csv([
+            ("Sam", "Lee", "2009-11-30", "11", "pw"),
+            ("Amy", "Fox", "2009-01-02", "11", "pw"),
+        ])
+
+        out, err = self.import_roster(path, "--workers", "1")
+
+        self.assertEqual(out.splitlines()[1:], ["1,SamLEE1130_2,Sam,Lee", "2,AmyFOX0102,Amy,Fox"])
+        self.assertIn("Created 2 accounts, skipped 0 invalid rows.", err)
+        self.assertEqual([user.username for user in search_accounts("amy")], ["AmyFOX0102"])
+
+    def test_registration_hashes_the_password_once(self):
+        with mock.patch("django.contrib.auth.base_user.make_password", side_effect=make_password) as hasher:
+            response = Client().post("/api/register/", {
+                "first_name": "Tom", "last_name": "Hill", "date_of_birth": "2008-05-06",
+                "year_group": 12, "password": "secret",
+            }, content_type="application/json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(hasher.call_count, 1)
+        self.assertTrue(User.objects.get(username="TomHIL0506").check_password("secret"))
@@ -1,4 +1,5 @@
 from django.urls import path, include
+from django.views.decorators.csrf import csrf_exempt
 from . import views
 from rest_framework_simplejwt.views import TokenRefreshView
 
@@ -9,9 +10,14 @@ urlpatterns = [
     path('auth/', include('rest_framework.urls')),
     path('questions/', views.QuestionListView.as_view(), name='questions'),
     path('completed-quizzes/', views.UserCompletedQuizzesView.as_view(), name='user_completed_quizzes'),
+    path('completed-quizzes/<int:quiz_id>/', views.CompletedQuizDetailView.as_view(), name='completed_quiz_detail'),
     path('submit-quiz/', views.SubmitQuizView.as_view(), name='submit_quiz'),
+    path('submit-quiz/async/', csrf_exempt(views.AsyncSubmitQuizView.as_view()), name='submit_quiz_async'),
+    path('grading-jobs/<int:job_id>/', views.GradingJobStatusView.as_view(), name='grading_job_status'),
     path('generate-username/', views.GenerateUsernameView.as_view(), name='generate-username'),
     path('topic-difficulty-report/', views.TopicDifficultyReportView.as_view(), name='topic_difficulty_report'),
     path('user-quizzes-report/', views.UserQuizzesReportView.as_view(), name='user_quizzes_report'),
+    path('export/quizzes/', views.QuizExportView.as_view(), name='export_quizzes'),
+    path('export/quiz-questions/', views.QuizQuestionExportView.as_view(), name='export_quiz_questions'),
     path('search/', views.UserSearchView.as_view(), name='user-search')
 ]
\ No newline at end of file
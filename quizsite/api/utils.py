@@ -1,6 +1,17 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
 from django.utils.timezone import now
-from .LLM import mark_answer
-from .models import CompletedQuiz, CompletedQuizQuestion
+from .LLM import amark_answer, amark_answers, mark_answer, mark_answers, model_name
+from .grading_cache import cache_key, grading_cache
+from .grading_client import GradingError, grading_session, save_grading_calls
+from .sampling import remember_questions
+from .scoring import objective_marks
+from .stats import record_quiz_stats
+from .models import CompletedQuiz, CompletedQuizQuestion, GradingJob
 
 grade_key = {
     "A+": 95,
@@ -12,24 +23,120 @@ grade_key = {
     "F": 0
 }
 
-def save_completed_quiz(user, topic, questions, submitted_answers, difficulty):
-    total_marks = sum(int(question['marks']) for question in questions)
-    total_questions = len(questions)
-    marks = 0
-
-    quiz = CompletedQuiz.objects.create(
-        user=user,
-        topic=topic,
-        number_of_questions=total_questions,
-        difficulty=difficulty,
-        grade=0,
-        percentage=0,
-        created_at=now()
+def grade_batch(batch):
+    try:
+        return mark_answers(batch) if len(batch) > 1 else [mark_answer(*batch[0])]
+    except GradingError:
+        return [None] * len(batch)
+
+async def agrade_batch(batch):
+    try:
+        return await amark_answers(batch) if len(batch) > 1 else [await amark_answer(*batch[0])]
+    except GradingError:
+        return [None] * len(batch)
+
+def grading_batches(items):
+    batch_size = max(1, getattr(settings, "GRADING_BATCH_SIZE", 6))
+    return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+def grade_concurrently(items):
+    if not items:
+        return []
+
+    batches = grading_batches(items)
+    max_workers = min(getattr(settings, "GRADING_MAX_WORKERS", 6), len(batches))
+    if max_workers <= 1:
+        return [marks for batch in batches for marks in grade_batch(batch)]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, grade_batch, batch) for batch in batches]
+        return [marks for future in futures for marks in future.result()]
+
+async def agrade_concurrently(items):
+    if not items:
+        return []
+
+    semaphore = asyncio.Semaphore(max(1, getattr(settings, "GRADING_MAX_WORKERS", 6)))
+
+    async def grade(batch):
+        async with semaphore:
+            return await agrade_batch(batch)
+
+    graded = await asyncio.gather(*(grade(batch) for batch in grading_batches(items)))
+    return [marks for batch in graded for marks in batch]
+
+def cached_marks(items, model):
+    results = [grading_cache.get(*item, model) for item in items]
+
+    misses = {}
+    for item, result in zip(items, results):
+        if result is None:
+            misses.setdefault(cache_key(*item, model), item)
+    return results, misses
+
+def store_marks(items, results, misses, graded, model, calls=(), topic=""):
+    save_grading_calls(calls, topic)
+    for key, item in misses.items():
+        if graded[key] is not None:
+            grading_cache.set(*item, model, graded[key])
+
+    return [
+        graded[cache_key(*item, model)] if result is None else result
+        for item, result in zip(items, results)
+    ]
+
+def mark_long_answers(items, topic=""):
+    model = model_name()
+    results, misses = cached_marks(items, model)
+    with grading_session() as calls:
+        graded = dict(zip(misses, grade_concurrently(list(misses.values()))))
+    return store_marks(items, results, misses, graded, model, calls, topic)
+
+async def amark_long_answers(items, topic=""):
+    model = model_name()
+    results, misses = await sync_to_async(cached_marks)(items, model)
+    with grading_session() as calls:
+        graded = dict(zip(misses, await agrade_concurrently(list(misses.values()))))
+    return await sync_to_async(store_marks)(items, results, misses, graded, model, calls, topic)
+
+def grade_for_percentage(percentage):
+    for grade, min_percentage in grade_key.items():
+        if percentage >= min_percentage:
+            return grade
+
+def quiz_topic(questions):
+    return questions[0].get("topic", "") if questions else ""
+
+def long_answer_items(questions, submitted_answers):
+    return [
+        (submitted_answers.get(str(question["id"]), ""), question["answer_key"], question["marks"])
+        for question in questions
+        if question["question_type"] not in ("multiple_choice", "multiple_select")
+    ]
+
+def score_questions(questions, submitted_answers, defer_long_answers=False):
+    long_answers = long_answer_items(questions, submitted_answers)
+    long_answer_marks = (
+        [None] * len(long_answers) if defer_long_answers else mark_long_answers(long_answers, quiz_topic(questions))
+    )
+    return build_quiz_questions(questions, submitted_answers, long_answer_marks)
+
+async def ascore_questions(questions, submitted_answers, defer_long_answers=False):
+    long_answers = long_answer_items(questions, submitted_answers)
+    long_answer_marks = (
+        [None] * len(long_answers) if defer_long_answers
+        else await amark_long_answers(long_answers, quiz_topic(questions))
     )
+    return build_quiz_questions(questions, submitted_answers, long_answer_marks)
 
-    for question in questions:
-        _marks = 0
-        question_text = question["question_text"]
+def build_quiz_questions(questions, submitted_answers, long_answer_marks, marks=None):
+    long_answer_marks = iter(long_answer_marks)
+    if marks is None:
+        marks = objective_marks(questions, submitted_answers)
+
+    quiz_questions = []
+    for question, _marks in zip(questions, marks):
+        pending = False
         answer_key = question["answer_key"]
         submitted_answer = submitted_answers.get(str(question["id"]), "")
 
@@ -37,42 +144,59 @@ def save_completed_quiz(user, topic, questions, submitted_answers, difficulty):
             answer_key = answer_key.lower()
             submitted_answer = submitted_answer.lower()
 
-            if submitted_answer == answer_key:
-                _marks += int(question["marks"])
-
-        elif question["question_type"] == "multiple_select":
-            total = 0
-            for answer in submitted_answer:
-                if answer in answer_key:
-                    total += 1
-                else:
-                    total -= 1
-            _marks += max(0, total)
-
-        else:
-            _marks += mark_answer(submitted_answer, answer_key, question['marks'])
+        elif question["question_type"] != "multiple_select":
+            _marks = next(long_answer_marks)
+            pending = _marks is None
+            _marks = _marks or 0
 
-        is_correct = _marks == int(question["marks"])
-
-        CompletedQuizQuestion.objects.create(
-            quiz=quiz,
-            question_text=question_text,
+        quiz_questions.append(CompletedQuizQuestion(
+            question_text=question["question_text"],
             answer_key=answer_key,
             submitted_answer=submitted_answer,
             marks=_marks,
             total_marks=int(question["marks"]),
-            is_correct=is_correct
+            is_correct=_marks == int(question["marks"]),
+            pending=pending
+        ))
+
+    return quiz_questions
+
+def quiz_percentage(quiz_questions):
+    total_marks = sum(question.total_marks for question in quiz_questions)
+    marks = sum(question.marks for question in quiz_questions)
+    return round((marks / total_marks) * 100, 2) if total_marks > 0 else 0
+
+def persist_completed_quiz(user, topic, questions, difficulty, quiz_questions):
+    percentage = quiz_percentage(quiz_questions)
+    pending = any(question.pending for question in quiz_questions)
+
+    with transaction.atomic():
+        quiz = CompletedQuiz.objects.create(
+            user=user,
+            topic=topic,
+            number_of_questions=len(quiz_questions),
+            difficulty=difficulty,
+            grade=grade_for_percentage(percentage),
+            percentage=percentage,
+            status=CompletedQuiz.PENDING if pending else CompletedQuiz.GRADED,
+            created_at=now()
         )
+        for question in quiz_questions:
+            question.quiz = quiz
+        CompletedQuizQuestion.objects.bulk_create(quiz_questions)
+        remember_questions(user, [question["id"] for question in questions])
 
-        marks += _marks
+        if pending:
+            quiz.grading_job = GradingJob.objects.create(quiz=quiz)
+        else:
+            record_quiz_stats(quiz)
 
-    percentage = round((marks / total_marks) * 100, 2) if total_marks > 0 else 0
-    for grade, min_percentage in grade_key.items():
-        if percentage >= min_percentage:
-            quiz.grade = grade
-            break
+    return quiz, quiz_questions
 
-    quiz.percentage = percentage
-    quiz.save()
+def save_completed_quiz(user, topic, questions, submitted_answers, difficulty, defer_long_answers=False):
+    quiz_questions = score_questions(questions, submitted_answers, defer_long_answers)
+    return persist_completed_quiz(user, topic, questions, difficulty, quiz_questions)
 
-    return quiz
\ No newline at end of file
+async def asave_completed_quiz(user, topic, questions, submitted_answers, difficulty, defer_long_answers=False):
+    quiz_questions = await ascore_questions(questions, submitted_answers, defer_long_answers)
+    return await sync_to_async(persist_completed_quiz)(user, topic, questions, difficulty, quiz_questions)
@@ -1,41 +1,66 @@
+import base64
 import json
-import random
-import os
-from rest_framework import generics, views, response, status
-from .models import Account, CompletedQuiz
+from asgiref.sync import sync_to_async
+from rest_framework import generics, serializers, views, response, status
+from .models import Account, CompletedQuiz, GradingJob, Question, TopicDifficultyStats
 from .serializers import AccountSerializer
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
-from django.http import JsonResponse
-from django.db.models import Avg
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db.models import Q
 from rest_framework import status
 from rest_framework.response import Response
-from .utils import save_completed_quiz
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .authentication import CachedJWTAuthentication, user_cache
+from .utils import asave_completed_quiz, save_completed_quiz
+from .history_cache import history_cache
+from .sampling import question_buckets, recent_question_ids
+from .search import search_accounts
+from .exports import QUESTION_FIELDS, QUIZ_FIELDS, question_rows, quiz_rows, stream_csv, stream_jsonl
 from datetime import datetime
 from rest_framework_simplejwt.views import TokenObtainPairView
-from .models import CompletedQuizQuestion
+
+def submitted_question_data(question):
+    return {
+        "question_text": question.question_text,
+        "submitted_answer": question.submitted_answer,
+        "correct_answer": question.answer_key,
+        "is_correct": question.is_correct,
+        "marks": question.marks,
+        "total_marks": question.total_marks,
+        "pending": question.pending,
+    }
 
 class UserSearchView(views.APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
         query = request.GET.get('query', '')
-        users = Account.objects.filter(username__icontains=query)[:10]
+        users = search_accounts(query)
         data = [{'username': u.username, 'first_name': u.first_name, 'last_name': u.last_name} for u in users]
         return Response(data)
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
-        if response.status_code == status.HTTP_200_OK:
-            user = Account.objects.get(username=request.data.get("username"))
-            response.data["user"] = {
-                "username": user.username,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "is_staff": user.is_staff,
-                "is_superuser": user.is_superuser,
-            }
-        return response
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0]) from e
+
+        user = serializer.user
+        user_cache.set(getattr(user, jwt_settings.USER_ID_FIELD), user)
+        data = dict(serializer.validated_data)
+        data["user"] = {
+            "username": user.username,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "is_staff": user.is_staff,
+            "is_superuser": user.is_superuser,
+        }
+        return Response(data, status=status.HTTP_200_OK)
 
 class GenerateUsernameView(views.APIView):
     permission_classes = [AllowAny]
@@ -51,20 +76,7 @@ class GenerateUsernameView(views.APIView):
 
         try:
             dob = datetime.strptime(date_of_birth, "%Y-%m-%d")
-            username_base = (
-                first_name[:3].capitalize()
-                + last_name[:3].upper()
-                + dob.strftime("%m%d")
-            )
-
-            similar_usernames = Account.objects.filter(
-                username__startswith=username_base
-            )
-            if similar_usernames.exists():
-                count = similar_usernames.count()
-                generated_username = f"{username_base}_{count + 1}"
-            else:
-                generated_username = username_base
+            generated_username = Account.objects.suggest_username(first_name, last_name, dob)
 
             return Response({"username": generated_username}, status=status.HTTP_200_OK)
 
@@ -78,12 +90,6 @@ class QuestionListView(views.APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        with open(
-            os.path.join(os.path.dirname(os.path.abspath(__file__)), "questions.json"),
-            "r",
-        ) as f:
-            questions = json.load(f)
-
         topic = request.GET.get("topic")
         difficulty = request.GET.get("difficulty")
 
@@ -92,58 +98,152 @@ class QuestionListView(views.APIView):
                 {"error": "Both topic and difficulty are required."}, status=400
             )
 
-        filtered_questions = [
-            q
-            for q in questions
-            if q["topic"] == topic and q["difficulty"] == difficulty
-        ]
-
         difficulty_count_map = {"easy": 3, "medium": 4, "hard": 6}
         num_questions = difficulty_count_map.get(difficulty, 0)
 
-        selected_questions = random.sample(
-            filtered_questions, min(len(filtered_questions), num_questions)
+        selected_ids = question_buckets.sample(
+            topic, difficulty, num_questions, exclude=recent_question_ids(request.user)
         )
+        questions = Question.objects.in_bulk(selected_ids)
+        if len(questions) < len(selected_ids):
+            question_buckets.invalidate()
+        selected_questions = [
+            questions[question_id].as_dict() for question_id in selected_ids if question_id in questions
+        ]
 
         return JsonResponse(selected_questions, safe=False)
 
 
+def quiz_summary_data(quiz):
+    return {
+        "id": quiz.id,
+        "topic": quiz.topic,
+        "number_of_questions": quiz.number_of_questions,
+        "grade": quiz.grade,
+        "percentage": quiz.percentage,
+        "difficulty": quiz.difficulty,
+        "status": quiz.status,
+        "created_at": quiz.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def submission_response_data(quiz, quiz_questions):
+    data = {
+        "message": "Quiz submitted successfully.",
+        "quiz_id": quiz.id,
+        "status": quiz.status,
+        "grade": quiz.grade,
+        "percentage": quiz.percentage,
+        "submitted_questions": [submitted_question_data(q) for q in quiz_questions],
+        "created_at": quiz.created_at,
+    }
+
+    if quiz.status == CompletedQuiz.PENDING:
+        data["message"] = "Quiz submitted. Long answers are being graded."
+        data["job_id"] = quiz.grading_job.id
+        return data, status.HTTP_202_ACCEPTED
+
+    return data, status.HTTP_201_CREATED
+
+
+def encode_cursor(quiz):
+    value = f"{quiz.created_at.isoformat()}|{quiz.id}"
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+    created_at, quiz_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.fromisoformat(created_at), int(quiz_id)
+
+
+def history_queryset(user, cursor=None):
+    quizzes = CompletedQuiz.objects.filter(user=user).order_by("-created_at", "-id")
+    if cursor is not None:
+        created_at, quiz_id = cursor
+        quizzes = quizzes.filter(created_at__lte=created_at).filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=quiz_id)
+        )
+    return quizzes
+
+
 class UserCompletedQuizzesView(views.APIView):
     permission_classes = [IsAuthenticated]
+    default_limit = 20
+    max_limit = 100
 
     def get(self, request):
         user = request.user
-        quizzes = (
-            CompletedQuiz.objects.filter(user=user)
-            .prefetch_related("questions")
-            .order_by("-created_at")
-        )
+        include_questions = request.GET.get("include") == "questions"
+
+        try:
+            limit = min(int(request.GET.get("limit", self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return Response(
+                {"error": "Limit must be a positive integer."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cursor = request.GET.get("cursor")
+        position = None
+        if cursor:
+            try:
+                position = decode_cursor(cursor)
+            except (ValueError, UnicodeDecodeError):
+                return Response(
+                    {"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST
+                )
+
+        cache_key = history_cache.key(user.pk, limit, include_questions, cursor)
+        payload = history_cache.get(cache_key)
+        if payload is not None:
+            return response.Response(payload)
+
+        quizzes = history_queryset(user, position)
+        if include_questions:
+            quizzes = quizzes.prefetch_related("questions")
+
+        page = list(quizzes[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
 
         quiz_data = []
-        for quiz in quizzes:
-            quiz_data.append(
-                {
-                    "topic": quiz.topic,
-                    "number_of_questions": quiz.number_of_questions,
-                    "grade": quiz.grade,
-                    "percentage": quiz.percentage,
-                    "difficulty": quiz.difficulty,
-                    "created_at": quiz.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                    "questions": [
-                        {
-                            "question_text": q.question_text,
-                            "correct_answer": q.answer_key,
-                            "submitted_answer": q.submitted_answer,
-                            "is_correct": q.is_correct,
-                            "marks": q.marks,
-                            "total_marks": q.total_marks,
-                        }
-                        for q in quiz.questions.all()
-                    ],
-                }
+        for quiz in page:
+            data = quiz_summary_data(quiz)
+            if include_questions:
+                data["questions"] = [submitted_question_data(q) for q in quiz.questions.all()]
+            quiz_data.append(data)
+
+        payload = {
+            "results": quiz_data,
+            "next_cursor": encode_cursor(page[-1]) if has_more else None,
+        }
+        history_cache.set(cache_key, payload)
+        return response.Response(payload)
+
+
+class CompletedQuizDetailView(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, quiz_id):
+        try:
+            quiz = CompletedQuiz.objects.get(pk=quiz_id, user=request.user)
+        except CompletedQuiz.DoesNotExist:
+            return Response(
+                {"error": "Quiz not found."}, status=status.HTTP_404_NOT_FOUND
             )
 
-        return response.Response(quiz_data)
+        data = quiz_summary_data(quiz)
+        data["questions"] = [submitted_question_data(q) for q in quiz.questions.order_by("id")]
+        return Response(data)
+
+
+def defer_grading_flag(data):
+    try:
+        return serializers.BooleanField().to_internal_value(data.get("defer_grading", False))
+    except serializers.ValidationError:
+        return None
 
 
 class SubmitQuizView(views.APIView):
@@ -156,28 +256,24 @@ class SubmitQuizView(views.APIView):
         topic = data.get("topic")
         difficulty = data.get("difficulty")
         submitted_answers = data.get("submitted_answers")
+        defer_grading = defer_grading_flag(data)
 
         if not topic or not submitted_answers:
             return Response(
                 {"error": "Topic and submitted answers are required."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-
-        try:
-            with open(
-                os.path.join(
-                    os.path.dirname(os.path.abspath(__file__)), "questions.json"
-                ),
-                "r",
-            ) as file:
-                all_questions = json.load(file)
-        except FileNotFoundError:
+        if defer_grading is None:
             return Response(
-                {"error": "Questions file not found."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                {"error": "defer_grading must be a boolean."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-        
-        questions = [q for q in all_questions if str(q["id"]) in submitted_answers.keys()]
+
+        question_ids = [int(key) for key in submitted_answers.keys() if str(key).isdigit()]
+        questions = [
+            question.as_dict()
+            for question in Question.objects.filter(pk__in=question_ids).order_by("id")
+        ]
 
         if not questions:
             return Response(
@@ -185,34 +281,98 @@ class SubmitQuizView(views.APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        completed_quiz = save_completed_quiz(
-            user, topic, questions, submitted_answers, difficulty
+        completed_quiz, quiz_questions = save_completed_quiz(
+            user, topic, questions, submitted_answers, difficulty,
+            defer_long_answers=defer_grading,
         )
 
-        quiz_questions = CompletedQuizQuestion.objects.filter(quiz=completed_quiz)
+        data, status_code = submission_response_data(completed_quiz, quiz_questions)
+        return Response(data, status=status_code)
 
-        submitted_questions = [
-            {
-                "question_text": question.question_text,
-                "submitted_answer": question.submitted_answer,
-                "correct_answer": question.answer_key,
-                "is_correct": question.is_correct,
-                "marks": question.marks,
-                "total_marks": question.total_marks,
-            }
-            for question in quiz_questions
+
+class AsyncSubmitQuizView(View):
+    async def post(self, request):
+        try:
+            authenticated = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as e:
+            detail = e.detail if isinstance(e.detail, dict) else {"detail": e.detail}
+            return JsonResponse(detail, status=status.HTTP_401_UNAUTHORIZED)
+        if authenticated is None:
+            return JsonResponse(
+                {"detail": "Authentication credentials were not provided."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        user = authenticated[0]
+
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return JsonResponse({"error": "Request body must be a JSON object."}, status=status.HTTP_400_BAD_REQUEST)
+
+        topic = data.get("topic")
+        difficulty = data.get("difficulty")
+        submitted_answers = data.get("submitted_answers")
+        defer_grading = defer_grading_flag(data)
+
+        if not topic or not isinstance(submitted_answers, dict) or not submitted_answers:
+            return JsonResponse(
+                {"error": "Topic and submitted answers are required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if defer_grading is None:
+            return JsonResponse({"error": "defer_grading must be a boolean."}, status=status.HTTP_400_BAD_REQUEST)
+
+        question_ids = [int(key) for key in submitted_answers.keys() if str(key).isdigit()]
+        questions = [
+            question.as_dict()
+            async for question in Question.objects.filter(pk__in=question_ids).order_by("id")
         ]
 
+        if not questions:
+            return JsonResponse(
+                {"error": "No questions found for the specified topic."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        completed_quiz, quiz_questions = await asave_completed_quiz(
+            user, topic, questions, submitted_answers, difficulty,
+            defer_long_answers=defer_grading,
+        )
+
+        data, status_code = submission_response_data(completed_quiz, quiz_questions)
+        return JsonResponse(data, status=status_code)
+
+
+class GradingJobStatusView(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        try:
+            job = GradingJob.objects.select_related("quiz").get(pk=job_id)
+        except GradingJob.DoesNotExist:
+            job = None
+
+        if job is None or (job.quiz.user_id != request.user.id and not request.user.is_staff):
+            return Response(
+                {"error": "Grading job not found."}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        quiz = job.quiz
         return Response(
             {
-                "message": "Quiz submitted successfully.",
-                "quiz_id": completed_quiz.id,
-                "grade": completed_quiz.grade,
-                "percentage": completed_quiz.percentage,
-                "submitted_questions": submitted_questions,
-                "created_at": completed_quiz.created_at,
-            },
-            status=status.HTTP_201_CREATED,
+                "job_id": job.id,
+                "status": job.status,
+                "quiz_id": quiz.id,
+                "quiz_status": quiz.status,
+                "grade": quiz.grade,
+                "percentage": quiz.percentage,
+                "submitted_questions": [
+                    submitted_question_data(q) for q in quiz.questions.order_by("id")
+                ],
+                "created_at": quiz.created_at,
+            }
         )
 
 
@@ -264,33 +424,85 @@ class TopicDifficultyReportView(views.APIView):
                 {"error": "Both topic and difficulty are required."}, status=400
             )
 
-        quizzes = CompletedQuiz.objects.filter(topic=topic, difficulty=difficulty)
-
-        if not quizzes.exists():
+        try:
+            stats = TopicDifficultyStats.objects.select_related("top_user").get(
+                topic=topic, difficulty=difficulty
+            )
+        except TopicDifficultyStats.DoesNotExist:
             return Response(
                 {"error": "No quizzes found for the selected filters."}, status=404
             )
 
-        avg_score = round(quizzes.aggregate(Avg("percentage"))["percentage__avg"])
-        highest_quiz = quizzes.order_by("-percentage").first()
-        highest_score = highest_quiz.percentage
-        top_user = highest_quiz.user
+        top_user = stats.top_user
 
         data = {
             "topic": topic,
             "difficulty": difficulty,
-            "average_score": avg_score,
-            "highest_score": highest_score,
+            "average_score": round(stats.percentage_sum / stats.quiz_count),
+            "highest_score": stats.max_percentage,
             "top_user": {
                 "username": top_user.username,
                 "first_name": top_user.first_name,
                 "last_name": top_user.last_name,
-            },
+            } if top_user else None,
         }
 
         return Response(data)
 
 
+class ExportView(views.APIView):
+    permission_classes = [IsAdminUser]
+    fields = []
+    filename = "export"
+
+    def get_rows(self, params):
+        raise NotImplementedError
+
+    def get(self, request):
+        output = request.GET.get("output", "csv")
+        if output not in ("csv", "jsonl"):
+            return Response(
+                {"error": "Output must be 'csv' or 'jsonl'."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            rows = self.get_rows(request.GET)
+        except ValueError:
+            return Response(
+                {"error": "Invalid year group or date. Dates must be YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        columns = [column for column, _ in self.fields]
+        if output == "csv":
+            content = stream_csv(columns, rows)
+            content_type = "text/csv"
+        else:
+            content = stream_jsonl(columns, rows)
+            content_type = "application/x-ndjson"
+
+        streaming_response = StreamingHttpResponse(content, content_type=content_type)
+        streaming_response["Content-Disposition"] = f'attachment; filename="{self.filename}.{output}"'
+        return streaming_response
+
+
+class QuizExportView(ExportView):
+    fields = QUIZ_FIELDS
+    filename = "completed_quizzes"
+
+    def get_rows(self, params):
+        return quiz_rows(params)
+
+
+class QuizQuestionExportView(ExportView):
+    fields = QUESTION_FIELDS
+    filename = "completed_quiz_questions"
+
+    def get_rows(self, params):
+        return question_rows(params)
+
+
 class RegisterUserView(generics.CreateAPIView):
     queryset = Account.objects.all()
     serializer_class = AccountSerializer
@@ -34,7 +34,7 @@ ALLOWED_HOSTS = ['*']
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -46,6 +46,40 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+JWT_USER_CACHE_TTL = int(os.getenv("JWT_USER_CACHE_TTL", 60))
+JWT_USER_CACHE_MAX_ENTRIES = int(os.getenv("JWT_USER_CACHE_MAX_ENTRIES", 10000))
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+
+GRADER = {
+    "BACKEND": os.getenv("GRADER_BACKEND", "api.graders.OpenAIGrader"),
+    "OPTIONS": {},
+}
+
+GRADING_MAX_WORKERS = int(os.getenv("GRADING_MAX_WORKERS", 6))
+GRADING_BATCH_SIZE = int(os.getenv("GRADING_BATCH_SIZE", 6))
+GRADING_CACHE_SIZE = int(os.getenv("GRADING_CACHE_SIZE", 1024))
+GRADING_CACHE_TTL = int(os.getenv("GRADING_CACHE_TTL", 30 * 24 * 60 * 60))
+GRADING_TIMEOUT = float(os.getenv("GRADING_TIMEOUT", 30))
+GRADING_MAX_RETRIES = int(os.getenv("GRADING_MAX_RETRIES", 2))
+GRADING_BACKOFF_BASE = float(os.getenv("GRADING_BACKOFF_BASE", 0.5))
+GRADING_BACKOFF_MAX = float(os.getenv("GRADING_BACKOFF_MAX", 8))
+GRADING_BREAKER_THRESHOLD = int(os.getenv("GRADING_BREAKER_THRESHOLD", 5))
+GRADING_BREAKER_RESET_TIMEOUT = float(os.getenv("GRADING_BREAKER_RESET_TIMEOUT", 30))
+GRADING_WORKERS = int(os.getenv("GRADING_WORKERS", 4))
+GRADING_JOB_TIMEOUT = int(os.getenv("GRADING_JOB_TIMEOUT", 300))
+GRADING_JOB_MAX_ATTEMPTS = int(os.getenv("GRADING_JOB_MAX_ATTEMPTS", 3))
+GRADING_JOBS_PER_BATCH = int(os.getenv("GRADING_JOBS_PER_BATCH", 10))
+
+QUESTION_BUCKETS_MAX_AGE = int(os.getenv("QUESTION_BUCKETS_MAX_AGE", 300))
+RECENT_QUESTIONS_LIMIT = int(os.getenv("RECENT_QUESTIONS_LIMIT", 50))
+
+QUIZ_HISTORY_CACHE_TTL = int(os.getenv("QUIZ_HISTORY_CACHE_TTL", 10 * 60))
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 2000))
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -63,6 +97,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -104,7 +139,16 @@ WSGI_APPLICATION = 'quizsite.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+    }
+}
+
+SQLITE_PRAGMAS = {}
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'quizsite'),
     }
 }
 
@@ -0,0 +1,91 @@
+"""
+Production settings for quizsite.
+
+Select with DJANGO_SETTINGS_MODULE=quizsite.settings_production. DJANGO_SECRET_KEY and
+ALLOWED_HOSTS must be set. The cache must be Redis (the default) or Memcached, shared by every
+worker process, with CACHE_LOCATION pointing at it. Set ALLOW_LOCAL_CACHE=1 to accept
+CACHE_BACKEND's value as-is for single-process runs such as the benchmark commands.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F403
+from .settings import BASE_DIR, INSTALLED_APPS, MIDDLEWARE, TEMPLATES
+
+
+def required_env(name):
+    value = os.getenv(name, '').strip()
+    if not value:
+        raise ImproperlyConfigured(f'{name} must be set for production.')
+    return value
+
+
+SECRET_KEY = required_env('DJANGO_SECRET_KEY')
+
+DEBUG = False
+
+ALLOWED_HOSTS = [host.strip() for host in required_env('ALLOWED_HOSTS').split(',') if host.strip()]
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'debug_toolbar']
+
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if not middleware.startswith('debug_toolbar.')]
+
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            **TEMPLATES[0]['OPTIONS'],
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+        },
+    },
+]
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+    'mmap_size': 128 * 1024 * 1024,
+}
+
+SHARED_CACHES = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.redis.RedisCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'quizsite'),
+    }
+}
+
+if os.getenv('ALLOW_LOCAL_CACHE', '') != '1':
+    if CACHES['default']['BACKEND'] not in SHARED_CACHES:
+        raise ImproperlyConfigured(
+            'CACHE_BACKEND must be Redis or Memcached in production; cache version checks run on every request.'
+        )
+    CACHES['default']['LOCATION'] = required_env('CACHE_LOCATION')
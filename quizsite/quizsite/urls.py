@@ -14,9 +14,10 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-import debug_toolbar
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
+from api.metrics import metrics_view
 from api.views import UserQuizzesReportView, TopicDifficultyReportView
 
 urlpatterns = [
@@ -24,5 +25,10 @@ urlpatterns = [
     path('reports/user-quizzes/<str:username>/', UserQuizzesReportView.as_view(), name='user_quizzes_report'),
     path('reports/topic-difficulty/', TopicDifficultyReportView.as_view(), name='topic_difficulty_report'),
     path('api/', include('api.urls')),
-    path('__debug__/', include(debug_toolbar.urls)),
+    path('metrics', metrics_view, name='metrics'),
 ]
+
+if 'debug_toolbar' in settings.INSTALLED_APPS:
+    import debug_toolbar
+
+    urlpatterns.append(path('__debug__/', include(debug_toolbar.urls)))